@@ -1,49 +1,228 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Query
-from fastapi.responses import FileResponse, Response
-from ultralytics import YOLO
-from PIL import Image
+import time
+_IMPORT_START = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Query, BackgroundTasks
+from fastapi.responses import FileResponse, Response, StreamingResponse, RedirectResponse
+import numpy as np
+import cv2
 import sqlite3
 import os
 import uuid
-import shutil
-import time
+import json
 import logging
+import threading
+from contextlib import asynccontextmanager, aclosing
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.routing import APIRoute
+from starlette.formparsers import MultiPartParser, MultiPartException
 from fastapi import Depends, HTTPException, status
 import bcrypt
 
 from sqlalchemy.orm import Session
-from db import get_db, init_db
-from queries import save_prediction, save_detection, get_prediction,  get_detections
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import get_db, get_async_db, init_db, check_db, run_write, SessionLocal, use_primary, routes_reads
+import queries
+from queries import save_prediction_with_detections
 from models import User, PredictionSession, DetectionObject
-from queries import get_user, create_user, get_predictions_by_label, get_predictions_by_score, is_image_owned_by_user
-from queries import get_predicted_image_path, count_predictions_last_week, get_unique_labels_last_week, get_prediction_file_paths, delete_prediction_and_detections
-from queries import get_user_prediction_stats
+from queries import get_user, create_user, is_image_owned_by_user
+from queries import get_predicted_image_path, delete_prediction_and_detections
+from queries import get_image_s3_keys, get_predicted_image_keys
+from queries import save_video_prediction
+from queries import encode_cursor, PREDICTIONS_PAGE_SIZE, PREDICTIONS_MAX_PAGE_SIZE
+# read endpoints are async and query through AsyncSession
+from async_queries import get_prediction_with_detections, search_detections, get_predictions_by_label, get_predictions_by_score
+from async_queries import count_predictions_last_week, get_unique_labels_last_week, get_user_prediction_stats
+from async_queries import get_video_prediction, get_video_tracks
+from inference import BatchScheduler, resolve_inference_options
+from worker_pool import InferenceWorkerPool, INFERENCE_WORKERS, load_frame
+from engines import LazyEngine
+from rendering import RenderCache, RENDER_MODE, render_detections, encode_image
+from video import iter_frames, video_info, IouTracker
+from prediction_cache import PredictionCache, PREDICTION_CACHE_SIZE, hash_bytes, hash_file, make_cache_key
+from s3_outbox import S3Outbox
+from storage import LocalStorage, PresignedUrlCache, object_storage_from_env
+from retention import RetentionJob, RetentionPolicy, RETENTION_DAYS, RETENTION_USER_DAYS, parse_user_days
 from dotenv import load_dotenv; load_dotenv()
 
 
-from s3_utils import (
-    AWS_S3_BUCKET, AWS_REGION,
-    download_file, upload_file, copy_object, s3_key_exists
-)
 security = HTTPBasic()
 
-# Disable GPU usage
-import torch
-torch.cuda.is_available = lambda: False
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
-init_db()
+# Run one inference on a synthetic image during startup so the first request is not slow
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
 
 UPLOAD_DIR = "uploads/original"
 PREDICTED_DIR = "uploads/predicted"
+VIDEO_DIR = "uploads/videos"
 DB_PATH = "predictions.db"
 
+# "disk" writes the input to UPLOAD_DIR and lets YOLO read it back;
+# "memory" decodes the request bytes straight into an array for the model
+PREDICT_DECODE = os.getenv("PREDICT_DECODE", "disk")
+# Memory mode only: "background" writes the original after the response is sent,
+# "none" skips the local copy when S3 holds the original
+ORIGINAL_PERSIST = os.getenv("ORIGINAL_PERSIST", "background")
+# "s3" keeps /predict off the local disk when a bucket is configured: the input is
+# decoded in memory and the original and annotated image are uploaded from memory
+PREDICT_STORAGE = os.getenv("PREDICT_STORAGE", "local")
+# Uploads larger than this are spooled to a temporary file before the endpoint runs
+# (Starlette's default is 1 MB); raise it to keep zero-disk uploads in memory
+UPLOAD_SPOOL_MAX_MB = float(os.getenv("UPLOAD_SPOOL_MAX_MB", "1"))
+# "inline" runs a prediction's S3 transfers in parallel before responding (failed ones
+# are retried from the outbox); "background" only records them in the outbox
+S3_UPLOAD_MODE = os.getenv("S3_UPLOAD_MODE", "inline")
+# "stream" sends image bytes through the app; "redirect" answers image requests with a
+# 302 to a short-lived presigned URL and "json" returns that URL, so the bytes come
+# straight from S3
+IMAGE_URL_MODE = os.getenv("IMAGE_URL_MODE", "stream")
+
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(PREDICTED_DIR, exist_ok=True)
+os.makedirs(VIDEO_DIR, exist_ok=True)
+
+# Local working copies; keys are the paths stored on predictions (uploads/...)
+local_storage = LocalStorage()
+# Canonical copies: S3 when AWS_S3_BUCKET is set, or the in-process stand-in
+# with OBJECT_STORAGE=memory; None when there is nowhere to put them
+object_storage = object_storage_from_env()
+# Presigned image URLs, reused until shortly before they expire
+presigned_urls = PresignedUrlCache()
+
+# YOLO model (tiny model ~6MB, downloaded if missing); backend chosen by INFERENCE_BACKEND.
+# Built on first use or during startup, never at import time.
+model = LazyEngine()
+
+# Optional out-of-process inference (INFERENCE_WORKERS > 0)
+worker_pool = InferenceWorkerPool(INFERENCE_WORKERS) if INFERENCE_WORKERS > 0 else None
+
+# Seconds spent in each startup phase, reported by /ready
+startup_timings = {}
+startup_state = {"done": False, "error": None}
+
+
+def run_startup():
+    """
+    Initialise the database, load and warm up the model (or the worker pool).
+    Runs in a background thread so /health answers while the model loads;
+    /ready turns 200 once this has finished.
+    """
+    try:
+        start = time.perf_counter()
+        init_db()
+        startup_timings["db_init_s"] = round(time.perf_counter() - start, 3)
+        if retention is not None:
+            retention.start()
+        if object_storage is not None:
+            # uploads left in the outbox by a previous run
+            s3_outbox.start()
+
+        if worker_pool is not None:
+            start = time.perf_counter()
+            worker_pool.wait_ready()
+            startup_timings["workers_ready_s"] = round(time.perf_counter() - start, 3)
+        else:
+            model.load()
+            if MODEL_WARMUP:
+                # requests may already be batching; don't run the model concurrently with them
+                with scheduler.inference_lock:
+                    model.warmup()
+            startup_timings.update(model.timings)
+    except Exception as e:
+        startup_state["error"] = str(e)
+        logger.exception("Startup failed")
+    finally:
+        startup_state["done"] = True
+        startup_timings["total_s"] = round(time.perf_counter() - _IMPORT_START, 3)
+        logger.warning(f"Startup timings: {startup_timings}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    threading.Thread(target=run_startup, name="startup", daemon=True).start()
+    yield
+    if retention is not None:
+        retention.stop()
+    s3_outbox.stop()
+    if worker_pool is not None:
+        worker_pool.stop()
+
+
+class UploadParser(MultiPartParser):
+    # per parser rather than on MultiPartParser, which every Starlette app in the process shares
+    spool_max_size = int(UPLOAD_SPOOL_MAX_MB * 1024 * 1024)
+
+
+class UploadRoute(APIRoute):
+    """Route whose multipart body is parsed by UploadParser instead of Starlette's default parser."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if self.body_field is None:
+            return handler
+
+        async def upload_handler(request: Request):
+            if request.headers.get("content-type", "").startswith("multipart/form-data"):
+                try:
+                    async with aclosing(request.stream()) as stream:
+                        # FastAPI's request.form() returns this form and closes its files
+                        request._form = await UploadParser(request.headers, stream).parse()
+                except MultiPartException as e:
+                    raise HTTPException(status_code=400, detail=e.message)
+            return await handler(request)
+
+        return upload_handler
+
+
+app = FastAPI(lifespan=lifespan)
+app.router.route_class = UploadRoute
+
+
+def class_names() -> dict:
+    """
+    Class index -> label of the model in use. In pool mode these come from the
+    workers, so the API process never loads a model of its own.
+    """
+    if worker_pool is not None:
+        worker_pool.wait_ready()
+        return worker_pool.names
+    return model.names
+
+
+def run_inference_batch(sources: list, **options):
+    if worker_pool is not None:
+        paths = [s if isinstance(s, str) else None for s in sources]
+        return worker_pool.predict_batch([load_frame(s) for s in sources], paths=paths, **options)
+    return model(sources, device="cpu", batch=len(sources), **options)
+
+
+# Concurrent /predict calls share batched forward passes
+scheduler = BatchScheduler(run_inference_batch)
+
+# Annotated images rendered on demand (RENDER_MODE=lazy)
+render_cache = RenderCache()
 
-# Download the AI model (tiny model ~6MB).
-model = YOLO("yolov8n.pt")  
+# Duplicate images are answered from the content-hash cache (PREDICTION_CACHE_SIZE > 0)
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE) if PREDICTION_CACHE_SIZE > 0 else None
+
+
+def forget_predictions(rows):
+    # expired predictions must not be answered from the in-memory caches
+    for row in rows:
+        if prediction_cache is not None:
+            prediction_cache.invalidate(row.uid)
+        render_cache.pop(row.predicted_image)
+        for key in (row.s3_original_key, row.s3_predicted_key):
+            if key:
+                presigned_urls.pop(key)
+
+
+# Expired predictions are purged in the background (RETENTION_DAYS / RETENTION_USER_DAYS)
+retention_policy = RetentionPolicy(RETENTION_DAYS, parse_user_days(RETENTION_USER_DAYS))
+retention = RetentionJob(SessionLocal, retention_policy, files=local_storage, objects=object_storage,
+                         on_deleted=forget_predictions) if retention_policy.enabled else None
 
 
 def get_current_username(
@@ -54,11 +233,14 @@ def get_current_username(
     password = credentials.password.encode()
 
     user = get_user(db, username)
+    if user is None and routes_reads(db):
+        # a replica may not have the user yet; registering again would fail on the primary
+        user = get_user(use_primary(db), username)
 
     if user is None:
         # Register new user
         hashed_pw = bcrypt.hashpw(password, bcrypt.gensalt()).decode()
-        create_user(db, username, hashed_pw)
+        run_write(db, create_user, username, hashed_pw)
         return username
 
     if not bcrypt.checkpw(password, user.password.encode()):
@@ -87,11 +269,150 @@ async def get_optional_username(
 
 
 
+def image_ext(name: str | None) -> str:
+    # derive extension from the upload name / S3 key (fallback .jpg)
+    ext = os.path.splitext(name)[1] if name else ""
+    return ext or ".jpg"
+
+
+def inference_options(
+    tier: str | None = Query(default=None, description="Quality tier: fast, balanced or accurate"),
+    imgsz: int | None = Query(default=None, ge=32, le=1920, description="Model input size in pixels"),
+    conf: float | None = Query(default=None, ge=0.0, le=1.0, description="Minimum confidence"),
+    max_det: int | None = Query(default=None, ge=1, le=300, description="Maximum detections per image"),
+    classes: list[str] | None = Query(default=None, description="Only detect these labels (repeat ?classes=)"),
+) -> dict:
+    """Model options for a request: the tier's presets overridden by explicit parameters."""
+    try:
+        return resolve_inference_options(class_names(), tier, imgsz, conf, max_det, classes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+    return frame
+
+
+def write_file(path: str, data: bytes):
+    local_storage.put(path, data)
+
+
+def extract_detections(result) -> list[tuple[str, float, list[float]]]:
+    names = class_names()
+    detections = []
+    for box in result.boxes:
+        label_idx = int(box.cls[0].item())
+        label = names[label_idx]
+        score = float(box.conf[0])
+        bbox = box.xyxy[0].tolist()
+        detections.append((label, score, bbox))
+    return detections
+
+
+def store_result(db: Session, uid: str, original_path: str, predicted_path: str, username: str | None, result,
+                 render: bool = True, s3_keys: tuple[str, str] | None = None) -> list[str]:
+    """
+    Save the session with its detections and return the labels.
+    The annotated image is only drawn now when render is set; otherwise it is
+    drawn from the stored detections the first time it is requested.
+    s3_keys are recorded so the retention job can delete the S3 copies.
+    """
+    if render:
+        local_storage.put(predicted_path, encode_image(result.plot(), os.path.splitext(predicted_path)[1]))
+
+    detections = extract_detections(result)
+    height, width = result.orig_shape[0], result.orig_shape[1]
+    run_write(db, save_prediction_with_detections, uid, original_path, predicted_path, username, detections,
+              image_size=(int(width), int(height)), s3_keys=s3_keys)
+    return [label for label, _, _ in detections]
+
+
+def s3_keys_for(uid: str, ext: str, chat_id: str) -> tuple[str, str] | None:
+    """(original, predicted) object storage keys of a prediction, or None without object storage."""
+    if object_storage is None:
+        return None
+    return f"{chat_id}/original/{uid}{ext}", f"{chat_id}/predicted/{uid}{ext}"
+
+
+def perform_transfer(transfer: dict):
+    """
+    Run one object storage transfer: an in-bucket copy from source_key, or an upload
+    of payload bytes or the file at local_path (also the fallback of a failed copy).
+    """
+    key = transfer["key"]
+    if transfer.get("source_key"):
+        try:
+            # cheaper in-bucket copy
+            object_storage.copy(transfer["source_key"], key)
+            return
+        except Exception:
+            if transfer.get("payload") is None and not transfer.get("local_path"):
+                raise
+    if transfer.get("payload") is not None:
+        object_storage.put(key, transfer["payload"])
+    else:
+        object_storage.put_file(key, transfer["local_path"])
+
+
+# Pending and failed S3 transfers, retried in the background
+s3_outbox = S3Outbox(SessionLocal, perform_transfer)
+
+
+def upload_outputs(db: Session, uid: str, ext: str, chat_id: str, original_path: str, predicted_path: str | None,
+                   source_key: str | None = None, original_bytes: bytes | None = None,
+                   predicted_bytes: bytes | None = None) -> dict | None:
+    """
+    Upload organized copies to <bucket>/<chat_id>/original|predicted/<uid><ext>.
+    source_key is set when the original came from S3 (S3 mode); original_bytes is
+    set when the original was decoded in memory and may not be on disk.
+    predicted_path is None when the annotated image has not been rendered yet;
+    predicted_bytes is the annotated image when it was encoded in memory instead.
+    Both transfers run in parallel, or after the response with S3_UPLOAD_MODE=background.
+    """
+    if object_storage is None:
+        return None
+    bucket = object_storage.bucket
+    # organize by chat_id and use generated uid for uniqueness
+    original_key, predicted_key = s3_keys_for(uid, ext, chat_id)
+
+    # Keep a canonical copy of the original under chat_id/original/; the
+    # user-passed object is still at source_key. The key contains a fresh uid,
+    # so there is no need to check whether it exists first.
+    transfers = []
+    if source_key != original_key:
+        transfers.append({"bucket": bucket, "key": original_key, "source_key": source_key,
+                          "local_path": original_path, "payload": original_bytes, "prediction_uid": uid})
+    # Use PIL-chosen format; content-type guessed by path extension
+    if predicted_bytes is not None:
+        transfers.append({"bucket": bucket, "key": predicted_key, "payload": predicted_bytes, "prediction_uid": uid})
+    elif predicted_path:
+        transfers.append({"bucket": bucket, "key": predicted_key, "local_path": predicted_path,
+                          "prediction_uid": uid})
+
+    if S3_UPLOAD_MODE == "background":
+        s3_outbox.enqueue(db, transfers)
+    else:
+        s3_outbox.run(db, transfers)
+
+    s3_info = {"bucket": bucket, "region": object_storage.region}
+    if source_key:
+        s3_info["source_key"] = source_key
+    rendered = predicted_bytes is not None or predicted_path
+    s3_info.update({"original_key": original_key, "predicted_key": predicted_key if rendered else None})
+    return s3_info
+
+
 @app.post("/predict")
 def predict(
+    background_tasks: BackgroundTasks,
     file: UploadFile | None = File(default=None),
     img: str | None = Query(default=None, description="S3 key or image name"),
     chat_id: str = Query(default="anonymous"),
+    eager_render: bool = Query(default=False, description="Draw and upload the annotated image now"),
+    options: dict = Depends(inference_options),
     username: str | None = Depends(get_optional_username),
     db: Session = Depends(get_db)
 ):
@@ -102,6 +423,11 @@ def predict(
       - S3 mode: /predict?img=<s3_key>&chat_id=<id>
         * Downloads from S3, runs detection, uploads original/predicted to S3
         * Organized as <bucket>/<chat_id>/original/<uid><ext> and <bucket>/<chat_id>/predicted/<uid><ext>
+    In lazy render mode the annotated image is drawn on first request; pass
+    ?eager_render=true to get it (and its S3 predicted_key) immediately.
+    With PREDICT_STORAGE=s3 and a bucket, nothing is written to local disk
+    (uploads up to UPLOAD_SPOOL_MAX_MB stay in memory).
+    Inference quality: ?tier=fast|balanced|accurate and/or imgsz, conf, max_det, classes.
     """
     if not file and not img:
         raise HTTPException(status_code=400, detail="Provide a file upload or ?img=<s3_key>")
@@ -113,122 +439,352 @@ def predict(
     if file:
         ext = os.path.splitext(file.filename)[1]
     else:
-        # derive extension from S3 key (fallback .jpg)
-        ext = os.path.splitext(img)[1] if img else ""
-        if not ext:
-            ext = ".jpg"
+        ext = image_ext(img)
 
     original_path = os.path.join(UPLOAD_DIR, uid + ext)
     predicted_path = os.path.join(PREDICTED_DIR, uid + ext)
 
+    # zero-disk: nothing below writes to or reads from uploads/
+    zero_disk = PREDICT_STORAGE == "s3" and object_storage is not None
+    in_memory = PREDICT_DECODE == "memory" or zero_disk
+    original_bytes = None
+
     # --- Input acquisition: upload or S3 download ---
     if file and not img:
-        with open(original_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        s3_mode = False
+        if in_memory:
+            original_bytes = file.file.read()
+        else:
+            local_storage.put_fileobj(original_path, file.file)
         source_key = None
     elif img and not file:
-        if not AWS_S3_BUCKET:
+        if object_storage is None:
             raise HTTPException(status_code=500, detail="AWS_S3_BUCKET is not set")
-        # Download the requested S3 object directly into original_path
+        # Download the requested S3 object directly into original_path (or memory)
         try:
-            download_file(AWS_S3_BUCKET, img, original_path)
+            if in_memory:
+                original_bytes = object_storage.get(img)
+                if original_bytes is None:
+                    raise FileNotFoundError(img)
+            else:
+                object_storage.download(img, original_path)
         except Exception:
-            raise HTTPException(status_code=404, detail=f"S3 object not found: s3://{AWS_S3_BUCKET}/{img}")
-        s3_mode = True
+            raise HTTPException(status_code=404, detail=f"S3 object not found: s3://{object_storage.bucket}/{img}")
         source_key = img
     else:
         raise HTTPException(status_code=400, detail="Provide only one of: file OR img")
 
-    # --- Run YOLO detection (unchanged) ---
-    results = model(original_path, device="cpu")
-    annotated_frame = results[0].plot()
-    annotated_image = Image.fromarray(annotated_frame)
-    annotated_image.save(predicted_path)
+    # --- Content-hash cache: answer repeated images without inference ---
+    cache_key = None
+    if prediction_cache is not None:
+        content_hash = hash_bytes(original_bytes) if in_memory else hash_file(original_path)
+        cache_key = make_cache_key(content_hash, username, options)
+        hit = prediction_cache.lookup(db, cache_key, username)
+        if hit is not None:
+            if not in_memory:
+                safe_delete_file(original_path)
+            return {
+                "prediction_uid": hit["prediction_uid"],
+                "username": username,
+                "detection_count": len(hit["labels"]),
+                "labels": hit["labels"],
+                "time_took": time.time() - start_time,
+                "s3": hit["s3"],
+                "cache": "hit",
+            }
+
+    stored_original = original_path
+    if in_memory:
+        source = decode_image(original_bytes)
+        if (ORIGINAL_PERSIST == "none" or zero_disk) and object_storage is not None:
+            # S3 is the system of record: point the session at the canonical key
+            stored_original = s3_keys_for(uid, ext, chat_id)[0]
+        else:
+            background_tasks.add_task(write_file, original_path, original_bytes)
+    else:
+        source = original_path
+
+    # --- Run YOLO detection (micro-batched with concurrent requests) ---
+    result = scheduler.predict(source, options)
 
     # ✅ Save session & detections in DB (unchanged)
-    save_prediction(db, uid, original_path, predicted_path, username)
-    detected_labels = []
-    for box in results[0].boxes:
-        label_idx = int(box.cls[0].item())
-        label = model.names[label_idx]
-        score = float(box.conf[0])
-        bbox = box.xyxy[0].tolist()
-        save_detection(db, uid, label, score, bbox)
-        detected_labels.append(label)
+    render = eager_render or RENDER_MODE == "eager"
+    predicted_bytes = None
+    if zero_disk:
+        # the annotated image is encoded in memory and only stored in S3
+        s3_keys = s3_keys_for(uid, ext, chat_id)
+        predicted_path = s3_keys[1]
+        if render:
+            predicted_bytes = encode_image(result.plot(), ext)
+        detected_labels = store_result(db, uid, stored_original, predicted_path, username, result, False, s3_keys)
+    else:
+        detected_labels = store_result(db, uid, stored_original, predicted_path, username, result, render,
+                                       s3_keys_for(uid, ext, chat_id))
 
     # --- If S3 mode: upload organized copies ---
-    s3_info = None
-    if s3_mode:
-        # organize by chat_id and use generated uid for uniqueness
-        original_key = f"{chat_id}/original/{uid}{ext}"
-        predicted_key = f"{chat_id}/predicted/{uid}{ext}"
-
-        # Keep a canonical copy of the original under chat_id/original/
-        # If you want to preserve the *user-passed* object too, it's still at source_key.
-        if not s3_key_exists(AWS_S3_BUCKET, original_key):
-            try:
-                # cheaper in-bucket copy if source and bucket are same
-                if source_key and source_key != original_key:
-                    copy_object(AWS_S3_BUCKET, source_key, original_key)
-                else:
-                    upload_file(AWS_S3_BUCKET, original_key, original_path)
-            except Exception:
-                # fallback upload
-                upload_file(AWS_S3_BUCKET, original_key, original_path)
-
-        # Upload annotated output
-        # Use PIL-chosen format; content-type guessed by path extension
-        upload_file(AWS_S3_BUCKET, predicted_key, predicted_path)
-
-        s3_info = {
-            "bucket": AWS_S3_BUCKET,
-            "region": AWS_REGION,
-            "source_key": source_key,
-            "original_key": original_key,
-            "predicted_key": predicted_key,
-        }
-    else:
-        # Optional: also upload uploads from regular file mode (parity)
-        # Comment out if not needed
-        if AWS_S3_BUCKET:
-            original_key = f"{chat_id}/original/{uid}{ext}"
-            predicted_key = f"{chat_id}/predicted/{uid}{ext}"
-            upload_file(AWS_S3_BUCKET, original_key, original_path)
-            upload_file(AWS_S3_BUCKET, predicted_key, predicted_path)
-            s3_info = {
-                "bucket": AWS_S3_BUCKET,
-                "region": AWS_REGION,
-                "original_key": original_key,
-                "predicted_key": predicted_key,
-            }
+    local_predicted = predicted_path if render and not zero_disk else None
+    s3_info = upload_outputs(db, uid, ext, chat_id, original_path, local_predicted,
+                             source_key, original_bytes, predicted_bytes)
+
+    if cache_key:
+        prediction_cache.store(db, cache_key, uid, detected_labels, predicted_path, s3_info)
 
     processing_time = time.time() - start_time
 
     return {
         "prediction_uid": uid,
         "username": username,
-        "detection_count": len(results[0].boxes),
+        "detection_count": len(result.boxes),
         "labels": detected_labels,
         "time_took": processing_time,
-        "s3": s3_info
+        "s3": s3_info,
+        "cache": "miss" if cache_key else "disabled",
+    }
+
+
+@app.post("/predict/batch")
+def predict_batch(
+    files: list[UploadFile] | None = File(default=None),
+    img: list[str] | None = Query(default=None, description="S3 keys or image names (repeat ?img=)"),
+    chat_id: str = Query(default="anonymous"),
+    eager_render: bool = Query(default=False, description="Draw and upload the annotated images now"),
+    options: dict = Depends(inference_options),
+    username: str | None = Depends(get_optional_username),
+):
+    """
+    Predict objects in many images with a single request.
+    Accepts any mix of uploaded files (form-data "files") and S3 keys (?img=<key>&img=<key>).
+    Images go through the batching scheduler together and one NDJSON line is streamed
+    per image as soon as it is done (lines arrive in completion order; "index" is the input position).
+    """
+    if not files and not img:
+        raise HTTPException(status_code=400, detail="Provide file uploads or ?img=<s3_key>")
+    if img and object_storage is None:
+        raise HTTPException(status_code=500, detail="AWS_S3_BUCKET is not set")
+
+    # Uploads must be staged before the response starts streaming
+    items = []
+    for upload in files or []:
+        uid = str(uuid.uuid4())
+        ext = os.path.splitext(upload.filename)[1]
+        original_path = os.path.join(UPLOAD_DIR, uid + ext)
+        local_storage.put_fileobj(original_path, upload.file)
+        items.append({"uid": uid, "ext": ext, "source": upload.filename, "source_key": None, "original_path": original_path})
+    for key in img or []:
+        uid = str(uuid.uuid4())
+        ext = image_ext(key)
+        items.append({"uid": uid, "ext": ext, "source": key, "source_key": key,
+                      "original_path": os.path.join(UPLOAD_DIR, uid + ext)})
+
+    def run_item(item: dict):
+        start_time = time.time()
+        if item["source_key"]:
+            try:
+                object_storage.download(item["source_key"], item["original_path"])
+            except Exception:
+                raise LookupError(f"S3 object not found: s3://{object_storage.bucket}/{item['source_key']}")
+        return scheduler.predict(item["original_path"], options), start_time
+
+    render = eager_render or RENDER_MODE == "eager"
+
+    def stream():
+        db = SessionLocal()
+        executor = ThreadPoolExecutor(max_workers=max(1, scheduler.max_batch_size * 2))
+        futures = {}
+        stored = set()
+        try:
+            for index, item in enumerate(items):
+                futures[executor.submit(run_item, item)] = index
+            for future in as_completed(futures):
+                index = futures[future]
+                item = items[index]
+                line = {"index": index, "source": item["source"]}
+                try:
+                    result, start_time = future.result()
+                    predicted_path = os.path.join(PREDICTED_DIR, item["uid"] + item["ext"])
+                    labels = store_result(db, item["uid"], item["original_path"], predicted_path, username,
+                                          result, render, s3_keys_for(item["uid"], item["ext"], chat_id))
+                    stored.add(index)
+                    s3_info = upload_outputs(db, item["uid"], item["ext"], chat_id, item["original_path"],
+                                             predicted_path if render else None, item["source_key"])
+                    line.update({
+                        "prediction_uid": item["uid"],
+                        "detection_count": len(result.boxes),
+                        "labels": labels,
+                        "time_took": time.time() - start_time,
+                        "s3": s3_info,
+                    })
+                except Exception as e:
+                    db.rollback()
+                    line["error"] = str(e)
+                yield json.dumps(line) + "\n"
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            db.close()
+            # staged inputs of failed items, or of items left behind when the client went away;
+            # items still running are cleaned up once they finish
+            submitted = {index: future for future, index in futures.items()}
+            for index, item in enumerate(items):
+                if index in stored:
+                    continue
+                future = submitted.get(index)
+                if future is None:
+                    safe_delete_file(item["original_path"])
+                else:
+                    future.add_done_callback(lambda _, path=item["original_path"]: safe_delete_file(path))
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/predict/video")
+def predict_video(
+    file: UploadFile | None = File(default=None),
+    video: str | None = Query(default=None, description="S3 key of a video"),
+    stride: int = Query(default=5, ge=1, description="Run detection on every Nth frame"),
+    batch_size: int = Query(default=8, ge=1, le=64, description="Frames sent to the model together"),
+    track: bool = Query(default=True, description="Report each tracked object once instead of every frame"),
+    options: dict = Depends(inference_options),
+    username: str | None = Depends(get_optional_username),
+):
+    """
+    Detect objects in a video (upload or ?video=<s3_key>) and stream NDJSON.
+    One line per sampled frame with detections to report; with tracking only objects
+    that newly appear are reported. The last line summarizes the stored video session.
+    """
+    if bool(file) == bool(video):
+        raise HTTPException(status_code=400, detail="Provide exactly one of: file OR video")
+
+    uid = str(uuid.uuid4())
+    ext = os.path.splitext(file.filename if file else video)[1] or ".mp4"
+    video_path = os.path.join(VIDEO_DIR, uid + ext)
+
+    if file:
+        local_storage.put_fileobj(video_path, file.file)
+    else:
+        if object_storage is None:
+            raise HTTPException(status_code=500, detail="AWS_S3_BUCKET is not set")
+        try:
+            object_storage.download(video, video_path)
+        except Exception:
+            raise HTTPException(status_code=404, detail=f"S3 object not found: s3://{object_storage.bucket}/{video}")
+
+    frame_count, fps = video_info(video_path)
+    if frame_count <= 0:
+        safe_delete_file(video_path)
+        raise HTTPException(status_code=400, detail="Could not read video")
+
+    def detect_frames():
+        # batch_size frames are submitted together so they share forward passes
+        chunk = []
+        for frame_index, time_ms, frame in iter_frames(video_path, stride):
+            chunk.append((frame_index, time_ms, scheduler.submit(frame, options)))
+            if len(chunk) >= batch_size:
+                yield from ((i, t, f.result()) for i, t, f in chunk)
+                chunk = []
+        yield from ((i, t, f.result()) for i, t, f in chunk)
+
+    def stream():
+        start_time = time.time()
+        tracker = IouTracker()
+        records = []
+        processed = 0
+        try:
+            for frame_index, time_ms, result in detect_frames():
+                processed += 1
+                detections = extract_detections(result)
+                if track:
+                    reported = tracker.update(frame_index, detections)
+                else:
+                    reported = [
+                        {"track_id": None, "label": label, "score": score, "box": box,
+                         "first_frame": frame_index, "last_frame": frame_index}
+                        for label, score, box in detections
+                    ]
+                    records.extend(reported)
+                if reported:
+                    yield json.dumps({
+                        "frame": frame_index,
+                        "time_ms": time_ms,
+                        "detections": [
+                            {"track_id": r["track_id"], "label": r["label"], "score": r["score"], "box": r["box"]}
+                            for r in reported
+                        ],
+                    }) + "\n"
+
+            if track:
+                records = tracker.tracks()
+            db = SessionLocal()
+            try:
+                run_write(db, save_video_prediction, uid, username, video or file.filename, frame_count, processed,
+                          fps, stride, records)
+            finally:
+                db.close()
+            yield json.dumps({
+                "video_uid": uid,
+                "username": username,
+                "frame_count": frame_count,
+                "frames_processed": processed,
+                "objects": len(records),
+                "time_took": time.time() - start_time,
+            }) + "\n"
+        except Exception as e:
+            yield json.dumps({"video_uid": uid, "error": str(e)}) + "\n"
+        finally:
+            safe_delete_file(video_path)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/video/{uid}")
+async def get_video_by_uid(
+    uid: str,
+    username: str = Depends(get_current_username),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get a video prediction with its tracked objects (only if it belongs to the user)
+    """
+    session = await get_video_prediction(db, uid, username)
+    if not session:
+        raise HTTPException(status_code=404, detail="Video prediction not found or not authorized")
+
+    return {
+        "uid": session.uid,
+        "timestamp": session.timestamp,
+        "source": session.source,
+        "frame_count": session.frame_count,
+        "frames_processed": session.frames_processed,
+        "fps": session.fps,
+        "stride": session.stride,
+        "objects": [
+            {
+                "track_id": t.track_id,
+                "label": t.label,
+                "score": t.score,
+                "box": t.box,
+                "first_frame": t.first_frame,
+                "last_frame": t.last_frame,
+            } for t in await get_video_tracks(db, uid)
+        ]
     }
 
 
 @app.get("/prediction/{uid}")
-def get_prediction_by_uid(
+async def get_prediction_by_uid(
     uid: str,
     username: str = Depends(get_current_username),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get prediction session by uid with all detected objects (only if it belongs to the user)
     """
-    session = get_prediction(db, uid, username)
+    session = await get_prediction_with_detections(db, uid, username)
+    if session is None and routes_reads(db):
+        # read-your-writes: a prediction made just now may not have reached the replica
+        session = await get_prediction_with_detections(use_primary(db), uid, username)
     if not session:
         raise HTTPException(status_code=404, detail="Prediction not found or not authorized")
 
-    objects = get_detections(db, uid)
+    objects = session.detections
 
     return {
         "uid": session.uid,
@@ -245,31 +801,168 @@ def get_prediction_by_uid(
         ]
     }
 
+def paginate(response: Response, rows: list, limit: int) -> list[dict]:
+    """Trim the look-ahead row of a keyset page and expose the next cursor in a header."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].timestamp, rows[-1].uid)
+    return [{"uid": row.uid, "timestamp": row.timestamp} for row in rows]
+
+
 @app.get("/predictions/label/{label}")
-def predictions_by_label(
+async def predictions_by_label(
     label: str,
+    response: Response,
+    cursor: str | None = Query(default=None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(default=PREDICTIONS_PAGE_SIZE, ge=1, le=PREDICTIONS_MAX_PAGE_SIZE),
     username: str = Depends(get_current_username),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get prediction sessions containing objects with specified label
+    Get prediction sessions containing objects with specified label.
+    Newest first, at most limit per page; the X-Next-Cursor response header
+    fetches the next page (?cursor=...) and is absent on the last page.
     """
-    rows = get_predictions_by_label(db, label, username)
-    return [{"uid": row.uid, "timestamp": row.timestamp} for row in rows]
+    try:
+        rows = await get_predictions_by_label(db, label, username, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return paginate(response, rows, limit)
 
 
 
 @app.get("/predictions/score/{min_score}")
-def predictions_by_score(
+async def predictions_by_score(
     min_score: float,
+    response: Response,
+    cursor: str | None = Query(default=None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(default=PREDICTIONS_PAGE_SIZE, ge=1, le=PREDICTIONS_MAX_PAGE_SIZE),
     username: str = Depends(get_current_username),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Get the authenticated user's prediction sessions containing objects with score >= min_score
+    Get the authenticated user's prediction sessions containing objects with score >= min_score.
+    Newest first, at most limit per page; the X-Next-Cursor response header
+    fetches the next page (?cursor=...) and is absent on the last page.
     """
-    rows = get_predictions_by_score(db, min_score, username)
-    return [{"uid": row.uid, "timestamp": row.timestamp} for row in rows]
+    try:
+        rows = await get_predictions_by_score(db, min_score, username, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return paginate(response, rows, limit)
+
+
+@app.get("/detections")
+async def detections_search(
+    label: str | None = None,
+    min_score: float | None = Query(default=None, ge=0, le=1),
+    min_area: float | None = Query(default=None, ge=0, le=1, description="Smallest box area, as a fraction of the image"),
+    max_area: float | None = Query(default=None, ge=0, le=1, description="Largest box area, as a fraction of the image"),
+    min_x: float = Query(default=0, ge=0, le=1, description="Region the box must lie in, as fractions of the image"),
+    min_y: float = Query(default=0, ge=0, le=1),
+    max_x: float = Query(default=1, ge=0, le=1),
+    max_y: float = Query(default=1, ge=0, le=1),
+    limit: int = Query(default=100, ge=1, le=1000),
+    username: str = Depends(get_current_username),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Search the authenticated user's detections by label, score, size and position,
+    e.g. ?label=person&min_area=0.1 (persons larger than 10% of the frame) or
+    ?label=car&max_x=0.5 (cars in the left half)
+    """
+    region = (min_x, min_y, max_x, max_y)
+    rows = await search_detections(
+        db, username, label=label, min_score=min_score, min_area=min_area, max_area=max_area,
+        region=None if region == (0, 0, 1, 1) else region, limit=limit,
+    )
+    return [
+        {
+            "prediction_uid": obj.prediction_uid,
+            "timestamp": timestamp,
+            "id": obj.id,
+            "label": obj.label,
+            "score": obj.score,
+            "box": obj.box,
+            "image_size": [obj.img_w, obj.img_h] if obj.img_w else None,
+        } for obj, timestamp in rows
+    ]
+
+
+def load_stored_prediction(path: str) -> bytes | None:
+    """Annotated image kept only in object storage (PREDICT_STORAGE=s3), where path is its key."""
+    if object_storage is None or path.startswith(PREDICTED_DIR):
+        return None
+    try:
+        return object_storage.get(path)
+    except Exception:
+        return None
+
+
+def load_original(path: str) -> np.ndarray | None:
+    local = local_storage.local_path(path)
+    if local is not None:
+        return cv2.imread(local)
+    if object_storage is not None:
+        # the original may only live in object storage (ORIGINAL_PERSIST=none)
+        try:
+            data = object_storage.get(path)
+            return decode_image(data) if data is not None else None
+        except Exception:
+            return None
+    return None
+
+
+def render_prediction_image(db: Session, uid: str, username: str) -> bytes | None:
+    """Encoded annotated image for a prediction, drawn from its stored detections and cached."""
+    session = queries.get_prediction(db, uid, username)
+    if session is None:
+        return None
+
+    rendered = render_cache.get(session.predicted_image)
+    if rendered is not None:
+        return rendered
+
+    original = load_original(session.original_image)
+    if original is None:
+        return None
+    frame = render_detections(original, session.detections, class_names())
+    rendered = encode_image(frame, os.path.splitext(session.predicted_image)[1])
+    render_cache.put(session.predicted_image, rendered)
+    return rendered
+
+
+def presigned_image_response(key: str | None, render=None):
+    """
+    302 (or JSON) to a presigned URL for an object storage key; the caller has
+    checked ownership. An annotated image that is not in object storage yet
+    is taken from render() and uploaded first. None means stream it instead.
+    """
+    if IMAGE_URL_MODE == "stream" or object_storage is None or not key:
+        return None
+    entry = presigned_urls.get(key)
+    if entry is None:
+        try:
+            # checked once per URL lifetime, not per request
+            if not object_storage.exists(key):
+                data = render() if render is not None else None
+                if data is None:
+                    return None
+                object_storage.put(key, data)
+            entry = presigned_urls.sign(object_storage, key)
+        except Exception:
+            logger.exception(f"Could not presign {key}")
+            return None
+        if entry is None:
+            return None
+
+    url, expires_at = entry
+    expires_in = int(expires_at - time.time())
+    if IMAGE_URL_MODE == "json":
+        return {"url": url, "expires_in": expires_in}
+    # clients may reuse the redirect while the URL is still good
+    max_age = max(0, expires_in - presigned_urls.refresh)
+    return RedirectResponse(url, status_code=302, headers={"Cache-Control": f"private, max-age={max_age}"})
 
 
 @app.get("/image/{type}/{filename}")
@@ -281,20 +974,39 @@ def get_image(
 ):
     """
     Get image by type and filename — only if it belongs to the authenticated user
+    With IMAGE_URL_MODE=redirect|json the image is fetched from a presigned S3 URL instead.
     """
     if type not in ["original", "predicted"]:
         raise HTTPException(status_code=400, detail="Invalid image type")
 
-    path = os.path.join("uploads", type, filename)
-
-    if not os.path.exists(path):
+    path = os.path.join(UPLOAD_DIR if type == "original" else PREDICTED_DIR, filename)
+
+    if IMAGE_URL_MODE != "stream":
+        keys = get_image_s3_keys(db, path, username)
+        if keys is not None:
+            uid = os.path.splitext(filename)[0]
+            render = (lambda: local_storage.get(path) or render_prediction_image(db, uid, username))
+            response = presigned_image_response(keys[0] if type == "original" else keys[1],
+                                                render if type == "predicted" else None)
+            if response is not None:
+                return response
+
+    local = local_storage.local_path(path)
+
+    if local is None:
+        # Annotated images are drawn on first request in lazy render mode
+        if type == "predicted" and is_image_owned_by_user(db, path, username):
+            rendered = render_prediction_image(db, os.path.splitext(filename)[0], username)
+            if rendered is not None:
+                return Response(rendered, media_type=mimetypes.guess_type(filename)[0] or "image/jpeg")
         raise HTTPException(status_code=404, detail="Image not found")
 
     # ✅ Check ownership using SQLAlchemy
     if not is_image_owned_by_user(db, path, username):
         raise HTTPException(status_code=403, detail="Not authorized to access this image")
 
-    return FileResponse(path)
+    # streamed from disk rather than read into memory
+    return FileResponse(local)
 
 
 @app.get("/prediction/{uid}/image")
@@ -306,23 +1018,41 @@ def get_prediction_image(
 ):
     """
     Get prediction image by uid (only if it belongs to the authenticated user)
+    With IMAGE_URL_MODE=redirect|json the image is fetched from a presigned S3 URL instead.
     """
     accept = request.headers.get("accept", "")
 
-    image_path = get_predicted_image_path(db, uid, username)
+    if IMAGE_URL_MODE != "stream":
+        keys = get_predicted_image_keys(db, uid, username)
+        image_path = keys[0] if keys else None
+        if keys is not None:
+            response = presigned_image_response(
+                keys[1], lambda: local_storage.get(image_path) or render_prediction_image(db, uid, username))
+            if response is not None:
+                return response
+    else:
+        image_path = get_predicted_image_path(db, uid, username)
 
     if not image_path:
         raise HTTPException(status_code=404, detail="Prediction not found or not authorized")
 
-    if not os.path.exists(image_path):
-        raise HTTPException(status_code=404, detail="Predicted image file not found")
-
     if "image/png" in accept:
-        return FileResponse(image_path, media_type="image/png")
+        media_type = "image/png"
     elif "image/jpeg" in accept or "image/jpg" in accept:
-        return FileResponse(image_path, media_type="image/jpeg")
+        media_type = "image/jpeg"
     else:
         raise HTTPException(status_code=406, detail="Client does not accept an image format")
+
+    local = local_storage.local_path(image_path)
+    if local is None:
+        # Only in S3, or not rendered yet (lazy render mode): draw it from the stored detections
+        rendered = (render_cache.get(image_path) or load_stored_prediction(image_path)
+                    or render_prediction_image(db, uid, username))
+        if rendered is None:
+            raise HTTPException(status_code=404, detail="Predicted image file not found")
+        return Response(rendered, media_type=media_type)
+
+    return FileResponse(local, media_type=media_type)
     
 
 @app.get("/health")
@@ -333,35 +1063,114 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready(response: Response):
+    """
+    Readiness probe: 200 once the model is loaded (and warmed up) and the database
+    answers, 503 before that. Also reports how long each startup phase took.
+    """
+    if worker_pool is not None:
+        model_ready = worker_pool.is_ready()
+    else:
+        model_ready = model.loaded and (model.warmed_up or not MODEL_WARMUP)
+    checks = {
+        "model": model_ready,
+        "database": check_db(),
+    }
+    is_ready = all(checks.values()) and startup_state["error"] is None
+    if not is_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if is_ready else "starting",
+        "checks": checks,
+        "error": startup_state["error"],
+        "startup_timings": startup_timings,
+    }
+
+
+@app.get("/retention")
+def retention_status():
+    """
+    Retention policy and purge metrics: progress of the running pass, the last
+    pass (deleted rows, files and S3 objects, throughput) and running totals.
+    """
+    if retention is None:
+        return {"enabled": False}
+    return retention.metrics()
+
+
+@app.get("/s3/outbox")
+def s3_outbox_status():
+    """Pending and failed S3 transfers, and transfer counts since startup."""
+    return s3_outbox.metrics()
+
+
+@app.get("/storage")
+def storage_metrics():
+    """Per-operation counts and latencies of the local and object storage backends."""
+    return {
+        "local": local_storage.metrics(),
+        "object": object_storage.metrics() if object_storage is not None else None,
+    }
+
+
+@app.get("/inference/workers")
+def inference_workers():
+    """
+    Per-worker queue depth of the inference process pool (empty when inference runs in-process)
+    """
+    return {"workers": worker_pool.queue_depths() if worker_pool else []}
+
+
 @app.get("/predictions/count")
-def get_prediction_count_last_week(
+async def get_prediction_count_last_week(
     username: str = Depends(get_current_username),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get the number of predictions made in the last 7 days
     """
-    count = count_predictions_last_week(db, username)
+    count = await count_predictions_last_week(db, username)
     return {"count": count}
 
 @app.get("/labels")
-def get_unique_labels_last_week_route(
+async def get_unique_labels_last_week_route(
     username: str = Depends(get_current_username),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all unique object labels detected in the last 7 days
     """
-    labels = get_unique_labels_last_week(db, username)
+    labels = await get_unique_labels_last_week(db, username)
     return {"labels": labels}
 
+def is_local_image(path: str) -> bool:
+    """False for rows stored as object keys (PREDICT_STORAGE=s3, ORIGINAL_PERSIST=none)."""
+    return path.startswith((UPLOAD_DIR, PREDICTED_DIR))
+
+
 def safe_delete_file(path: str):
     logger = logging.getLogger(__name__)
-    if path and os.path.exists(path):
-        try:
-            os.remove(path)
-        except Exception as e:
-            logger.warning(f"Failed to delete file: {path}. Error: {e}")
+    if not path:
+        return
+    try:
+        local_storage.delete(path)
+    except Exception as e:
+        logger.warning(f"Failed to delete file: {path}. Error: {e}")
+
+
+def safe_delete_objects(keys: list[str]):
+    logger = logging.getLogger(__name__)
+    if object_storage is None or not keys:
+        return
+    try:
+        failed = object_storage.delete_many(keys)
+    except Exception as e:
+        failed = keys
+        logger.warning(f"Failed to delete objects: {keys}. Error: {e}")
+    else:
+        if failed:
+            logger.warning(f"Failed to delete objects: {failed}")
 
 
 @app.delete("/prediction/{uid}")
@@ -372,28 +1181,40 @@ def delete_prediction(
 ):
     """
     Delete a specific prediction and clean up associated files.
-    Removes prediction from database and deletes original and predicted image files.
+    Removes prediction from database and deletes original and predicted image files,
+    along with their copies in object storage.
     """
-    paths = get_prediction_file_paths(db, uid, username)
+    # one DELETE ... RETURNING; detections and cache rows go with it (ON DELETE CASCADE)
+    paths = run_write(db, delete_prediction_and_detections, uid, username)
     if not paths:
         raise HTTPException(status_code=404, detail="Prediction not found")
 
-    original_image, predicted_image = paths
-
-    # Delete from DB
-    delete_prediction_and_detections(db, uid, username)
+    original_image, predicted_image, *object_keys = paths
+    if prediction_cache is not None:
+        prediction_cache.invalidate(uid)
 
     # Delete associated files
+    render_cache.pop(predicted_image)
     for path in [original_image, predicted_image]:
-        safe_delete_file(path)
+        if path and is_local_image(path):
+            safe_delete_file(path)
+        else:
+            # zero-disk rows point straight at their object keys
+            object_keys.append(path)
+
+    # S3 copies, and presigned URLs that would otherwise keep being handed out
+    object_keys = list(dict.fromkeys(key for key in object_keys if key))
+    for key in object_keys:
+        presigned_urls.pop(key)
+    safe_delete_objects(object_keys)
 
     return {"status": "deleted", "uid": uid}
 
 
 @app.get("/stats")
-def get_stats_last_week(
+async def get_stats_last_week(
     username: str = Depends(get_current_username),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get analytics about predictions made by the authenticated user in the last 1 week:
@@ -401,7 +1222,10 @@ def get_stats_last_week(
     - Average confidence score
     - Most frequently detected labels
     """
-    return get_user_prediction_stats(db, username)
+    return await get_user_prediction_stats(db, username)
+
+
+startup_timings["import_s"] = round(time.perf_counter() - _IMPORT_START, 3)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,107 @@
+# async_queries.py
+#
+# AsyncSession versions of the read queries in queries.py, used by the async
+# read endpoints. Writes stay in queries.py.
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from models import PredictionSession, DetectionObject, VideoSession, VideoTrack
+from models import UserHourlyStats, UserHourlyLabelCount
+from queries import search_detections_statement, predictions_page_statement, hour_bucket, PREDICTIONS_PAGE_SIZE
+
+
+async def get_prediction(db: AsyncSession, uid: str, username: str):
+    result = await db.execute(select(PredictionSession).filter_by(uid=uid, username=username).limit(1))
+    return result.scalars().first()
+
+async def get_prediction_with_detections(db: AsyncSession, uid: str, username: str):
+    # session and detections in one round trip (LEFT OUTER JOIN)
+    result = await db.execute(
+        select(PredictionSession)
+        .options(joinedload(PredictionSession.detections))
+        .filter_by(uid=uid, username=username)
+    )
+    return result.unique().scalars().first()
+
+async def get_detections(db: AsyncSession, uid: str):
+    result = await db.execute(select(DetectionObject).filter_by(prediction_uid=uid))
+    return result.scalars().all()
+
+async def get_predictions_by_label(db: AsyncSession, label: str, username: str, cursor: str | None = None,
+                                   limit: int = PREDICTIONS_PAGE_SIZE):
+    result = await db.execute(predictions_page_statement(username, DetectionObject.label == label, cursor, limit))
+    return result.all()
+
+async def get_predictions_by_score(db: AsyncSession, min_score: float, username: str, cursor: str | None = None,
+                                   limit: int = PREDICTIONS_PAGE_SIZE):
+    result = await db.execute(predictions_page_statement(username, DetectionObject.score >= min_score, cursor, limit))
+    return result.all()
+
+async def search_detections(db: AsyncSession, username: str, **filters):
+    result = await db.execute(search_detections_statement(username, **filters))
+    return result.all()
+
+def last_week_start():
+    # rollups have hourly resolution: the window starts at the hour seven days ago
+    return hour_bucket(datetime.utcnow() - timedelta(days=7))
+
+async def count_predictions_last_week(db: AsyncSession, username: str) -> int:
+    return await db.scalar(
+        select(func.coalesce(func.sum(UserHourlyStats.prediction_count), 0)).where(
+            UserHourlyStats.username == username,
+            UserHourlyStats.hour >= last_week_start()
+        )
+    )
+
+async def get_unique_labels_last_week(db: AsyncSession, username: str) -> list[str]:
+    result = await db.execute(
+        select(UserHourlyLabelCount.label)
+        .where(
+            UserHourlyLabelCount.username == username,
+            UserHourlyLabelCount.hour >= last_week_start(),
+            UserHourlyLabelCount.count > 0
+        )
+        .distinct()
+    )
+    return list(result.scalars())
+
+async def get_user_prediction_stats(db: AsyncSession, username: str):
+    """Weekly stats from the hourly rollups: at most 168 rows per user, however many detections."""
+    since = last_week_start()
+
+    totals = (await db.execute(
+        select(
+            func.coalesce(func.sum(UserHourlyStats.prediction_count), 0),
+            func.coalesce(func.sum(UserHourlyStats.detection_count), 0),
+            func.coalesce(func.sum(UserHourlyStats.score_sum), 0.0),
+        ).where(UserHourlyStats.username == username, UserHourlyStats.hour >= since)
+    )).one()
+    total_predictions, detection_count, score_sum = totals
+
+    count = func.sum(UserHourlyLabelCount.count).label("count")
+    label_counts = await db.execute(
+        select(UserHourlyLabelCount.label, count)
+        .where(UserHourlyLabelCount.username == username, UserHourlyLabelCount.hour >= since)
+        .group_by(UserHourlyLabelCount.label)
+        .having(count > 0)
+        .order_by(count.desc())
+        .limit(5)
+    )
+
+    return {
+        "total_predictions": total_predictions,
+        "average_confidence": score_sum / detection_count if detection_count else 0.0,
+        "most_frequent_labels": [{"label": row.label, "count": row.count} for row in label_counts]
+    }
+
+async def get_video_prediction(db: AsyncSession, uid: str, username: str):
+    result = await db.execute(select(VideoSession).filter_by(uid=uid, username=username).limit(1))
+    return result.scalars().first()
+
+async def get_video_tracks(db: AsyncSession, uid: str):
+    result = await db.execute(select(VideoTrack).filter_by(video_uid=uid).order_by(VideoTrack.track_id))
+    return result.scalars().all()
@@ -0,0 +1,298 @@
+# benchmark_s3.py
+#
+# Uploads and downloads the objects of many concurrent predictions through the
+# s3_utils functions the app uses, once per client configuration, and reports
+# throughput, latency and how many TCP connections each configuration opened.
+#
+# By default it runs against a small S3-compatible stand-in served from a child
+# process (objects in memory, --latency-ms added to every request), so it needs
+# no bucket or credentials. --endpoint-url points it at MinIO or a moto server.
+#
+#   python benchmark_s3.py                                   # built-in stand-in
+#   python benchmark_s3.py --predictions 64 --pool 10 32 64 --latency-ms 20
+#   python benchmark_s3.py --size-kb 20480 --transfer-concurrency 1 4 8
+#   python benchmark_s3.py --endpoint-url http://localhost:9000 --bucket bench
+
+import io
+import os
+import re
+import time
+import uuid
+import hashlib
+import argparse
+import threading
+import statistics
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+from urllib.request import urlopen
+
+from botocore.exceptions import ClientError
+
+import s3_utils
+from s3_utils import make_s3_client, transfer_config, S3_MULTIPART_THRESHOLD_MB, S3_MULTIPART_CHUNK_MB
+
+
+class StandInS3(ThreadingHTTPServer):
+    """
+    Just enough of the S3 REST API for the calls s3_utils makes: Put/Get/Head/
+    Delete/CopyObject, ranged GETs and multipart uploads, path-style addressing.
+    """
+
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, latency_ms: float = 0.0):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.latency = latency_ms / 1000.0
+        self.objects = {}
+        self.uploads = {}
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client-side pooling shows up in the numbers
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def _start(self):
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        self.key = unquote(parts.path.lstrip("/"))
+        self.query = parse_qs(parts.query, keep_blank_values=True)
+
+    def _stats(self):
+        # not S3: lets the benchmark read the counters of the child process
+        body = f"{self.server.connections} {self.server.requests}".encode()
+        self._send(200, body, {"Content-Type": "text/plain"})
+
+    def _body(self) -> bytes:
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if "x-amz-decoded-content-length" in self.headers:
+            data = decode_aws_chunked(data)
+        return data
+
+    def _send(self, status: int, body: bytes = b"", headers: dict | None = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _missing(self):
+        self._send(404, b"<Error><Code>NoSuchKey</Code><Message>Not found</Message></Error>",
+                   {"Content-Type": "application/xml"})
+
+    def do_PUT(self):
+        self._start()
+        body = self._body()
+        if "uploadId" in self.query:
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            with self.server.lock:
+                self.server.uploads[self.query["uploadId"][0]][int(self.query["partNumber"][0])] = body
+            return self._send(200, headers={"ETag": etag})
+        source = self.headers.get("x-amz-copy-source")
+        if source:
+            with self.server.lock:
+                data = self.server.objects.get(unquote(source).lstrip("/"))
+                if data is None:
+                    return self._missing()
+                self.server.objects[self.key] = data
+            etag = f'"{hashlib.md5(data).hexdigest()}"'
+            return self._send(200, f"<CopyObjectResult><ETag>{etag}</ETag></CopyObjectResult>".encode(),
+                              {"Content-Type": "application/xml"})
+        with self.server.lock:
+            self.server.objects[self.key] = body
+        self._send(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def do_POST(self):
+        self._start()
+        self._body()
+        bucket, _, key = self.key.partition("/")
+        if "uploads" in self.query:
+            upload_id = uuid.uuid4().hex
+            with self.server.lock:
+                self.server.uploads[upload_id] = {}
+            return self._send(200, (f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                                    f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>").encode(),
+                              {"Content-Type": "application/xml"})
+        with self.server.lock:
+            parts = self.server.uploads.pop(self.query["uploadId"][0])
+            self.server.objects[self.key] = b"".join(parts[number] for number in sorted(parts))
+        self._send(200, (f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                         f"<ETag>\"multipart\"</ETag></CompleteMultipartUploadResult>").encode(),
+                   {"Content-Type": "application/xml"})
+
+    def do_GET(self):
+        self._start()
+        if self.key == "_stats":
+            return self._stats()
+        with self.server.lock:
+            data = self.server.objects.get(self.key)
+        if data is None:
+            return self._missing()
+        headers = {"ETag": f'"{len(data)}"', "Content-Type": "application/octet-stream", "Accept-Ranges": "bytes"}
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return self._send(206, data[start:end + 1], headers)
+        self._send(200, data, headers)
+
+    def do_HEAD(self):
+        self._start()
+        with self.server.lock:
+            data = self.server.objects.get(self.key)
+        if data is None:
+            return self._send(404)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", f'"{len(data)}"')
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_DELETE(self):
+        self._start()
+        with self.server.lock:
+            self.server.objects.pop(self.key, None)
+        self._send(204)
+
+
+def decode_aws_chunked(data: bytes) -> bytes:
+    """Strip aws-chunked framing (size;signature lines, trailing checksum headers) from an upload body."""
+    out, pos = [], 0
+    while pos < len(data):
+        line_end = data.index(b"\r\n", pos)
+        size = int(data[pos:line_end].split(b";")[0], 16)
+        if size == 0:
+            break
+        out.append(data[line_end + 2:line_end + 2 + size])
+        pos = line_end + 2 + size + 2
+    return b"".join(out)
+
+
+def serve(latency_ms: float, ready):
+    server = StandInS3(latency_ms)
+    ready.put(server.url)
+    server.serve_forever()
+
+
+def start_stand_in(latency_ms: float):
+    """Run the stand-in in a child process so it does not compete with the client for the GIL."""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(latency_ms, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=10)
+
+
+def stand_in_stats(client) -> tuple[int, int]:
+    """(connections accepted, requests served) so far by the stand-in."""
+    with urlopen(client.meta.endpoint_url + "/_stats") as response:
+        connections, requests = response.read().split()
+    return int(connections), int(requests)
+
+
+def run(bucket: str, predictions: int, size: int) -> dict:
+    """
+    predictions threads each store an original and an annotated image and read
+    one back, through s3_utils with the client and TransferConfig under test.
+    """
+    payload = os.urandom(size)
+    latencies = []
+    lock = threading.Lock()
+
+    def one_prediction(index):
+        start = time.perf_counter()
+        prefix = f"bench/{uuid.uuid4()}"
+        s3_utils.upload_fileobj(bucket, f"{prefix}/original.jpg", io.BytesIO(payload))
+        s3_utils.upload_bytes(bucket, f"{prefix}/predicted.jpg", payload)
+        assert s3_utils.download_bytes(bucket, f"{prefix}/predicted.jpg") == payload
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=predictions) as executor:
+        list(executor.map(one_prediction, range(predictions)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "predictions_per_s": predictions / elapsed,
+        "mib_per_s": predictions * 3 * size / elapsed / (1024 * 1024),
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[max(0, int(len(latencies) * 0.99) - 1)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark S3 client pool and transfer settings")
+    parser.add_argument("--endpoint-url", help="S3-compatible endpoint (default: built-in stand-in)")
+    parser.add_argument("--bucket", default="benchmark")
+    parser.add_argument("--predictions", type=int, default=64, help="Concurrent predictions per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--size-kb", type=int, default=200, help="Size of each image")
+    parser.add_argument("--pool", type=int, nargs="+", default=[10, 32, 64], help="max_pool_connections values")
+    parser.add_argument("--transfer-concurrency", type=int, nargs="+", default=[4])
+    parser.add_argument("--threshold-mb", type=float, default=S3_MULTIPART_THRESHOLD_MB)
+    parser.add_argument("--chunk-mb", type=float, default=S3_MULTIPART_CHUNK_MB)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Per-request delay of the stand-in")
+    args = parser.parse_args()
+
+    process = None
+    endpoint_url = args.endpoint_url
+    if endpoint_url is None:
+        process, endpoint_url = start_stand_in(args.latency_ms)
+        # the stand-in does not check signatures, but botocore needs something to sign with
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    print(f"{endpoint_url}, {args.predictions} concurrent predictions x {args.rounds} rounds, "
+          f"{args.size_kb} KiB images, multipart >= {args.threshold_mb} MiB in {args.chunk_mb} MiB parts")
+    print(f"{'pool':>5} {'xfer':>5} {'pred/s':>8} {'MiB/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'conns':>7}")
+    try:
+        for pool in args.pool:
+            for concurrency in args.transfer_concurrency:
+                client = make_s3_client(max_pool_connections=pool, endpoint_url=endpoint_url)
+                # what get_s3_client() and the transfer functions pick up
+                s3_utils._s3 = client
+                s3_utils.TRANSFER_CONFIG = transfer_config(args.threshold_mb, args.chunk_mb, concurrency)
+                if process is None:
+                    try:
+                        client.create_bucket(Bucket=args.bucket)
+                    except ClientError:
+                        pass  # already exists
+                before = stand_in_stats(client) if process else None
+                rounds = [run(args.bucket, args.predictions, args.size_kb * 1024) for _ in range(args.rounds)]
+                opened = (stand_in_stats(client)[0] - before[0] - 1) if process else "-"
+                best = max(rounds, key=lambda stats: stats["predictions_per_s"])
+                print(f"{pool:>5} {concurrency:>5} {best['predictions_per_s']:>8.1f} {best['mib_per_s']:>8.1f} "
+                      f"{best['p50_ms']:>9.1f} {best['p99_ms']:>9.1f} {opened:>7}")
+                client.close()
+    finally:
+        if process:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# db_routing.py
+
+import itertools
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """
+    Round-robin choice among healthy read replicas.
+
+    A background thread runs SELECT 1 against every replica each
+    health_interval_s seconds; pick() only reads the last result, so routing
+    never waits on a probe. Replicas count as healthy until a probe fails.
+    pick() returns the index of the next healthy replica, or None when all of
+    them are down and reads have to fall back to the primary.
+    """
+
+    def __init__(self, engines: list, health_interval_s: float = 10.0):
+        self.engines = engines
+        self.health_interval = health_interval_s
+        self.healthy = [True] * len(engines)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def pick(self) -> int | None:
+        self._ensure_started()
+        for _ in range(len(self.engines)):
+            index = next(self._next) % len(self.engines)
+            if self.healthy[index]:
+                return index
+        return None
+
+    def check(self):
+        """Probe every replica once and record which ones answer."""
+        for index, engine in enumerate(self.engines):
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                healthy = True
+            except Exception:
+                healthy = False
+            if healthy != self.healthy[index]:
+                logger.warning(f"Read replica {engine.url.render_as_string()} is {'up' if healthy else 'down'}")
+            self.healthy[index] = healthy
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-replica-health", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.check()
+            time.sleep(self.health_interval)
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a replica and everything else to the primary.
+
+    INSERT/UPDATE/DELETE statements and ORM flushes are bound to the primary
+    (the session's bind). Once a session has written, or use_primary() was
+    called on it, it stays on the primary so it reads its own writes.
+    replicas are the engines to bind reads to, in the router's order.
+    """
+
+    def __init__(self, *args, router: ReplicaRouter | None = None, replicas: list | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self.replicas = replicas or []
+        self.use_primary = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.router is None or self.use_primary:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.use_primary = True
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        index = self.router.pick()
+        if index is None:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.replicas[index]
+
+
+def use_primary(db):
+    """Send the rest of this session's queries (sync or async session) to the primary."""
+    session = getattr(db, "sync_session", db)
+    if isinstance(session, RoutingSession):
+        session.use_primary = True
+    return db
+
+
+def routes_reads(db) -> bool:
+    """True while the session's reads may be served by a (possibly lagging) replica."""
+    session = getattr(db, "sync_session", db)
+    return isinstance(session, RoutingSession) and session.router is not None and not session.use_primary
@@ -0,0 +1,96 @@
+# db_writer.py
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Largest number of write jobs committed together
+SQLITE_WRITE_BATCH = int(os.getenv("SQLITE_WRITE_BATCH", "64"))
+# How long the writer waits for more jobs to join a commit
+SQLITE_WRITE_WAIT_MS = float(os.getenv("SQLITE_WRITE_WAIT_MS", "2"))
+
+
+class WriteQueue:
+    """
+    Single writer thread with group commit.
+
+    SQLite allows one writer at a time; many request threads writing at once
+    end in "database is locked" and one fsync per commit. Here every write job
+    is handed to one thread that owns its own session, runs all jobs queued
+    within max_wait_ms and commits them together. Callers block on the returned
+    future until their job is committed.
+
+    A job is fn(session, *args, commit=False, **kwargs): a write query that
+    stages its changes and leaves committing to the writer. If a group fails,
+    it is rolled back and its jobs are retried one by one so only the failing
+    job reports the error.
+    """
+
+    def __init__(self, session_factory, max_batch_size: int = SQLITE_WRITE_BATCH,
+                 max_wait_ms: float = SQLITE_WRITE_WAIT_MS):
+        self.session_factory = session_factory
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.commits = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        self._ensure_started()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            with self.session_factory() as db:
+                self._run_batch(db, batch)
+
+    def _run_batch(self, db, batch: list):
+        try:
+            results = []
+            for fn, args, kwargs, _ in batch:
+                results.append(fn(db, *args, commit=False, **kwargs))
+                db.flush()
+            db.commit()
+            self.commits += 1
+        except Exception as e:
+            db.rollback()
+            if len(batch) == 1:
+                batch[0][3].set_exception(e)
+            else:
+                for job in batch:
+                    self._run_batch(db, [job])
+            return
+
+        for (_, _, _, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,149 @@
+# engines.py
+
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# torch | onnx | openvino
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+MODEL_WEIGHTS = os.getenv("MODEL_WEIGHTS", "yolov8n.pt")
+# Side of the synthetic image used for the warm-up inference
+WARMUP_IMGSZ = int(os.getenv("WARMUP_IMGSZ", "640"))
+
+
+class InferenceEngine:
+    """
+    Common interface of all inference backends.
+
+    Engines are called like an ultralytics model: engine(sources, **kwargs) returns
+    one Results per source, and engine.names maps class indices to labels. Exported
+    backends go through the same ultralytics pre/post-processing (letterbox, NMS),
+    so every backend hands predict() identical labels, scores and boxes.
+    """
+
+    backend = None
+    export_format = None
+
+    def __init__(self, weights: str = MODEL_WEIGHTS):
+        self.weights = weights
+        self.model = self._load()
+
+    @classmethod
+    def artifact_path(cls, weights: str = MODEL_WEIGHTS) -> str:
+        return weights
+
+    def _load(self):
+        from ultralytics import YOLO
+        return YOLO(self.artifact_path(self.weights), task="detect")
+
+    @property
+    def names(self) -> dict:
+        return self.model.names
+
+    def __call__(self, sources, **kwargs):
+        kwargs.setdefault("verbose", False)
+        return self.model(sources, **kwargs)
+
+
+class TorchEngine(InferenceEngine):
+    """PyTorch eager execution of the .pt weights."""
+    backend = "torch"
+
+    def _load(self):
+        from ultralytics import YOLO
+        return YOLO(self.weights)
+
+
+class OnnxEngine(InferenceEngine):
+    """ONNX Runtime (CPU execution provider) on <weights>.onnx."""
+    backend = "onnx"
+    export_format = "onnx"
+
+    @classmethod
+    def artifact_path(cls, weights: str = MODEL_WEIGHTS) -> str:
+        return os.path.splitext(weights)[0] + ".onnx"
+
+
+class OpenVinoEngine(InferenceEngine):
+    """OpenVINO CPU plugin on the <weights>_openvino_model/ directory."""
+    backend = "openvino"
+    export_format = "openvino"
+
+    @classmethod
+    def artifact_path(cls, weights: str = MODEL_WEIGHTS) -> str:
+        return os.path.splitext(weights)[0] + "_openvino_model"
+
+
+ENGINES = {engine.backend: engine for engine in (TorchEngine, OnnxEngine, OpenVinoEngine)}
+
+
+def get_engine_class(backend: str = INFERENCE_BACKEND) -> type[InferenceEngine]:
+    if backend not in ENGINES:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of: {', '.join(ENGINES)}")
+    return ENGINES[backend]
+
+
+def load_engine(backend: str = INFERENCE_BACKEND, weights: str = MODEL_WEIGHTS) -> InferenceEngine:
+    engine_class = get_engine_class(backend)
+    path = engine_class.artifact_path(weights)
+    if engine_class is not TorchEngine and not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found, run: python export_model.py {backend}")
+
+    # Disable GPU usage
+    import torch
+    torch.cuda.is_available = lambda: False
+    return engine_class(weights)
+
+
+def warmup_engine(engine, imgsz: int = WARMUP_IMGSZ):
+    """One inference on a synthetic image so the first real request doesn't pay for lazy init."""
+    import numpy as np
+    engine([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)], device="cpu")
+
+
+class LazyEngine:
+    """
+    Engine that is only built when first used.
+
+    Importing the app stays cheap (no torch/ultralytics, no weights download);
+    the server calls load() and warmup() during startup, while tools and tests
+    that never run inference never pay for it. Thread-safe.
+    """
+
+    def __init__(self, backend: str = INFERENCE_BACKEND, weights: str = MODEL_WEIGHTS):
+        self.backend = backend
+        self.weights = weights
+        self.warmed_up = False
+        self.timings = {}
+        self._engine = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._engine is not None
+
+    def load(self) -> InferenceEngine:
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    start = time.perf_counter()
+                    self._engine = load_engine(self.backend, self.weights)
+                    self.timings["model_load_s"] = round(time.perf_counter() - start, 3)
+        return self._engine
+
+    def warmup(self, imgsz: int = WARMUP_IMGSZ):
+        engine = self.load()
+        start = time.perf_counter()
+        warmup_engine(engine, imgsz)
+        self.timings["warmup_s"] = round(time.perf_counter() - start, 3)
+        self.warmed_up = True
+
+    @property
+    def names(self) -> dict:
+        return self.load().names
+
+    def __call__(self, sources, **kwargs):
+        return self.load()(sources, **kwargs)
@@ -0,0 +1,53 @@
+# export_model.py
+
+import sys
+import numpy as np
+
+from engines import ENGINES, MODEL_WEIGHTS, TorchEngine, get_engine_class, load_engine
+
+SAMPLE_IMAGE = "beatles.jpg"
+
+
+def export(backend: str, weights: str = MODEL_WEIGHTS) -> str:
+    from ultralytics import YOLO
+
+    engine_class = get_engine_class(backend)
+    if engine_class.export_format is None:
+        raise ValueError(f"'{backend}' runs the weights directly, nothing to export")
+    # dynamic axes so the batching scheduler can send any batch size
+    return YOLO(weights).export(format=engine_class.export_format, dynamic=True)
+
+
+def check_parity(backend: str, weights: str = MODEL_WEIGHTS, image: str = SAMPLE_IMAGE, atol: float = 2.0) -> bool:
+    """Compare the exported backend with torch eager on a sample image."""
+    reference = TorchEngine(weights)([image], device="cpu")[0]
+    exported = load_engine(backend, weights)([image], device="cpu")[0]
+
+    ref_labels = [reference.names[int(c)] for c in reference.boxes.cls.tolist()]
+    exp_labels = [exported.names[int(c)] for c in exported.boxes.cls.tolist()]
+    if ref_labels != exp_labels:
+        print(f"❌ {backend}: labels differ {ref_labels} vs {exp_labels}")
+        return False
+    if not np.allclose(reference.boxes.xyxy.numpy(), exported.boxes.xyxy.numpy(), atol=atol):
+        print(f"❌ {backend}: boxes differ by more than {atol}px")
+        return False
+    if not np.allclose(reference.boxes.conf.numpy(), exported.boxes.conf.numpy(), atol=0.02):
+        print(f"❌ {backend}: scores differ")
+        return False
+    print(f"✅ {backend}: {len(exp_labels)} detections match torch eager")
+    return True
+
+
+if __name__ == "__main__":
+    backends = sys.argv[1:] or [b for b, engine in ENGINES.items() if engine.export_format]
+    if any(b not in ENGINES for b in backends):
+        print(f"Usage: python export_model.py [{'|'.join(ENGINES)} ...]")
+        sys.exit(1)
+
+    ok = True
+    for backend in backends:
+        if get_engine_class(backend).export_format is None:
+            continue
+        print(f"✅ Exported {backend}: {export(backend)}")
+        ok = check_parity(backend) and ok
+    sys.exit(0 if ok else 1)
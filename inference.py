@@ -0,0 +1,145 @@
+# inference.py
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Largest number of images sent through the model in one forward pass
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+# How long the first request of a batch may wait for others to join it
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+# Tier applied when a request asks for none
+INFERENCE_DEFAULT_TIER = os.getenv("INFERENCE_DEFAULT_TIER", "balanced")
+
+# Model options per quality tier; explicit request parameters override them.
+# "balanced" is the ultralytics default pipeline (640px, conf 0.25, 300 boxes).
+QUALITY_TIERS = {
+    "fast": {"imgsz": 320, "conf": 0.35, "max_det": 30},
+    "balanced": {},
+    "accurate": {"imgsz": 960, "conf": 0.15},
+}
+
+
+def resolve_inference_options(names: dict, tier: str | None = None, imgsz: int | None = None,
+                              conf: float | None = None, max_det: int | None = None,
+                              classes: list[str] | None = None) -> dict:
+    """
+    Merge a quality tier with explicit parameters into model keyword arguments.
+    classes is an allow-list of label names, translated to class indices.
+    Raises ValueError for an unknown tier or label.
+    """
+    tier = tier or INFERENCE_DEFAULT_TIER
+    if tier not in QUALITY_TIERS:
+        raise ValueError(f"Unknown tier '{tier}', expected one of: {', '.join(QUALITY_TIERS)}")
+
+    options = dict(QUALITY_TIERS[tier])
+    for key, value in (("imgsz", imgsz), ("conf", conf), ("max_det", max_det)):
+        if value is not None:
+            options[key] = value
+
+    if classes:
+        label_to_index = {label: index for index, label in names.items()}
+        unknown = [label for label in classes if label not in label_to_index]
+        if unknown:
+            raise ValueError(f"Unknown class label(s): {', '.join(unknown)}")
+        options["classes"] = sorted({label_to_index[label] for label in classes})
+    return options
+
+
+def options_key(options: dict | None) -> tuple:
+    """Hashable form of inference options; only requests with equal keys share a batch."""
+    return tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in (options or {}).items()))
+
+
+class BatchScheduler:
+    """
+    Collects concurrent inference requests into micro-batches.
+
+    Callers submit one source each and block on the returned future. A single
+    background thread takes the first queued request, keeps collecting until
+    the batch is full or max_wait_ms has passed, runs predict_fn once on the
+    whole batch and hands every caller its own result.
+
+    Requests with different inference options (imgsz, conf, ...) cannot share a
+    forward pass; they are held back and batched together in a later round.
+
+    inference_lock is held while a batch runs; hold it to use the model outside
+    the scheduler (e.g. the startup warmup) without racing a batch.
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms: float = INFERENCE_MAX_WAIT_MS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._backlog = deque()
+        self._lock = threading.Lock()
+        self.inference_lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, source, options: dict | None = None) -> Future:
+        future = Future()
+        self._ensure_started()
+        self._queue.put((source, future, options or {}))
+        return future
+
+    def predict(self, source, options: dict | None = None):
+        return self.submit(source, options).result()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self) -> list:
+        batch = [self._backlog.popleft() if self._backlog else self._queue.get()]
+        key = options_key(batch[0][2])
+
+        held_back, earlier = deque(), self._backlog
+        while earlier and len(batch) < self.max_batch_size:
+            item = earlier.popleft()
+            (batch if options_key(item[2]) == key else held_back).append(item)
+        held_back.extend(earlier)
+
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            (batch if options_key(item[2]) == key else held_back).append(item)
+
+        self._backlog = held_back
+        return batch
+
+    def _run(self):
+        while True:
+            self._run_batch(self._collect_batch())
+
+    def _run_batch(self, batch: list):
+        sources = [source for source, _, _ in batch]
+        try:
+            with self.inference_lock:
+                results = list(self.predict_fn(sources, **batch[0][2]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"Model returned {len(results)} results for a batch of {len(batch)}")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
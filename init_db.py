@@ -1,9 +1,9 @@
 # init_db.py
 
 from db import engine
-from models import Base
+from migrations import migrate
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+# Create tables if they don't exist and apply pending migrations
+migrate(engine)
 
 print("✅ Database initialized!")
@@ -0,0 +1,311 @@
+# migrations.py
+#
+# Versioned schema migrations for SQLite and Postgres.
+#
+#   python migrations.py            # create missing tables, apply pending migrations
+#   python migrations.py --status   # list applied and pending migrations
+#
+# create_all() only creates tables that don't exist yet; anything that changes an
+# existing table (new indexes, columns, backfills) goes here as a numbered step.
+# Steps must be idempotent: on a fresh database create_all() has already built
+# the current schema and the steps only get recorded.
+#
+# Every replica may run migrate() at startup, so runs are serialized: a session
+# advisory lock on Postgres, BEGIN EXCLUSIVE around each step on SQLite. Applied
+# versions are checked again once the lock is held. On Postgres, indexes on the
+# live tables are built with CREATE INDEX CONCURRENTLY, outside a transaction,
+# so writes are not blocked while they build.
+
+import ast
+import time
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, UTC
+
+from sqlalchemy import Column, Integer, String, DateTime, MetaData, Table, select, text, inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from models import Base
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# advisory lock key held by the process that is migrating
+MIGRATION_LOCK_ID = 7_404_281_316
+# Seconds between attempts to take the migration lock
+MIGRATION_LOCK_POLL_S = 0.5
+
+
+def concurrent_ddl(conn: Connection) -> bool:
+    """True for Postgres connections outside a transaction, where indexes are built CONCURRENTLY."""
+    return (conn.dialect.name == "postgresql"
+            and conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT")
+
+
+def create_index(conn: Connection, name: str, table: str, columns: str):
+    if not concurrent_ddl(conn):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+        return
+    # a CONCURRENTLY build that failed half way leaves an invalid index behind
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+def drop_index(conn: Connection, name: str):
+    concurrently = " CONCURRENTLY" if concurrent_ddl(conn) else ""
+    conn.execute(text(f"DROP INDEX{concurrently} IF EXISTS {name}"))
+
+
+def add_prediction_indexes(conn: Connection):
+    for name, table, columns in (
+        ("ix_prediction_sessions_username_timestamp", "prediction_sessions", "username, timestamp"),
+        ("ix_detection_objects_prediction_uid", "detection_objects", "prediction_uid"),
+        ("ix_detection_objects_label_prediction_uid", "detection_objects", "label, prediction_uid"),
+        ("ix_detection_objects_score_prediction_uid", "detection_objects", "score, prediction_uid"),
+    ):
+        create_index(conn, name, table, columns)
+
+
+def column_names(conn: Connection, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+BOX_COLUMNS = (("x1", "FLOAT"), ("y1", "FLOAT"), ("x2", "FLOAT"), ("y2", "FLOAT"))
+
+
+def split_box_column(conn: Connection, table: str, extra_columns=(), batch_size: int = 1000):
+    """Replace table's stringified box column with numeric x1/y1/x2/y2 (plus extra_columns)."""
+    columns = column_names(conn, table)
+    for name, type_ in BOX_COLUMNS + tuple(extra_columns):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {type_}"))
+    if "box" not in columns:
+        return
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            f"SELECT id, box FROM {table} WHERE id > :last_id AND box IS NOT NULL ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": batch_size}).all()
+        if not rows:
+            break
+        updates = []
+        for row_id, box in rows:
+            x1, y1, x2, y2 = (float(v) for v in ast.literal_eval(box))
+            updates.append({"id": row_id, "x1": x1, "y1": y1, "x2": x2, "y2": y2})
+        conn.execute(text(
+            f"UPDATE {table} SET x1 = :x1, y1 = :y1, x2 = :x2, y2 = :y2 WHERE id = :id"
+        ), updates)
+        last_id = rows[-1][0]
+
+    conn.execute(text(f"ALTER TABLE {table} DROP COLUMN box"))
+
+
+def split_detection_boxes(conn: Connection):
+    """Numeric boxes for detections (plus image size columns) and video tracks."""
+    # Old rows only stored the box; their image size stays unknown (NULL)
+    split_box_column(conn, "detection_objects", extra_columns=(("img_w", "INTEGER"), ("img_h", "INTEGER")))
+    split_video_track_boxes(conn)
+
+
+def split_video_track_boxes(conn: Connection):
+    # also a step of its own, for databases that ran split_detection_boxes before it covered video tracks
+    split_box_column(conn, "video_tracks")
+
+
+def keyset_prediction_index(conn: Connection):
+    # (username, timestamp, uid) serves keyset pagination and replaces its prefix index
+    create_index(conn, "ix_prediction_sessions_username_timestamp_uid", "prediction_sessions",
+                 "username, timestamp, uid")
+    drop_index(conn, "ix_prediction_sessions_username_timestamp")
+
+
+def build_rollups(conn: Connection):
+    # the rollup tables come from create_all(); fill them from existing predictions
+    from rollups import rebuild_rollups
+    rebuild_rollups(Session(bind=conn))
+
+
+CASCADE_FOREIGN_KEYS = [
+    # (table, column, referenced table)
+    ("detection_objects", "prediction_uid", "prediction_sessions"),
+    ("prediction_cache", "prediction_uid", "prediction_sessions"),
+    ("video_tracks", "video_uid", "video_sessions"),
+]
+
+
+def cascade_child_deletes(conn: Connection):
+    """Recreate the child foreign keys with ON DELETE CASCADE."""
+    inspector = inspect(conn)
+    for table, column, parent in CASCADE_FOREIGN_KEYS:
+        foreign_key = next(
+            fk for fk in inspector.get_foreign_keys(table) if fk["constrained_columns"] == [column]
+        )
+        if (foreign_key.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+            continue
+
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{foreign_key["name"]}"'))
+            # NOT VALID skips the scan of existing rows under the ALTER TABLE lock;
+            # validate_cascade_foreign_keys checks them afterwards
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) "
+                f"REFERENCES {parent} (uid) ON DELETE CASCADE NOT VALID"
+            ))
+            continue
+
+        # SQLite cannot alter a constraint: rebuild the table from its model
+        # definition and copy the rows over. Orphans (which the cascade would
+        # have removed) are dropped.
+        columns = ", ".join(c["name"] for c in inspector.get_columns(table))
+        for index in inspector.get_indexes(table):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        conn.execute(text(f"ALTER TABLE {table} RENAME TO {table}_old"))
+        Base.metadata.tables[table].create(bind=conn)
+        conn.execute(text(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_old "
+            f"WHERE {column} IS NULL OR {column} IN (SELECT uid FROM {parent})"
+        ))
+        conn.execute(text(f"DROP TABLE {table}_old"))
+
+
+def validate_cascade_foreign_keys(conn: Connection):
+    """Check existing rows against the NOT VALID keys of step 5 without blocking writes (Postgres)."""
+    if conn.dialect.name != "postgresql":
+        return
+    for table, column, _ in CASCADE_FOREIGN_KEYS:
+        conn.execute(text(f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_fkey"))
+
+
+def retention_columns(conn: Connection):
+    columns = column_names(conn, "prediction_sessions")
+    for name in ("s3_original_key", "s3_predicted_key"):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE prediction_sessions ADD COLUMN {name} VARCHAR"))
+    create_index(conn, "ix_prediction_sessions_timestamp", "prediction_sessions", "timestamp")
+
+
+def outbox_prediction_uid(conn: Connection):
+    # rows queued before this step keep a NULL uid and are always transferred
+    if "prediction_uid" not in column_names(conn, "s3_outbox"):
+        conn.execute(text(
+            "ALTER TABLE s3_outbox ADD COLUMN prediction_uid VARCHAR "
+            "REFERENCES prediction_sessions (uid) ON DELETE CASCADE"
+        ))
+    create_index(conn, "ix_s3_outbox_prediction_uid", "s3_outbox", "prediction_uid")
+
+
+# (version, name, step); append only, never renumber
+MIGRATIONS = [
+    (1, "add_prediction_indexes", add_prediction_indexes),
+    (2, "split_detection_boxes", split_detection_boxes),
+    (3, "keyset_prediction_index", keyset_prediction_index),
+    (4, "build_rollups", build_rollups),
+    (5, "cascade_child_deletes", cascade_child_deletes),
+    (6, "retention_columns", retention_columns),
+    (7, "validate_cascade_foreign_keys", validate_cascade_foreign_keys),
+    (8, "split_video_track_boxes", split_video_track_boxes),
+    (9, "outbox_prediction_uid", outbox_prediction_uid),
+]
+
+# Steps that run outside a transaction on Postgres (CREATE INDEX CONCURRENTLY
+# refuses to run inside one); every statement in them must be safe to repeat
+NON_TRANSACTIONAL_STEPS = {add_prediction_indexes, keyset_prediction_index, retention_columns,
+                           validate_cascade_foreign_keys, outbox_prediction_uid}
+
+
+def applied_versions(conn: Connection) -> set[int]:
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+@contextmanager
+def migration_lock(engine: Engine):
+    """Hold the Postgres migration lock; other migrate() calls wait for it."""
+    if engine.dialect.name != "postgresql":
+        # SQLite steps lock the database themselves (BEGIN EXCLUSIVE)
+        yield
+        return
+    # CREATE INDEX CONCURRENTLY waits for every older snapshot, including that of a
+    # statement blocked in pg_advisory_lock(): waiters poll instead, and between
+    # attempts (autocommit) they hold no snapshot at all
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        while not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}).scalar():
+            time.sleep(MIGRATION_LOCK_POLL_S)
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+
+@contextmanager
+def step_connection(engine: Engine, transactional: bool = True):
+    """Connection for one migration step, in a transaction unless Postgres can build its indexes CONCURRENTLY."""
+    if engine.dialect.name == "sqlite":
+        # pysqlite only begins implicitly before DML; take the write lock up front
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("BEGIN EXCLUSIVE")
+            try:
+                yield conn
+            except BaseException:
+                conn.exec_driver_sql("ROLLBACK")
+                raise
+            conn.exec_driver_sql("COMMIT")
+    elif transactional:
+        with engine.begin() as conn:
+            yield conn
+    else:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            yield conn
+
+
+def migrate(engine: Engine) -> list[str]:
+    """Create missing tables and apply pending migrations, each in its own transaction. Returns the names applied."""
+    applied = []
+    with migration_lock(engine):
+        with step_connection(engine) as conn:
+            Base.metadata.create_all(bind=conn)
+            schema_migrations.create(bind=conn, checkfirst=True)
+
+        for version, name, step in MIGRATIONS:
+            with step_connection(engine, step not in NON_TRANSACTIONAL_STEPS) as conn:
+                # re-checked under the lock: another process may have applied it meanwhile
+                if version in applied_versions(conn):
+                    continue
+                step(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=version, name=name, applied_at=datetime.now(UTC)
+                ))
+            applied.append(name)
+    return applied
+
+
+def status(engine: Engine) -> list[tuple[int, str, bool]]:
+    schema_migrations.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    return [(version, name, version in done) for version, name, _ in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--status", action="store_true", help="only list applied and pending migrations")
+    args = parser.parse_args()
+
+    if args.status:
+        for version, name, done in status(engine):
+            print(f"{version:>4}  {'applied' if done else 'pending':<8} {name}")
+    else:
+        names = migrate(engine)
+        print(f"Applied {len(names)} migration(s): {', '.join(names)}" if names else "Schema is up to date")
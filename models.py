@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Float, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, Float, Integer, ForeignKey, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime, UTC
 # from db import Base
@@ -17,11 +17,125 @@ class PredictionSession(Base):
     original_image = Column(String)
     predicted_image = Column(String)
     username = Column(String, ForeignKey("users.username"))
+    # keys of the S3 copies, so expired predictions can be purged from the bucket;
+    # NULL when S3 is not configured
+    s3_original_key = Column(String)
+    s3_predicted_key = Column(String)
+
+    # rows are removed by ON DELETE CASCADE in the database, not loaded and deleted one by one
+    detections = relationship(
+        "DetectionObject", back_populates="session", order_by="DetectionObject.id",
+        cascade="all, delete-orphan", passive_deletes=True,
+    )
+
+    # Keep in sync with migrations.py, which adds these to existing databases
+    __table_args__ = (
+        # per-user time windows (/stats, /labels, /predictions/count) and the
+        # (timestamp, uid) keyset order of the listing endpoints
+        Index("ix_prediction_sessions_username_timestamp_uid", "username", "timestamp", "uid"),
+        # retention scans for expired predictions across all users
+        Index("ix_prediction_sessions_timestamp", "timestamp"),
+    )
 
 class DetectionObject(Base):
     __tablename__ = "detection_objects"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    prediction_uid = Column(String, ForeignKey("prediction_sessions.uid"))
+    prediction_uid = Column(String, ForeignKey("prediction_sessions.uid", ondelete="CASCADE"))
+    label = Column(String)
+    score = Column(Float)
+    # bounding box in pixels of the original image
+    x1 = Column(Float)
+    y1 = Column(Float)
+    x2 = Column(Float)
+    y2 = Column(Float)
+    # size of the original image; NULL for rows migrated from the old string boxes
+    img_w = Column(Integer)
+    img_h = Column(Integer)
+
+    session = relationship("PredictionSession", back_populates="detections")
+
+    @property
+    def box(self) -> list[float]:
+        return [self.x1, self.y1, self.x2, self.y2]
+
+    __table_args__ = (
+        # detections of one prediction, and the join from prediction_sessions
+        Index("ix_detection_objects_prediction_uid", "prediction_uid"),
+        # /predictions/label/{label}: covers the lookup and the join column
+        Index("ix_detection_objects_label_prediction_uid", "label", "prediction_uid"),
+        # /predictions/score/{min_score}: range scan that also covers the join column
+        Index("ix_detection_objects_score_prediction_uid", "score", "prediction_uid"),
+    )
+
+class PredictionCacheEntry(Base):
+    __tablename__ = "prediction_cache"
+    cache_key = Column(String, primary_key=True)
+    prediction_uid = Column(String, ForeignKey("prediction_sessions.uid", ondelete="CASCADE"), nullable=False, index=True)
+    s3_info = Column(Text)
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
+
+class VideoSession(Base):
+    __tablename__ = "video_sessions"
+    uid = Column(String, primary_key=True, index=True)
+    timestamp = Column(DateTime, default=lambda: datetime.now(UTC))
+    source = Column(String)
+    frame_count = Column(Integer)
+    frames_processed = Column(Integer)
+    fps = Column(Float)
+    stride = Column(Integer)
+    username = Column(String, ForeignKey("users.username"))
+
+class VideoTrack(Base):
+    __tablename__ = "video_tracks"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    video_uid = Column(String, ForeignKey("video_sessions.uid", ondelete="CASCADE"), index=True)
+    track_id = Column(Integer)
     label = Column(String)
     score = Column(Float)
-    box = Column(String)
+    # bounding box in pixels of the frame where the track was last seen
+    x1 = Column(Float)
+    y1 = Column(Float)
+    x2 = Column(Float)
+    y2 = Column(Float)
+    first_frame = Column(Integer)
+    last_frame = Column(Integer)
+
+    @property
+    def box(self) -> list[float]:
+        return [self.x1, self.y1, self.x2, self.y2]
+
+class UserHourlyStats(Base):
+    """Per-user, per-hour rollup of predictions and detection scores, kept in step with writes (see rollups.py)."""
+    __tablename__ = "user_hourly_stats"
+    username = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    prediction_count = Column(Integer, nullable=False, default=0)
+    detection_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+
+class UserHourlyLabelCount(Base):
+    """Per-user, per-hour detection count of each label."""
+    __tablename__ = "user_hourly_label_counts"
+    username = Column(String, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    label = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class S3OutboxEntry(Base):
+    """A pending S3 transfer, kept until it succeeds so uploads survive restarts (see s3_outbox.py)."""
+    __tablename__ = "s3_outbox"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    # copy from this key in the same bucket; the local file or payload is the fallback
+    source_key = Column(String)
+    local_path = Column(String)
+    # image bytes that never reached the local disk
+    payload = Column(LargeBinary)
+    # the prediction the object belongs to; deleting it drops its pending transfers
+    prediction_uid = Column(String, ForeignKey("prediction_sessions.uid", ondelete="CASCADE"), index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, index=True)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=lambda: datetime.now(UTC))
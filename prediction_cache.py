@@ -0,0 +1,124 @@
+# prediction_cache.py
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from db import run_write, use_primary, routes_reads
+from queries import get_cache_entry, save_cache_entry, get_prediction, get_detections, prediction_exists
+
+load_dotenv()
+
+# Entries kept in the in-memory tier; 0 disables the prediction cache
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "0"))
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(content_hash: str, username: str | None, options: dict | None = None) -> str:
+    # Scoped per user so a hit always points at a prediction the caller owns,
+    # and per inference options since tiers yield different detections
+    key = f"{content_hash}:{username or ''}"
+    if options:
+        key += ":" + json.dumps(options, sort_keys=True)
+    return key
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def remove_where(self, predicate):
+        with self._lock:
+            for key in [k for k, v in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class PredictionCache:
+    """
+    Content-hash cache of finished predictions.
+
+    Lookups go to an in-memory LRU first and fall back to the prediction_cache
+    table, which survives restarts and is shared by all workers. A hit carries
+    everything /predict returns: the original uid, its labels, the annotated
+    image path and the S3 keys.
+
+    invalidate() only reaches this process's LRU, so with several API workers
+    a prediction deleted elsewhere can still be in it: memory hits are checked
+    against prediction_sessions (a primary key lookup) before they are served.
+    """
+
+    def __init__(self, max_size: int = PREDICTION_CACHE_SIZE):
+        self.memory = LRUCache(max_size)
+
+    def lookup(self, db: Session, key: str, username: str | None) -> dict | None:
+        hit = self.memory.get(key)
+        if hit is not None:
+            uid = hit["prediction_uid"]
+            # a lagging replica may not have a prediction stored moments ago
+            if prediction_exists(db, uid) or (routes_reads(db) and prediction_exists(use_primary(db), uid)):
+                return hit
+            self.invalidate(uid)
+
+        entry = get_cache_entry(db, key)
+        if entry is None:
+            return None
+        session = get_prediction(db, entry.prediction_uid, username)
+        if session is None:
+            return None
+        hit = {
+            "prediction_uid": session.uid,
+            "labels": [obj.label for obj in get_detections(db, session.uid)],
+            "predicted_image": session.predicted_image,
+            "s3": json.loads(entry.s3_info) if entry.s3_info else None,
+        }
+        self.memory.put(key, hit)
+        return hit
+
+    def store(self, db: Session, key: str, uid: str, labels: list[str], predicted_image: str, s3_info: dict | None):
+        run_write(db, save_cache_entry, key, uid, json.dumps(s3_info) if s3_info else None)
+        self.memory.put(key, {
+            "prediction_uid": uid,
+            "labels": labels,
+            "predicted_image": predicted_image,
+            "s3": s3_info,
+        })
+
+    def invalidate(self, uid: str):
+        self.memory.remove_where(lambda hit: hit["prediction_uid"] == uid)
@@ -1,62 +1,253 @@
-from sqlalchemy.orm import Session
-from models import PredictionSession, DetectionObject, User
-from sqlalchemy import func, distinct
-from datetime import datetime, timedelta
+import os
+import json
+import base64
+from sqlalchemy.orm import Session, joinedload
+from collections import Counter
+from models import PredictionSession, DetectionObject, User, PredictionCacheEntry, VideoSession, VideoTrack
+from models import UserHourlyStats, UserHourlyLabelCount, S3OutboxEntry
+from sqlalchemy import func, insert, select, update, delete, or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, timedelta, UTC
+from dotenv import load_dotenv
 
-def save_prediction(db: Session, uid: str, original_img: str, predicted_img: str, username: str):
+load_dotenv()
+
+# Default and largest page size of the prediction listing endpoints
+PREDICTIONS_PAGE_SIZE = int(os.getenv("PREDICTIONS_PAGE_SIZE", "100"))
+PREDICTIONS_MAX_PAGE_SIZE = int(os.getenv("PREDICTIONS_MAX_PAGE_SIZE", "1000"))
+
+
+def save_prediction(db: Session, uid: str, original_img: str, predicted_img: str, username: str, commit: bool = True):
     row = PredictionSession(
         uid=uid,
+        timestamp=datetime.now(UTC),
         original_image=original_img,
         predicted_image=predicted_img,
         username=username
     )
     db.add(row)
-    db.commit()
+    update_rollups(db, username, row.timestamp, predictions=1)
+    if commit:
+        db.commit()
 
-def save_detection(db: Session, uid: str, label: str, score: float, box: str):
-    obj = DetectionObject(prediction_uid=uid, label=label, score=score, box=str(box))
+def detection_row(uid: str, label: str, score: float, box: list[float],
+                  image_size: tuple[int, int] | None = None) -> dict:
+    x1, y1, x2, y2 = (float(v) for v in box)
+    img_w, img_h = image_size or (None, None)
+    return {
+        "prediction_uid": uid, "label": label, "score": score,
+        "x1": x1, "y1": y1, "x2": x2, "y2": y2, "img_w": img_w, "img_h": img_h,
+    }
+
+def save_detection(db: Session, uid: str, label: str, score: float, box: list[float],
+                   image_size: tuple[int, int] | None = None, commit: bool = True):
+    obj = DetectionObject(**detection_row(uid, label, score, box, image_size))
     db.add(obj)
-    db.commit()
+    session = db.get(PredictionSession, uid)
+    if session is not None and session.timestamp is not None:
+        update_rollups(db, session.username, session.timestamp, detections=[(label, score)])
+    if commit:
+        db.commit()
+
+def save_prediction_with_detections(db: Session, uid: str, original_img: str, predicted_img: str, username: str,
+                                    detections: list[tuple[str, float, list[float]]],
+                                    image_size: tuple[int, int] | None = None,
+                                    s3_keys: tuple[str, str] | None = None, commit: bool = True) -> None:
+    """
+    Insert the session and all of its (label, score, box) detections in one
+    transaction: one commit instead of one per box, and the detection rows go
+    through a single executemany-style bulk INSERT.
+    image_size is the (width, height) of the original image and s3_keys the
+    (original, predicted) keys of its S3 copies. Write queries take
+    commit=False when the caller (the SQLite writer queue) commits for them.
+    """
+    timestamp = datetime.now(UTC)
+    s3_original_key, s3_predicted_key = s3_keys or (None, None)
+    db.add(PredictionSession(
+        uid=uid,
+        timestamp=timestamp,
+        original_image=original_img,
+        predicted_image=predicted_img,
+        username=username,
+        s3_original_key=s3_original_key,
+        s3_predicted_key=s3_predicted_key
+    ))
+    # the session row must exist before the detections that reference it
+    db.flush()
+    if detections:
+        db.execute(insert(DetectionObject), [
+            detection_row(uid, label, score, box, image_size) for label, score, box in detections
+        ])
+    update_rollups(db, username, timestamp, predictions=1,
+                   detections=[(label, score) for label, score, _ in detections])
+    if commit:
+        db.commit()
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    # rollup rows are keyed by the naive UTC hour, like the stored timestamps
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(UTC).replace(tzinfo=None)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def update_rollups(db: Session, username: str | None, timestamp: datetime, predictions: int = 0,
+                   detections: list[tuple[str, float]] = (), sign: int = 1) -> None:
+    """
+    Add (sign=1) or remove (sign=-1) a prediction's contribution to the hourly
+    rollups with upserts, inside the caller's transaction. Anonymous
+    predictions have no per-user stats.
+    """
+    if username is None:
+        return
+    insert_ = dialect_insert(db)
+    hour = hour_bucket(timestamp)
+
+    stats = insert_(UserHourlyStats).values(
+        username=username, hour=hour,
+        prediction_count=sign * predictions,
+        detection_count=sign * len(detections),
+        score_sum=sign * sum(score for _, score in detections),
+    )
+    db.execute(stats.on_conflict_do_update(
+        index_elements=["username", "hour"],
+        set_={
+            "prediction_count": UserHourlyStats.prediction_count + stats.excluded.prediction_count,
+            "detection_count": UserHourlyStats.detection_count + stats.excluded.detection_count,
+            "score_sum": UserHourlyStats.score_sum + stats.excluded.score_sum,
+        },
+    ))
+
+    label_counts = Counter(label for label, _ in detections)
+    if label_counts:
+        labels = insert_(UserHourlyLabelCount).values([
+            {"username": username, "hour": hour, "label": label, "count": sign * count}
+            for label, count in label_counts.items()
+        ])
+        db.execute(labels.on_conflict_do_update(
+            index_elements=["username", "hour", "label"],
+            set_={"count": UserHourlyLabelCount.count + labels.excluded.count},
+        ))
 
 def get_prediction(db: Session, uid: str, username: str):
     return db.query(PredictionSession).filter_by(uid=uid, username=username).first()
 
+def prediction_exists(db: Session, uid: str) -> bool:
+    # primary key lookup, no row loaded
+    return db.query(PredictionSession.uid).filter_by(uid=uid).first() is not None
+
+def get_prediction_with_detections(db: Session, uid: str, username: str):
+    # session and detections in one round trip (LEFT OUTER JOIN)
+    return (
+        db.query(PredictionSession)
+        .options(joinedload(PredictionSession.detections))
+        .filter_by(uid=uid, username=username)
+        .first()
+    )
+
 def get_detections(db: Session, uid: str):
     return db.query(DetectionObject).filter_by(prediction_uid=uid).all()
 
+def search_detections_statement(username: str, label: str | None = None, min_score: float | None = None,
+                                min_area: float | None = None, max_area: float | None = None,
+                                region: tuple[float, float, float, float] | None = None, limit: int = 100):
+    """
+    The user's detections filtered in SQL by label, score, size and position.
+    min_area/max_area are fractions of the image area; region is
+    (min_x, min_y, max_x, max_y) as fractions of the image size and only keeps
+    boxes lying entirely inside it. Size and region filters skip rows whose image
+    size is unknown.
+    """
+    statement = (
+        select(DetectionObject, PredictionSession.timestamp)
+        .join(PredictionSession, DetectionObject.prediction_uid == PredictionSession.uid)
+        .where(PredictionSession.username == username)
+    )
+    if label is not None:
+        statement = statement.where(DetectionObject.label == label)
+    if min_score is not None:
+        statement = statement.where(DetectionObject.score >= min_score)
+
+    area = (DetectionObject.x2 - DetectionObject.x1) * (DetectionObject.y2 - DetectionObject.y1)
+    image_area = DetectionObject.img_w * DetectionObject.img_h
+    if min_area is not None:
+        statement = statement.where(area >= image_area * min_area)
+    if max_area is not None:
+        statement = statement.where(area <= image_area * max_area)
+    if region is not None:
+        min_x, min_y, max_x, max_y = region
+        statement = statement.where(
+            DetectionObject.x1 >= DetectionObject.img_w * min_x,
+            DetectionObject.y1 >= DetectionObject.img_h * min_y,
+            DetectionObject.x2 <= DetectionObject.img_w * max_x,
+            DetectionObject.y2 <= DetectionObject.img_h * max_y,
+        )
+    return statement.order_by(PredictionSession.timestamp.desc(), DetectionObject.id).limit(limit)
+
+def search_detections(db: Session, username: str, **filters):
+    return db.execute(search_detections_statement(username, **filters)).all()
+
 
 def get_user(db: Session, username: str) -> User | None:
     return db.query(User).filter_by(username=username).first()
 
-def create_user(db: Session, username: str, password_hash: str) -> None:
+def create_user(db: Session, username: str, password_hash: str, commit: bool = True) -> None:
     user = User(username=username, password=password_hash)
     db.add(user)
-    db.commit()
+    if commit:
+        db.commit()
 
-def get_predictions_by_label(db: Session, label: str, username: str):
-    return (
-        db.query(PredictionSession.uid, PredictionSession.timestamp)
-        .join(DetectionObject, DetectionObject.prediction_uid == PredictionSession.uid)
-        .filter(
-            DetectionObject.label == label,
-            PredictionSession.username == username
-        )
-        .distinct()
-        .all()
-    )
+def encode_cursor(timestamp: datetime, uid: str) -> str:
+    """Opaque token for the keyset position (timestamp, uid) of the last row of a page."""
+    raw = json.dumps([timestamp.isoformat(), uid]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-def get_predictions_by_score(db: Session, min_score: float, username: str):
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, uid = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(uid)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def predictions_page_statement(username: str, detection_filter, cursor: str | None, limit: int):
+    """
+    One page of the user's sessions that have at least one matching detection,
+    newest first. Keyset pagination on (timestamp, uid) walks the
+    (username, timestamp, uid) index and EXISTS stops at the first matching
+    detection, so neither the page offset nor the detections per session add cost.
+    Selects limit + 1 rows; the extra row only tells whether there is a next page.
+    """
+    matching = (
+        select(DetectionObject.id)
+        .where(DetectionObject.prediction_uid == PredictionSession.uid, detection_filter)
+        .exists()
+    )
+    statement = (
+        select(PredictionSession.uid, PredictionSession.timestamp)
+        .where(PredictionSession.username == username, matching)
+    )
+    if cursor:
+        timestamp, uid = decode_cursor(cursor)
+        statement = statement.where(or_(
+            PredictionSession.timestamp < timestamp,
+            and_(PredictionSession.timestamp == timestamp, PredictionSession.uid < uid),
+        ))
     return (
-        db.query(PredictionSession.uid, PredictionSession.timestamp)
-        .join(DetectionObject, DetectionObject.prediction_uid == PredictionSession.uid)
-        .filter(
-            DetectionObject.score >= min_score,
-            PredictionSession.username == username
-        )
-        .distinct()
-        .all()
+        statement.order_by(PredictionSession.timestamp.desc(), PredictionSession.uid.desc())
+        .limit(limit + 1)
     )
 
+def get_predictions_by_label(db: Session, label: str, username: str, cursor: str | None = None,
+                             limit: int = PREDICTIONS_PAGE_SIZE):
+    statement = predictions_page_statement(username, DetectionObject.label == label, cursor, limit)
+    return db.execute(statement).all()
+
+def get_predictions_by_score(db: Session, min_score: float, username: str, cursor: str | None = None,
+                             limit: int = PREDICTIONS_PAGE_SIZE):
+    statement = predictions_page_statement(username, DetectionObject.score >= min_score, cursor, limit)
+    return db.execute(statement).all()
+
 def is_image_owned_by_user(db: Session, path: str, username: str) -> bool:
     return db.query(PredictionSession).filter(
         PredictionSession.username == username,
@@ -67,27 +258,19 @@ def get_predicted_image_path(db: Session, uid: str, username: str) -> str | None
     result = db.query(PredictionSession.predicted_image).filter_by(uid=uid, username=username).first()
     return result[0] if result else None
 
-def count_predictions_last_week(db: Session, username: str) -> int:
-    one_week_ago = datetime.utcnow() - timedelta(days=7)
-    return db.query(func.count()).select_from(PredictionSession).filter(
+def get_image_s3_keys(db: Session, path: str, username: str) -> tuple[str | None, str | None] | None:
+    """(s3_original_key, s3_predicted_key) of the user's prediction stored at path, or None if not theirs."""
+    result = db.query(PredictionSession.s3_original_key, PredictionSession.s3_predicted_key).filter(
         PredictionSession.username == username,
-        PredictionSession.timestamp >= one_week_ago
-    ).scalar()
-
-def get_unique_labels_last_week(db: Session, username: str) -> list[str]:
-    one_week_ago = datetime.utcnow() - timedelta(days=7)
-
-    results = (
-        db.query(distinct(DetectionObject.label))
-        .join(PredictionSession, DetectionObject.prediction_uid == PredictionSession.uid)
-        .filter(
-            PredictionSession.timestamp >= one_week_ago,
-            PredictionSession.username == username
-        )
-        .all()
-    )
+        (PredictionSession.original_image == path) | (PredictionSession.predicted_image == path)
+    ).first()
+    return tuple(result) if result else None
 
-    return [row[0] for row in results]  # row is a tuple like ('label',)
+def get_predicted_image_keys(db: Session, uid: str, username: str) -> tuple[str, str | None] | None:
+    """(predicted_image, s3_predicted_key) of the user's prediction, or None if not theirs."""
+    result = db.query(PredictionSession.predicted_image, PredictionSession.s3_predicted_key).filter_by(
+        uid=uid, username=username).first()
+    return tuple(result) if result else None
 
 def get_prediction_file_paths(db: Session, uid: str, username: str):
     result = db.query(PredictionSession).filter_by(uid=uid, username=username).first()
@@ -95,60 +278,222 @@ def get_prediction_file_paths(db: Session, uid: str, username: str):
         return None
     return result.original_image, result.predicted_image
 
-def delete_prediction_and_detections(db: Session, uid: str, username: str):
-    # First delete associated detection objects
-    db.query(DetectionObject).filter_by(prediction_uid=uid).delete()
-    
-    # Then delete the prediction session itself
-    db.query(PredictionSession).filter_by(uid=uid, username=username).delete()
-    
-    db.commit()
-
-def get_user_prediction_stats(db: Session, username: str):
-    one_week_ago = datetime.utcnow() - timedelta(days=7)
-
-    # 1. Total predictions
-    total_predictions = (
-        db.query(func.count())
-        .select_from(PredictionSession)
-        .filter(
-            PredictionSession.timestamp >= one_week_ago,
-            PredictionSession.username == username
-        )
-        .scalar()
+def delete_prediction_and_detections(db: Session, uid: str, username: str,
+                                     commit: bool = True) -> tuple[str, str, str | None, str | None] | None:
+    """
+    Delete the user's prediction in one statement; ON DELETE CASCADE removes its
+    detections, cache entries and pending S3 transfers. Returns (original_image, predicted_image,
+    s3_original_key, s3_predicted_key) of the deleted row, or None when the user
+    has no such prediction.
+    """
+    # contribution to the rollups, read before the rows disappear
+    detections = (
+        db.query(DetectionObject.label, DetectionObject.score)
+        .join(PredictionSession, DetectionObject.prediction_uid == PredictionSession.uid)
+        .filter(PredictionSession.uid == uid, PredictionSession.username == username)
+        .all()
     )
+    deleted = db.execute(
+        delete(PredictionSession)
+        .where(PredictionSession.uid == uid, PredictionSession.username == username)
+        .returning(PredictionSession.original_image, PredictionSession.predicted_image,
+                   PredictionSession.s3_original_key, PredictionSession.s3_predicted_key,
+                   PredictionSession.timestamp)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if deleted is None:
+        return None
 
-    # 2. Average confidence score
-    avg_confidence = (
-        db.query(func.avg(DetectionObject.score))
-        .join(PredictionSession, DetectionObject.prediction_uid == PredictionSession.uid)
-        .filter(
-            PredictionSession.timestamp >= one_week_ago,
-            PredictionSession.username == username
-        )
-        .scalar()
-    ) or 0.0
+    if deleted.timestamp is not None:
+        update_rollups(db, username, deleted.timestamp, predictions=1,
+                       detections=[(label, score) for label, score in detections], sign=-1)
+    if commit:
+        db.commit()
+    return deleted.original_image, deleted.predicted_image, deleted.s3_original_key, deleted.s3_predicted_key
 
-    # 3. Most frequent labels
-    label_counts = (
-        db.query(DetectionObject.label, func.count().label("count"))
-        .join(PredictionSession, DetectionObject.prediction_uid == PredictionSession.uid)
-        .filter(
-            PredictionSession.timestamp >= one_week_ago,
-            PredictionSession.username == username
+def expired_predictions_filter(cutoff: datetime | None, user_cutoffs: dict[str, datetime | None]):
+    """
+    WHERE clause for predictions older than their owner's cutoff. cutoff applies
+    to everyone without an entry in user_cutoffs; a None cutoff keeps forever.
+    Returns None when nothing can expire.
+    """
+    clauses = [
+        and_(PredictionSession.username == username, PredictionSession.timestamp < user_cutoff)
+        for username, user_cutoff in user_cutoffs.items() if user_cutoff is not None
+    ]
+    if cutoff is not None:
+        default = PredictionSession.timestamp < cutoff
+        if user_cutoffs:
+            default = and_(default, or_(
+                PredictionSession.username.is_(None),
+                PredictionSession.username.notin_(list(user_cutoffs))
+            ))
+        clauses.append(default)
+    return or_(*clauses) if clauses else None
+
+def delete_expired_predictions(db: Session, cutoff: datetime | None, user_cutoffs: dict[str, datetime | None],
+                               limit: int, commit: bool = True) -> list:
+    """
+    Delete up to limit expired predictions (oldest first) in one short
+    transaction, with their detections, cache entries and pending S3 transfers
+    (ON DELETE CASCADE), and take them out of the rollups. Returns the deleted rows with their
+    file paths and S3 keys.
+    """
+    condition = expired_predictions_filter(cutoff, user_cutoffs)
+    if condition is None:
+        return []
+    uids = list(db.scalars(
+        select(PredictionSession.uid).where(condition).order_by(PredictionSession.timestamp).limit(limit)
+    ))
+    if not uids:
+        return []
+
+    detections = {}
+    for uid, label, score in db.execute(
+        select(DetectionObject.prediction_uid, DetectionObject.label, DetectionObject.score)
+        .where(DetectionObject.prediction_uid.in_(uids))
+    ):
+        detections.setdefault(uid, []).append((label, score))
+
+    deleted = db.execute(
+        delete(PredictionSession)
+        .where(PredictionSession.uid.in_(uids))
+        .returning(
+            PredictionSession.uid, PredictionSession.username, PredictionSession.timestamp,
+            PredictionSession.original_image, PredictionSession.predicted_image,
+            PredictionSession.s3_original_key, PredictionSession.s3_predicted_key
         )
-        .group_by(DetectionObject.label)
-        .order_by(desc("count"))
-        .limit(5)
-        .all()
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    # one rollup upsert per user-hour rather than per prediction
+    predictions, removed = Counter(), {}
+    for row in deleted:
+        if row.timestamp is None:
+            continue
+        key = (row.username, hour_bucket(row.timestamp))
+        predictions[key] += 1
+        removed.setdefault(key, []).extend(detections.get(row.uid, []))
+    for (username, hour), count in predictions.items():
+        update_rollups(db, username, hour, predictions=count, detections=removed[(username, hour)], sign=-1)
+
+    if commit:
+        db.commit()
+    return deleted
+
+def get_cache_entry(db: Session, cache_key: str) -> PredictionCacheEntry | None:
+    return db.query(PredictionCacheEntry).filter_by(cache_key=cache_key).first()
+
+def dialect_insert(db: Session):
+    """INSERT construct of the session's dialect, which supports ON CONFLICT on SQLite and Postgres."""
+    return pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+def save_cache_entry(db: Session, cache_key: str, uid: str, s3_info: str | None, commit: bool = True) -> None:
+    # a concurrent request may have cached the same image first
+    db.execute(
+        dialect_insert(db)(PredictionCacheEntry)
+        .values(cache_key=cache_key, prediction_uid=uid, s3_info=s3_info)
+        .on_conflict_do_nothing(index_elements=["cache_key"])
     )
+    if commit:
+        db.commit()
 
-    frequent_labels = [{"label": row.label, "count": row.count} for row in label_counts]
+def save_video_prediction(db: Session, uid: str, username: str | None, source: str, frame_count: int,
+                          frames_processed: int, fps: float, stride: int, tracks: list[dict],
+                          commit: bool = True) -> None:
+    db.add(VideoSession(
+        uid=uid,
+        username=username,
+        source=source,
+        frame_count=frame_count,
+        frames_processed=frames_processed,
+        fps=fps,
+        stride=stride,
+    ))
+    for t in tracks:
+        x1, y1, x2, y2 = (float(v) for v in t["box"])
+        db.add(VideoTrack(
+            video_uid=uid,
+            track_id=t["track_id"],
+            label=t["label"],
+            score=t["score"],
+            x1=x1, y1=y1, x2=x2, y2=y2,
+            first_frame=t["first_frame"],
+            last_frame=t["last_frame"],
+        ))
+    if commit:
+        db.commit()
 
-    return {
-        "total_predictions": total_predictions,
-        "average_confidence": avg_confidence,
-        "most_frequent_labels": frequent_labels
-    }
+def add_outbox_entries(db: Session, transfers: list[dict], commit: bool = True) -> None:
+    """Record S3 transfers (bucket, key, source_key, local_path, payload, prediction_uid) as due now."""
+    now = datetime.now(UTC).replace(tzinfo=None)
+    db.execute(insert(S3OutboxEntry), [
+        {"bucket": t["bucket"], "key": t["key"], "source_key": t.get("source_key"),
+         "local_path": t.get("local_path"), "payload": t.get("payload"), "prediction_uid": t.get("prediction_uid"),
+         "next_attempt_at": now}
+        for t in transfers
+    ])
+    if commit:
+        db.commit()
+
+def claim_outbox_entries(db: Session, limit: int, lease_s: float, max_attempts: int,
+                         commit: bool = True) -> list[dict]:
+    """
+    Take up to limit due transfers and push their next attempt lease_s into the
+    future, so another drainer (or a crash mid-transfer) retries them only
+    after the lease runs out. Transfers whose prediction no longer exists
+    (where the cascade did not remove them) are dropped instead.
+    """
+    now = datetime.now(UTC).replace(tzinfo=None)
+    prediction_gone = and_(
+        S3OutboxEntry.prediction_uid.is_not(None),
+        ~select(PredictionSession.uid).where(PredictionSession.uid == S3OutboxEntry.prediction_uid).exists()
+    )
+    rows = db.execute(
+        select(S3OutboxEntry, prediction_gone)
+        .where(S3OutboxEntry.next_attempt_at <= now, S3OutboxEntry.attempts < max_attempts)
+        .order_by(S3OutboxEntry.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=S3OutboxEntry)
+    ).all()
+    claimed = []
+    for entry, gone in rows:
+        if gone:
+            db.delete(entry)
+            continue
+        entry.next_attempt_at = now + timedelta(seconds=lease_s)
+        claimed.append({"id": entry.id, "bucket": entry.bucket, "key": entry.key, "source_key": entry.source_key,
+                        "local_path": entry.local_path, "payload": entry.payload, "attempts": entry.attempts})
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return claimed
+
+def complete_outbox_entry(db: Session, entry_id: int, commit: bool = True) -> None:
+    db.execute(delete(S3OutboxEntry).where(S3OutboxEntry.id == entry_id))
+    if commit:
+        db.commit()
+
+def fail_outbox_entry(db: Session, entry_id: int, error: str, retry_at: datetime, commit: bool = True) -> None:
+    db.execute(
+        update(S3OutboxEntry)
+        .where(S3OutboxEntry.id == entry_id)
+        .values(attempts=S3OutboxEntry.attempts + 1, next_attempt_at=retry_at, last_error=error)
+    )
+    if commit:
+        db.commit()
+
+def count_outbox_entries(db: Session, max_attempts: int) -> dict:
+    """Transfers still to do (pending) and those that ran out of attempts (failed)."""
+    failed = S3OutboxEntry.attempts >= max_attempts
+    pending, dead = db.execute(select(
+        func.count().filter(~failed), func.count().filter(failed)
+    ).select_from(S3OutboxEntry)).one()
+    return {"pending": pending, "failed": dead}
+
+def get_video_prediction(db: Session, uid: str, username: str):
+    return db.query(VideoSession).filter_by(uid=uid, username=username).first()
 
-    
\ No newline at end of file
+def get_video_tracks(db: Session, uid: str):
+    return db.query(VideoTrack).filter_by(video_uid=uid).order_by(VideoTrack.track_id).all()
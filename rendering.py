@@ -0,0 +1,78 @@
+# rendering.py
+
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "lazy" draws boxes the first time the annotated image is requested,
+# "eager" draws them during /predict for every request
+RENDER_MODE = os.getenv("RENDER_MODE", "lazy")
+# Upper bound on the encoded images kept by the render cache
+RENDER_CACHE_BYTES = int(os.getenv("RENDER_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+class RenderCache:
+    """LRU of encoded annotated images, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int = RENDER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self.size -= len(self._data.pop(key))
+            self._data[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def pop(self, key: str):
+        with self._lock:
+            if key in self._data:
+                self.size -= len(self._data.pop(key))
+
+
+def render_detections(original: np.ndarray, detections, names: dict) -> np.ndarray:
+    """
+    Draw stored detections on the original (BGR) image.
+    Goes through the same Results.plot() as eager rendering so both look identical.
+    """
+    import torch
+    from ultralytics.engine.results import Results
+
+    label_to_index = {label: index for index, label in names.items()}
+    rows = [
+        list(obj.box) + [float(obj.score), float(label_to_index.get(obj.label, -1))]
+        for obj in detections
+        if obj.label in label_to_index
+    ]
+    boxes = torch.tensor(rows, dtype=torch.float32) if rows else torch.zeros((0, 6))
+    return Results(orig_img=original, path="", names=names, boxes=boxes).plot()
+
+
+def encode_image(frame: np.ndarray, ext: str) -> bytes:
+    """Encode a plotted frame the way eager rendering saves it (PIL, format from extension)."""
+    image_format = Image.registered_extensions().get(ext.lower(), "JPEG")
+    buffer = io.BytesIO()
+    Image.fromarray(frame).save(buffer, format=image_format)
+    return buffer.getvalue()
@@ -0,0 +1,217 @@
+# retention.py
+#
+# Expiry of old predictions. A background job deletes predictions older than
+# the retention period in small batches: each batch is one short transaction
+# (rows, detections, cache entries and rollups), followed by parallel removal
+# of the local image files and one batched delete of the object storage copies.
+#
+#   RETENTION_DAYS=30                  # keep predictions for 30 days (0 keeps them forever)
+#   RETENTION_USER_DAYS=alice=7,bob=0  # per-user overrides (0 keeps that user's forever)
+#
+#   python retention.py    # run one purge pass now and print its metrics
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, UTC
+
+from dotenv import load_dotenv
+
+from db import run_write
+from queries import delete_expired_predictions
+from storage import Storage, LocalStorage, object_storage_from_env
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "0"))
+RETENTION_USER_DAYS = os.getenv("RETENTION_USER_DAYS", "")
+# Time between purge passes
+RETENTION_INTERVAL_S = float(os.getenv("RETENTION_INTERVAL_S", "3600"))
+# Predictions deleted per transaction; small batches keep write locks short
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+# Pause between batches so live /predict writes get the database in between
+RETENTION_BATCH_PAUSE_MS = float(os.getenv("RETENTION_BATCH_PAUSE_MS", "50"))
+RETENTION_FILE_WORKERS = int(os.getenv("RETENTION_FILE_WORKERS", "8"))
+
+
+def parse_user_days(spec: str) -> dict[str, float]:
+    """Parse "alice=7,bob=0" into {"alice": 7.0, "bob": 0.0}."""
+    user_days = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        username, sep, days = entry.partition("=")
+        if not sep or not username.strip():
+            raise ValueError(f"Invalid retention entry {entry!r}, expected <username>=<days>")
+        user_days[username.strip()] = float(days)
+    return user_days
+
+
+class RetentionPolicy:
+    """How long predictions are kept: days for everyone, user_days per user. 0 keeps forever."""
+
+    def __init__(self, days: float = 0, user_days: dict[str, float] | None = None):
+        self.days = days
+        self.user_days = user_days or {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.days > 0 or any(days > 0 for days in self.user_days.values())
+
+    def cutoffs(self, now: datetime | None = None) -> tuple[datetime | None, dict[str, datetime | None]]:
+        # stored timestamps are naive UTC
+        now = now or datetime.now(UTC).replace(tzinfo=None)
+
+        def cutoff(days):
+            return now - timedelta(days=days) if days > 0 else None
+
+        return cutoff(self.days), {username: cutoff(days) for username, days in self.user_days.items()}
+
+
+class RetentionJob:
+    """
+    Background purge of expired predictions.
+
+    run_once() deletes batches of at most batch_size predictions until none
+    are left. Database rows go first, through the same write path as the
+    request handlers, so a prediction never points at a deleted file; files
+    and objects are removed afterwards, through files (local copies) and
+    objects (canonical copies, None without object storage), and failures
+    there are only counted. on_deleted(rows) lets the caller drop its
+    in-memory caches.
+    """
+
+    def __init__(self, session_factory, policy: RetentionPolicy, interval_s: float = RETENTION_INTERVAL_S,
+                 batch_size: int = RETENTION_BATCH_SIZE, batch_pause_ms: float = RETENTION_BATCH_PAUSE_MS,
+                 file_workers: int = RETENTION_FILE_WORKERS,
+                 files: Storage | None = None, objects: Storage | None = None, on_deleted=None):
+        self.session_factory = session_factory
+        self.policy = policy
+        self.interval = interval_s
+        self.batch_size = max(1, int(batch_size))
+        self.batch_pause = max(0.0, batch_pause_ms) / 1000.0
+        self.file_workers = max(1, int(file_workers))
+        self.files = files or LocalStorage()
+        self.objects = objects
+        self.on_deleted = on_deleted
+
+        self.totals = {"passes": 0, "batches": 0, "predictions_deleted": 0, "files_deleted": 0,
+                       "files_missing": 0, "s3_objects_deleted": 0, "errors": 0}
+        self.current = None
+        self.last_pass = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _count(self, stats: dict, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                stats[name] += value
+                self.totals[name] += value
+
+    def run_once(self) -> dict:
+        """Purge everything that has expired now. Returns the metrics of this pass."""
+        cutoff, user_cutoffs = self.policy.cutoffs()
+        stats = {"started_at": datetime.now(UTC).isoformat(), "batches": 0, "predictions_deleted": 0,
+                 "files_deleted": 0, "files_missing": 0, "s3_objects_deleted": 0, "errors": 0}
+        with self._lock:
+            self.current = stats
+        start = time.perf_counter()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.file_workers) as executor:
+                while not self._stop.is_set():
+                    with self.session_factory() as db:
+                        rows = run_write(db, delete_expired_predictions, cutoff, user_cutoffs, self.batch_size)
+                    if not rows:
+                        break
+                    self._count(stats, batches=1, predictions_deleted=len(rows))
+                    if self.on_deleted is not None:
+                        self.on_deleted(rows)
+                    self._delete_files(executor, rows, stats)
+                    self._delete_objects(rows, stats)
+                    if len(rows) < self.batch_size:
+                        break
+                    self._stop.wait(self.batch_pause)
+        except Exception:
+            self._count(stats, errors=1)
+            logger.exception("Retention pass failed")
+        finally:
+            duration = time.perf_counter() - start
+            stats["duration_s"] = round(duration, 3)
+            stats["predictions_per_s"] = round(stats["predictions_deleted"] / duration, 1) if duration else 0.0
+            with self._lock:
+                self.totals["passes"] += 1
+                self.current = None
+                self.last_pass = stats
+        return stats
+
+    def _delete_files(self, executor, rows, stats: dict):
+        # rows stored without local copies (PREDICT_STORAGE=s3) point at their object keys
+        paths = [path for row in rows for path in (row.original_image, row.predicted_image)
+                 if path and path not in (row.s3_original_key, row.s3_predicted_key)]
+        for path, future in [(path, executor.submit(self.files.delete, path)) for path in paths]:
+            try:
+                if future.result():
+                    self._count(stats, files_deleted=1)
+                else:
+                    self._count(stats, files_missing=1)
+            except OSError:
+                self._count(stats, errors=1)
+                logger.exception(f"Could not delete {path}")
+
+    def _delete_objects(self, rows, stats: dict):
+        keys = [key for row in rows for key in (row.s3_original_key, row.s3_predicted_key) if key]
+        if not keys or self.objects is None:
+            return
+        try:
+            failed = self.objects.delete_many(keys)
+        except Exception:
+            self._count(stats, errors=1)
+            logger.exception(f"Delete of {len(keys)} objects failed")
+            return
+        self._count(stats, s3_objects_deleted=len(keys) - len(failed), errors=len(failed))
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.policy.enabled,
+                "days": self.policy.days,
+                "user_overrides": len(self.policy.user_days),
+                "interval_s": self.interval,
+                "batch_size": self.batch_size,
+                "running": self.current is not None,
+                "current_pass": dict(self.current) if self.current else None,
+                "last_pass": self.last_pass,
+                "totals": dict(self.totals),
+            }
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                self.run_once()
+                self._stop.wait(self.interval)
+
+        self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    from db import SessionLocal
+
+    policy = RetentionPolicy(RETENTION_DAYS, parse_user_days(RETENTION_USER_DAYS))
+    if not policy.enabled:
+        print("Retention is disabled (set RETENTION_DAYS or RETENTION_USER_DAYS)")
+    else:
+        print(RetentionJob(SessionLocal, policy, objects=object_storage_from_env()).run_once())
@@ -0,0 +1,80 @@
+# rollups.py
+#
+# Per-user hourly rollups behind /stats, /labels and /predictions/count.
+# They are kept up to date by the write queries (queries.update_rollups, in the
+# same transaction as each save and delete); this module regenerates them from
+# the raw prediction tables.
+#
+# A rebuild keeps writers out until it commits, or their updates would be
+# overwritten: migration 4 and the command below run it in the migration
+# transaction (BEGIN EXCLUSIVE on SQLite), and on Postgres it takes a SHARE lock
+# on the raw tables. Predictions stall while it runs, so pick a quiet moment.
+#
+#   python rollups.py    # rebuild all rollups
+
+from collections import defaultdict
+
+from sqlalchemy import delete, insert, text
+from sqlalchemy.orm import Session
+
+from models import PredictionSession, DetectionObject, UserHourlyStats, UserHourlyLabelCount
+from queries import hour_bucket
+
+
+def rebuild_rollups(db: Session, chunk_size: int = 10000) -> tuple[int, int]:
+    """
+    Replace the rollup tables with totals recomputed from prediction_sessions and
+    detection_objects. Streams the raw rows; memory grows with the number of
+    (user, hour, label) groups, not with the number of detections.
+    Returns the number of stats and label rows written.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        # concurrent saves and deletes wait until the new totals are committed
+        db.execute(text("LOCK TABLE prediction_sessions, detection_objects IN SHARE MODE"))
+
+    stats = defaultdict(lambda: {"prediction_count": 0, "detection_count": 0, "score_sum": 0.0})
+    labels = defaultdict(int)
+
+    sessions = (
+        db.query(PredictionSession.username, PredictionSession.timestamp)
+        .filter(PredictionSession.username.isnot(None), PredictionSession.timestamp.isnot(None))
+        .yield_per(chunk_size)
+    )
+    for username, timestamp in sessions:
+        stats[(username, hour_bucket(timestamp))]["prediction_count"] += 1
+
+    detections = (
+        db.query(PredictionSession.username, PredictionSession.timestamp, DetectionObject.label, DetectionObject.score)
+        .join(DetectionObject, DetectionObject.prediction_uid == PredictionSession.uid)
+        .filter(PredictionSession.username.isnot(None), PredictionSession.timestamp.isnot(None))
+        .yield_per(chunk_size)
+    )
+    for username, timestamp, label, score in detections:
+        hour = hour_bucket(timestamp)
+        row = stats[(username, hour)]
+        row["detection_count"] += 1
+        row["score_sum"] += score or 0.0
+        labels[(username, hour, label)] += 1
+
+    db.execute(delete(UserHourlyLabelCount))
+    db.execute(delete(UserHourlyStats))
+    if stats:
+        db.execute(insert(UserHourlyStats), [
+            {"username": username, "hour": hour, **totals} for (username, hour), totals in stats.items()
+        ])
+    if labels:
+        db.execute(insert(UserHourlyLabelCount), [
+            {"username": username, "hour": hour, "label": label, "count": count}
+            for (username, hour, label), count in labels.items()
+        ])
+    db.commit()
+    return len(stats), len(labels)
+
+
+if __name__ == "__main__":
+    from db import engine
+    from migrations import step_connection
+
+    with step_connection(engine) as conn:
+        stats_rows, label_rows = rebuild_rollups(Session(bind=conn))
+    print(f"Rebuilt rollups: {stats_rows} user-hours, {label_rows} label counts")
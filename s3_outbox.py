@@ -0,0 +1,148 @@
+# s3_outbox.py
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, UTC
+
+from dotenv import load_dotenv
+
+from db import run_write
+from queries import add_outbox_entries, claim_outbox_entries, complete_outbox_entry, fail_outbox_entry
+from queries import count_outbox_entries
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Parallel S3 transfers (per process), in the request and in the outbox drainer
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "8"))
+# Transfers claimed per drain round
+S3_OUTBOX_BATCH = int(os.getenv("S3_OUTBOX_BATCH", "32"))
+S3_OUTBOX_MAX_ATTEMPTS = int(os.getenv("S3_OUTBOX_MAX_ATTEMPTS", "10"))
+# First retry delay; doubles with every failed attempt up to S3_OUTBOX_MAX_BACKOFF_S
+S3_OUTBOX_RETRY_S = float(os.getenv("S3_OUTBOX_RETRY_S", "2"))
+S3_OUTBOX_MAX_BACKOFF_S = float(os.getenv("S3_OUTBOX_MAX_BACKOFF_S", "300"))
+# How often the drainer looks for due retries when nobody wakes it
+S3_OUTBOX_POLL_S = float(os.getenv("S3_OUTBOX_POLL_S", "5"))
+# A claimed transfer is retried after this long if its drainer died mid-transfer
+S3_OUTBOX_LEASE_S = float(os.getenv("S3_OUTBOX_LEASE_S", "120"))
+
+
+class S3Outbox:
+    """
+    Durable queue of S3 transfers in the s3_outbox table.
+
+    enqueue() records transfers in the database and wakes the drainer thread,
+    which claims due rows, runs perform(transfer) for them in parallel and
+    deletes the rows that succeeded. Failures are retried with exponential
+    backoff until max_attempts; rows left over from a previous run are
+    drained after a restart. run() does the transfers right away and only
+    records the ones that failed.
+    """
+
+    def __init__(self, session_factory, perform, workers: int = S3_UPLOAD_CONCURRENCY,
+                 batch_size: int = S3_OUTBOX_BATCH, max_attempts: int = S3_OUTBOX_MAX_ATTEMPTS,
+                 retry_s: float = S3_OUTBOX_RETRY_S, poll_s: float = S3_OUTBOX_POLL_S):
+        self.session_factory = session_factory
+        self.perform = perform
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.max_attempts = max_attempts
+        self.retry = retry_s
+        self.poll = poll_s
+        self.totals = {"uploaded": 0, "retried": 0, "gave_up": 0}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        # shared by run() and the drainer; boto3 clients are thread-safe
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="s3-transfer")
+
+    def run(self, db, transfers: list[dict]) -> int:
+        """Run transfers in parallel and wait for them. Failed ones go to the outbox; returns how many."""
+        outcomes = list(self._executor.map(self._attempt, transfers))
+        failed = [transfer for transfer, error in zip(transfers, outcomes) if error is not None]
+        for transfer, error in zip(transfers, outcomes):
+            if error is not None:
+                logger.warning(f"Upload to s3://{transfer['bucket']}/{transfer['key']} failed, will retry: {error}")
+        self.enqueue(db, failed)
+        return len(failed)
+
+    def enqueue(self, db, transfers: list[dict]):
+        if not transfers:
+            return
+        run_write(db, add_outbox_entries, transfers)
+        self._ensure_started()
+        self._wake.set()
+
+    def drain_once(self) -> int:
+        """Run one round of due transfers. Returns how many were attempted."""
+        with self.session_factory() as db:
+            entries = run_write(db, claim_outbox_entries, self.batch_size, S3_OUTBOX_LEASE_S, self.max_attempts)
+        if not entries:
+            return 0
+
+        outcomes = list(self._executor.map(self._attempt, entries))
+
+        with self.session_factory() as db:
+            for entry, error in zip(entries, outcomes):
+                if error is None:
+                    run_write(db, complete_outbox_entry, entry["id"])
+                    continue
+                attempts = entry["attempts"] + 1
+                delay = min(self.retry * 2 ** entry["attempts"], S3_OUTBOX_MAX_BACKOFF_S)
+                retry_at = datetime.now(UTC).replace(tzinfo=None) + timedelta(seconds=delay)
+                run_write(db, fail_outbox_entry, entry["id"], error, retry_at)
+                with self._lock:
+                    self.totals["gave_up" if attempts >= self.max_attempts else "retried"] += 1
+                if attempts >= self.max_attempts:
+                    logger.error(f"Giving up on s3://{entry['bucket']}/{entry['key']} after {attempts} attempts: {error}")
+        with self._lock:
+            self.totals["uploaded"] += outcomes.count(None)
+        return len(entries)
+
+    def _attempt(self, entry: dict) -> str | None:
+        try:
+            self.perform(entry)
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    def metrics(self) -> dict:
+        with self.session_factory() as db:
+            counts = count_outbox_entries(db, self.max_attempts)
+        with self._lock:
+            return {**counts, **self.totals, "running": self._thread is not None and self._thread.is_alive()}
+
+    def start(self):
+        self._ensure_started()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="s3-outbox", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # cleared before draining, so an enqueue during the round is not missed
+            self._wake.clear()
+            try:
+                attempted = self.drain_once()
+            except Exception:
+                logger.exception("S3 outbox drain failed")
+                attempted = 0
+            if attempted < self.batch_size:
+                # nothing more due right now: sleep until woken or the next retry poll
+                self._wake.wait(self.poll)
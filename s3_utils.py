@@ -1,22 +1,78 @@
 # s3_utils.py
+import io
 import os
 import mimetypes
+import threading
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+load_dotenv()
 
 AWS_REGION = os.getenv("AWS_REGION")
 AWS_S3_BUCKET = os.getenv("AWS_S3_BUCKET")
+# S3-compatible endpoint instead of AWS (MinIO, a moto server, benchmark_s3.py's stand-in)
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+
+# HTTP connections kept open by the shared client. botocore's default of 10 is
+# exhausted by a few parallel predictions; beyond the pool size, connections are
+# opened per request and thrown away afterwards.
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "64"))
+# Bodies at least this large go up (and come down) in parallel parts
+S3_MULTIPART_THRESHOLD_MB = float(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+S3_MULTIPART_CHUNK_MB = float(os.getenv("S3_MULTIPART_CHUNK_MB", "8"))
+# Parallel parts per multipart transfer
+S3_TRANSFER_CONCURRENCY = int(os.getenv("S3_TRANSFER_CONCURRENCY", "4"))
+# "adaptive" also rate-limits the client itself when S3 answers SlowDown
+S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "adaptive")
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+S3_CONNECT_TIMEOUT_S = float(os.getenv("S3_CONNECT_TIMEOUT_S", "5"))
+S3_READ_TIMEOUT_S = float(os.getenv("S3_READ_TIMEOUT_S", "30"))
+
+MB = 1024 * 1024
 
-_session = None
 _s3 = None
+_client_lock = threading.Lock()
+
+
+def client_config(max_pool_connections: int = S3_MAX_POOL_CONNECTIONS) -> Config:
+    return Config(
+        max_pool_connections=max_pool_connections,
+        retries={"mode": S3_RETRY_MODE, "max_attempts": S3_MAX_ATTEMPTS},
+        connect_timeout=S3_CONNECT_TIMEOUT_S,
+        read_timeout=S3_READ_TIMEOUT_S,
+        tcp_keepalive=True,
+    )
+
+
+def transfer_config(threshold_mb: float = S3_MULTIPART_THRESHOLD_MB, chunk_mb: float = S3_MULTIPART_CHUNK_MB,
+                    concurrency: int = S3_TRANSFER_CONCURRENCY) -> TransferConfig:
+    return TransferConfig(
+        multipart_threshold=int(threshold_mb * MB),
+        multipart_chunksize=int(chunk_mb * MB),
+        max_concurrency=max(1, concurrency),
+        use_threads=concurrency > 1,
+    )
+
+
+TRANSFER_CONFIG = transfer_config()
+
+
+def make_s3_client(max_pool_connections: int = S3_MAX_POOL_CONNECTIONS, endpoint_url: str | None = S3_ENDPOINT_URL):
+    session = boto3.session.Session(region_name=AWS_REGION or None)
+    return session.client("s3", config=client_config(max_pool_connections), endpoint_url=endpoint_url or None)
 
 
 def get_s3_client():
-    global _session, _s3
+    """The process-wide client; created once even when threads race for it (boto3 clients are thread-safe)."""
+    global _s3
     if _s3 is not None:
         return _s3
-    _session = boto3.session.Session(region_name=AWS_REGION or None)
-    _s3 = _session.client("s3")
+    with _client_lock:
+        if _s3 is None:
+            _s3 = make_s3_client()
     return _s3
 
 
@@ -33,7 +89,12 @@ def s3_key_exists(bucket: str, key: str) -> bool:
 
 
 def download_file(bucket: str, key: str, local_path: str) -> None:
-    get_s3_client().download_file(bucket, key, local_path)
+    get_s3_client().download_file(bucket, key, local_path, Config=TRANSFER_CONFIG)
+
+
+def download_bytes(bucket: str, key: str) -> bytes:
+    # one GET; the managed download would HEAD the object first to plan ranged parts
+    return get_s3_client().get_object(Bucket=bucket, Key=key)["Body"].read()
 
 
 def upload_file(bucket: str, key: str, local_path: str, content_type: str | None = None) -> None:
@@ -41,10 +102,35 @@ def upload_file(bucket: str, key: str, local_path: str, content_type: str | None
         guessed, _ = mimetypes.guess_type(local_path)
         content_type = guessed or "application/octet-stream"
     get_s3_client().upload_file(
-        local_path, bucket, key, ExtraArgs={"ContentType": content_type}
+        local_path, bucket, key, ExtraArgs={"ContentType": content_type}, Config=TRANSFER_CONFIG
+    )
+
+
+def upload_fileobj(bucket: str, key: str, fileobj, content_type: str | None = None) -> None:
+    """
+    Stream a readable file object to S3 without a local copy. Bodies over
+    S3_MULTIPART_THRESHOLD_MB go up as a multipart upload in parallel parts.
+    """
+    if not content_type:
+        guessed, _ = mimetypes.guess_type(key)
+        content_type = guessed or "application/octet-stream"
+    get_s3_client().upload_fileobj(
+        fileobj, bucket, key, ExtraArgs={"ContentType": content_type}, Config=TRANSFER_CONFIG
     )
 
 
+def upload_bytes(bucket: str, key: str, data: bytes, content_type: str | None = None) -> None:
+    if len(data) >= TRANSFER_CONFIG.multipart_threshold:
+        # BytesIO shares the bytes object until written to, so this does not copy the image
+        upload_fileobj(bucket, key, io.BytesIO(data), content_type)
+        return
+    # a single PutObject skips the transfer manager and its thread pool
+    if not content_type:
+        guessed, _ = mimetypes.guess_type(key)
+        content_type = guessed or "application/octet-stream"
+    get_s3_client().put_object(Bucket=bucket, Key=key, Body=data, ContentType=content_type)
+
+
 def copy_object(bucket: str, src_key: str, dst_key: str) -> None:
     get_s3_client().copy_object(
         Bucket=bucket,
@@ -52,3 +138,27 @@ def copy_object(bucket: str, src_key: str, dst_key: str) -> None:
         Key=dst_key,
         MetadataDirective="COPY",
     )
+
+
+def presigned_url(bucket: str, key: str, expires_s: int) -> str:
+    """Time-limited GET URL for an object; signed locally with the client's credentials."""
+    return get_s3_client().generate_presigned_url(
+        "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_s
+    )
+
+
+# DeleteObjects accepts at most 1000 keys per request
+S3_DELETE_BATCH = 1000
+
+
+def delete_objects(bucket: str, keys: list[str]) -> list[str]:
+    """Delete keys with batched DeleteObjects calls. Returns the keys S3 failed to delete."""
+    s3 = get_s3_client()
+    failed = []
+    for start in range(0, len(keys), S3_DELETE_BATCH):
+        response = s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": key} for key in keys[start:start + S3_DELETE_BATCH]], "Quiet": True},
+        )
+        failed += [error["Key"] for error in response.get("Errors", [])]
+    return failed
@@ -0,0 +1,406 @@
+# storage.py
+
+import os
+import shutil
+import logging
+import threading
+import time
+from collections import deque, OrderedDict
+
+from dotenv import load_dotenv
+
+import s3_utils
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "s3" uses AWS_S3_BUCKET (disabled when it is unset); "memory" keeps objects in
+# this process, a stand-in for S3 in tests and offline benchmarks
+OBJECT_STORAGE = os.getenv("OBJECT_STORAGE", "s3")
+# Operations in flight at once, per backend
+STORAGE_MAX_CONCURRENCY = int(os.getenv("STORAGE_MAX_CONCURRENCY", "32"))
+# Simulated round trip of the in-memory backend, so benchmarks see network-like latency
+STORAGE_MEMORY_LATENCY_MS = float(os.getenv("STORAGE_MEMORY_LATENCY_MS", "0"))
+
+# Latencies kept per operation for the percentiles in metrics()
+LATENCY_WINDOW = 1024
+
+# Lifetime of presigned image URLs; cached URLs are handed out until
+# PRESIGNED_URL_REFRESH_S before they expire, then signed again
+PRESIGNED_URL_TTL_S = int(os.getenv("PRESIGNED_URL_TTL_S", "300"))
+PRESIGNED_URL_REFRESH_S = int(os.getenv("PRESIGNED_URL_REFRESH_S", "60"))
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "10000"))
+
+
+class Storage:
+    """
+    Bytes stored under string keys.
+
+    Backends implement the underscore methods; the public ones wrap them with
+    a limit on concurrent operations and per-operation metrics (count, errors,
+    bytes moved and latency percentiles). get() returns None and delete()
+    returns False for a missing key; other failures raise.
+    """
+
+    name = "storage"
+    bucket = None
+    region = None
+
+    def __init__(self, max_concurrency: int = STORAGE_MAX_CONCURRENCY):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def put(self, key: str, data: bytes, content_type: str | None = None):
+        self._timed("put", len(data), self._put, key, data, content_type)
+
+    def put_file(self, key: str, local_path: str):
+        self._timed("put_file", 0, self._put_file, key, local_path)
+
+    def put_fileobj(self, key: str, fileobj, content_type: str | None = None):
+        self._timed("put_fileobj", 0, self._put_fileobj, key, fileobj, content_type)
+
+    def get(self, key: str) -> bytes | None:
+        data = self._timed("get", 0, self._get, key)
+        if data is not None:
+            self._add_bytes("get", len(data))
+        return data
+
+    def download(self, key: str, local_path: str):
+        """Copy an object to a local file; raises FileNotFoundError when it is missing."""
+        self._timed("download", 0, self._download, key, local_path)
+
+    def copy(self, src_key: str, dst_key: str):
+        self._timed("copy", 0, self._copy, src_key, dst_key)
+
+    def exists(self, key: str) -> bool:
+        return self._timed("exists", 0, self._exists, key)
+
+    def delete(self, key: str) -> bool:
+        return self._timed("delete", 0, self._delete, key)
+
+    def delete_many(self, keys: list[str]) -> list[str]:
+        """Delete keys; returns the ones that could not be deleted."""
+        if not keys:
+            return []
+        return self._timed("delete_many", 0, self._delete_many, keys)
+
+    def local_path(self, key: str) -> str | None:
+        """A path on this machine holding the object, when the backend has one."""
+        return None
+
+    def url(self, key: str, expires_s: int = PRESIGNED_URL_TTL_S) -> str | None:
+        """A URL clients can fetch the object from directly, valid for expires_s; None when unsupported."""
+        return self._timed("url", 0, self._url, key, expires_s)
+
+    def _url(self, key, expires_s):
+        return None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            operations = {}
+            for op, stats in self._stats.items():
+                recent = sorted(stats["recent"])
+                operations[op] = {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "bytes": stats["bytes"],
+                    "avg_ms": round(stats["total_s"] * 1000 / stats["count"], 3) if stats["count"] else 0.0,
+                    "p50_ms": round(percentile(recent, 0.5) * 1000, 3),
+                    "p99_ms": round(percentile(recent, 0.99) * 1000, 3),
+                    "max_ms": round(stats["max_s"] * 1000, 3),
+                }
+        return {"backend": self.name, "bucket": self.bucket, "max_concurrency": self.max_concurrency,
+                "operations": operations}
+
+    def _timed(self, op: str, nbytes: int, fn, *args):
+        with self._slots:
+            start = time.perf_counter()
+            try:
+                result = fn(*args)
+            except Exception:
+                self._record(op, time.perf_counter() - start, 0, error=True)
+                raise
+            self._record(op, time.perf_counter() - start, nbytes)
+        return result
+
+    def _record(self, op: str, elapsed: float, nbytes: int, error: bool = False):
+        with self._lock:
+            stats = self._stats.get(op)
+            if stats is None:
+                stats = self._stats[op] = {"count": 0, "errors": 0, "bytes": 0, "total_s": 0.0, "max_s": 0.0,
+                                           "recent": deque(maxlen=LATENCY_WINDOW)}
+            stats["count"] += 1
+            stats["errors"] += error
+            stats["bytes"] += nbytes
+            stats["total_s"] += elapsed
+            stats["max_s"] = max(stats["max_s"], elapsed)
+            stats["recent"].append(elapsed)
+
+    def _add_bytes(self, op: str, nbytes: int):
+        with self._lock:
+            self._stats[op]["bytes"] += nbytes
+
+    # Uploading a file or stream defaults to reading it into memory first
+
+    def _put_file(self, key, local_path):
+        with open(local_path, "rb") as f:
+            self._put(key, f.read(), None)
+
+    def _put_fileobj(self, key, fileobj, content_type):
+        self._put(key, fileobj.read(), content_type)
+
+    def _download(self, key, local_path):
+        data = self._get(key)
+        if data is None:
+            raise FileNotFoundError(key)
+        with open(local_path, "wb") as f:
+            f.write(data)
+
+    def _delete_many(self, keys):
+        failed = []
+        for key in keys:
+            try:
+                self._delete(key)
+            except Exception:
+                failed.append(key)
+        return failed
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LocalStorage(Storage):
+    """Files under root; a key is the path relative to it (the paths stored on predictions)."""
+
+    name = "local"
+
+    def __init__(self, root: str = "", **kwargs):
+        super().__init__(**kwargs)
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key) if self.root else key
+
+    def local_path(self, key: str) -> str | None:
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def _put(self, key, data, content_type):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _put_file(self, key, local_path):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        shutil.copyfile(local_path, path)
+
+    def _put_fileobj(self, key, fileobj, content_type):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+
+    def _get(self, key):
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _download(self, key, local_path):
+        shutil.copyfile(self.path(key), local_path)
+
+    def _copy(self, src_key, dst_key):
+        self._put_file(dst_key, self.path(src_key))
+
+    def _exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def _delete(self, key):
+        try:
+            os.remove(self.path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class S3Storage(Storage):
+    """One S3 bucket, through the shared boto3 client in s3_utils (its connection pool is reused)."""
+
+    name = "s3"
+
+    def __init__(self, bucket: str, region: str | None = s3_utils.AWS_REGION, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self.region = region
+
+    def _put(self, key, data, content_type):
+        s3_utils.upload_bytes(self.bucket, key, data, content_type)
+
+    def _put_file(self, key, local_path):
+        s3_utils.upload_file(self.bucket, key, local_path)
+
+    def _put_fileobj(self, key, fileobj, content_type):
+        s3_utils.upload_fileobj(self.bucket, key, fileobj, content_type)
+
+    def _get(self, key):
+        try:
+            return s3_utils.download_bytes(self.bucket, key)
+        except Exception as e:
+            if is_missing(e):
+                return None
+            raise
+
+    def _download(self, key, local_path):
+        try:
+            s3_utils.download_file(self.bucket, key, local_path)
+        except Exception as e:
+            if is_missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def _copy(self, src_key, dst_key):
+        s3_utils.copy_object(self.bucket, src_key, dst_key)
+
+    def _url(self, key, expires_s):
+        # signed locally, no request to S3
+        return s3_utils.presigned_url(self.bucket, key, expires_s)
+
+    def _exists(self, key):
+        return s3_utils.s3_key_exists(self.bucket, key)
+
+    def _delete(self, key):
+        # S3 does not report whether the key existed
+        s3_utils.get_s3_client().delete_object(Bucket=self.bucket, Key=key)
+        return True
+
+    def _delete_many(self, keys):
+        return s3_utils.delete_objects(self.bucket, keys)
+
+
+def is_missing(error: Exception) -> bool:
+    """True for the errors boto3 raises when an object does not exist."""
+    response = getattr(error, "response", None) or {}
+    return str(response.get("Error", {}).get("Code")) in {"404", "NoSuchKey", "NotFound"}
+
+
+class InMemoryStorage(Storage):
+    """
+    Objects in a dict in this process. Stands in for S3 in tests and
+    offline benchmarks; latency_ms adds a simulated round trip to every call.
+    """
+
+    name = "memory"
+
+    def __init__(self, bucket: str = "memory", latency_ms: float = STORAGE_MEMORY_LATENCY_MS, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket
+        self.latency = max(0.0, latency_ms) / 1000.0
+        self.objects = {}
+        self._objects_lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _put(self, key, data, content_type):
+        self._wait()
+        with self._objects_lock:
+            self.objects[key] = bytes(data)
+
+    def _get(self, key):
+        self._wait()
+        with self._objects_lock:
+            return self.objects.get(key)
+
+    def _copy(self, src_key, dst_key):
+        self._wait()
+        with self._objects_lock:
+            if src_key not in self.objects:
+                raise FileNotFoundError(src_key)
+            self.objects[dst_key] = self.objects[src_key]
+
+    def _exists(self, key):
+        self._wait()
+        with self._objects_lock:
+            return key in self.objects
+
+    def _delete(self, key):
+        self._wait()
+        with self._objects_lock:
+            return self.objects.pop(key, None) is not None
+
+    def _delete_many(self, keys):
+        # one round trip for the whole batch, like DeleteObjects
+        self._wait()
+        with self._objects_lock:
+            for key in keys:
+                self.objects.pop(key, None)
+        return []
+
+
+class PresignedUrlCache:
+    """
+    LRU of presigned URLs by object key. A URL is reused until refresh_s
+    before it expires, so every URL handed out stays valid for at least
+    refresh_s. Callers check access before asking for a URL.
+    """
+
+    def __init__(self, ttl_s: int = PRESIGNED_URL_TTL_S, refresh_s: int = PRESIGNED_URL_REFRESH_S,
+                 max_entries: int = PRESIGNED_URL_CACHE_SIZE):
+        self.ttl = ttl_s
+        self.refresh = min(refresh_s, ttl_s // 2)
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        """(url, expires_at) while the cached URL is fresh enough to hand out."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] - self.refresh <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def sign(self, storage: Storage, key: str) -> tuple[str, float] | None:
+        """Cached URL for key, or a freshly signed one; None when storage cannot sign URLs."""
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        expires_at = time.time() + self.ttl
+        url = storage.url(key, self.ttl)
+        if url is None:
+            return None
+        with self._lock:
+            self._data[key] = (url, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return url, expires_at
+
+    def pop(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+def object_storage_from_env() -> Storage | None:
+    """Where canonical copies go: S3Storage, InMemoryStorage, or None without a bucket."""
+    if OBJECT_STORAGE == "memory":
+        return InMemoryStorage()
+    if OBJECT_STORAGE != "s3":
+        raise ValueError(f"Unknown OBJECT_STORAGE: {OBJECT_STORAGE}")
+    if not s3_utils.AWS_S3_BUCKET:
+        return None
+    return S3Storage(s3_utils.AWS_S3_BUCKET)
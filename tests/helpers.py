@@ -0,0 +1,39 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+import numpy as np
+
+
+def make_result(label_idx=0, score=0.9, box=(10.0, 10.0, 30.0, 30.0), shape=(32, 32)):
+    """A MagicMock standing in for one ultralytics Results with a single detected box."""
+    fake_box = MagicMock()
+    fake_cls, fake_conf, fake_bbox = MagicMock(), MagicMock(), MagicMock()
+    fake_cls.item.return_value = label_idx
+    fake_conf.item.return_value = score
+    fake_conf.__float__.return_value = score
+    fake_bbox.tolist.return_value = list(box)
+    fake_box.cls = [fake_cls]
+    fake_box.conf = [fake_conf]
+    fake_box.xyxy = [fake_bbox]
+
+    fake_result = MagicMock()
+    fake_result.boxes = [fake_box]
+    fake_result.orig_shape = shape
+    fake_result.plot.return_value = np.zeros((*shape, 3), dtype=np.uint8)
+    return fake_result
+
+
+@contextmanager
+def temp_upload_dirs():
+    """Point app's upload directories at a temporary directory, removed on exit."""
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = {
+            "UPLOAD_DIR": os.path.join(tmp, "original"),
+            "PREDICTED_DIR": os.path.join(tmp, "predicted"),
+            "VIDEO_DIR": os.path.join(tmp, "videos"),
+        }
+        for path in dirs.values():
+            os.makedirs(path)
+        with patch.multiple("app", **dirs):
+            yield dirs
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta, UTC
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import async_queries
+from rollups import rebuild_rollups
+from models import Base, PredictionSession, DetectionObject
+
+
+class TestAsyncQueries(unittest.TestCase):
+    def run_async(self, coro):
+        return asyncio.run(coro)
+
+    async def _with_db(self, fn):
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with Session() as db:
+            now = datetime.now(UTC)
+            db.add_all([
+                PredictionSession(uid="new", username="alice", timestamp=now),
+                PredictionSession(uid="old", username="alice", timestamp=now - timedelta(days=30)),
+                PredictionSession(uid="bob", username="bob", timestamp=now),
+                DetectionObject(prediction_uid="new", label="person", score=0.9, x1=0, y1=0, x2=1, y2=1),
+                DetectionObject(prediction_uid="new", label="person", score=0.7, x1=0, y1=0, x2=1, y2=1),
+                DetectionObject(prediction_uid="new", label="dog", score=0.5, x1=0, y1=0, x2=1, y2=1),
+                DetectionObject(prediction_uid="old", label="cat", score=0.9, x1=0, y1=0, x2=1, y2=1),
+            ])
+            await db.commit()
+            # rows were inserted directly, not through the write queries
+            await db.run_sync(rebuild_rollups)
+            try:
+                return await fn(db)
+            finally:
+                await engine.dispose()
+
+    def test_prediction_lookups(self):
+        async def check(db):
+            self.assertEqual((await async_queries.get_prediction(db, "new", "alice")).uid, "new")
+            self.assertIsNone(await async_queries.get_prediction(db, "new", "bob"))
+            self.assertEqual(len(await async_queries.get_detections(db, "new")), 3)
+            rows = await async_queries.get_predictions_by_label(db, "person", "alice")
+            self.assertEqual([row.uid for row in rows], ["new"])
+            rows = await async_queries.get_predictions_by_score(db, 0.8, "alice")
+            self.assertEqual(sorted(row.uid for row in rows), ["new", "old"])
+        self.run_async(self._with_db(check))
+
+    def test_last_week_aggregates(self):
+        async def check(db):
+            self.assertEqual(await async_queries.count_predictions_last_week(db, "alice"), 1)
+            self.assertEqual(sorted(await async_queries.get_unique_labels_last_week(db, "alice")), ["dog", "person"])
+            stats = await async_queries.get_user_prediction_stats(db, "alice")
+            self.assertEqual(stats["total_predictions"], 1)
+            self.assertAlmostEqual(stats["average_confidence"], 0.7)
+            self.assertEqual(stats["most_frequent_labels"][0], {"label": "person", "count": 2})
+        self.run_async(self._with_db(check))
+
+
+if __name__ == '__main__':
+    unittest.main()
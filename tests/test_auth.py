@@ -52,8 +52,7 @@ class TestAuthWithMocks(unittest.TestCase):
 
         patchers = [
             patch("app.model"),            # YOLO runner
-            patch("app.save_prediction"),  # DB insert (session)
-            patch("app.save_detection"),   # DB insert (detections)
+            patch("app.save_prediction_with_detections"),  # DB insert (session + detections)
         ]
         mocks = [p.start() for p in patchers]
 
@@ -72,20 +71,17 @@ class TestAuthWithMocks(unittest.TestCase):
     # Endpoint tests (mocked)
     # -----------------------------
 
-    @patch("app.get_detections")
-    @patch("app.get_prediction")
-    def test_get_prediction_valid(self, mock_get_prediction, mock_get_detections):
+    @patch("app.get_prediction_with_detections")
+    def test_get_prediction_valid(self, mock_get_prediction):
         """GET /prediction/{uid} returns prediction when found for user."""
         mock_obj = MagicMock(
             uid="mocked-uid",
             timestamp="now",
             original_image="x.jpg",
-            predicted_image="y.jpg"
+            predicted_image="y.jpg",
+            detections=[MagicMock(id=1, label="person", score=0.9, box=[0, 0, 100, 100])]
         )
         mock_get_prediction.return_value = mock_obj
-        mock_get_detections.return_value = [
-            MagicMock(id=1, label="person", score=0.9, box=[0, 0, 100, 100])
-        ]
 
         resp = self.client.get("/prediction/mocked-uid")
         self.assertEqual(resp.status_code, 200)
@@ -93,7 +89,7 @@ class TestAuthWithMocks(unittest.TestCase):
         self.assertEqual(data["uid"], "mocked-uid")
         self.assertEqual(len(data["detection_objects"]), 1)
 
-    @patch("app.get_prediction", return_value=None)
+    @patch("app.get_prediction_with_detections", return_value=None)
     def test_get_prediction_not_found(self, _):
         """GET /prediction/{uid} -> 404 when not found or not authorized."""
         resp = self.client.get("/prediction/invalid-uid")
@@ -0,0 +1,44 @@
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import Base, DetectionObject, PredictionSession
+from queries import save_prediction_with_detections, get_detections
+
+
+class TestSavePredictionWithDetections(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine, autoflush=False)()
+        self.commits = 0
+
+        def count_commit(conn):
+            self.commits += 1
+        event.listen(self.engine, "commit", count_commit)
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def test_session_and_all_detections_in_one_commit(self):
+        detections = [("person", 0.9 - i / 100, [i, i, i + 10.0, i + 10.0]) for i in range(40)]
+        save_prediction_with_detections(self.db, "uid-1", "o.jpg", "p.jpg", None, detections, image_size=(640, 480))
+
+        self.assertEqual(self.commits, 1)
+        self.assertEqual(self.db.get(PredictionSession, "uid-1").original_image, "o.jpg")
+        rows = get_detections(self.db, "uid-1")
+        self.assertEqual(len(rows), 40)
+        self.assertEqual(rows[0].box, [0.0, 0.0, 10.0, 10.0])
+        self.assertEqual((rows[0].img_w, rows[0].img_h), (640, 480))
+
+    def test_prediction_without_detections(self):
+        save_prediction_with_detections(self.db, "uid-2", "o.jpg", "p.jpg", None, [])
+        self.assertEqual(self.commits, 1)
+        self.assertIsNotNone(self.db.get(PredictionSession, "uid-2"))
+        self.assertEqual(self.db.query(DetectionObject).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import asyncio
+import tempfile
+import unittest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import app, get_current_username, get_async_db
+from db import async_url, sync_url
+from db_routing import ReplicaRouter, RoutingSession, use_primary, routes_reads
+from models import Base, User
+from queries import save_prediction_with_detections, create_user, get_user
+
+
+class TestReplicaRouting(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # separate files stand in for a primary and two replicas that have not caught up
+        self.primary, *self.replicas = [
+            create_engine(f"sqlite:///{os.path.join(self.tmp.name, name)}.db", poolclass=NullPool)
+            for name in ("primary", "replica1", "replica2")
+        ]
+        for engine in [self.primary] + self.replicas:
+            Base.metadata.create_all(bind=engine)
+        self.router = ReplicaRouter(self.replicas, health_interval_s=3600)
+        self.Session = sessionmaker(bind=self.primary, class_=RoutingSession,
+                                    router=self.router, replicas=self.replicas)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_writes_go_to_the_primary_and_reads_to_replicas(self):
+        with sessionmaker(bind=self.replicas[1])() as db:
+            db.add(User(username="only-on-replica2", password="-"))
+            db.commit()
+
+        with self.Session() as db:
+            self.assertTrue(routes_reads(db))
+            # round-robin: replica1, replica2, replica1, ...
+            found = [get_user(db, "only-on-replica2") is not None for _ in range(4)]
+            self.assertEqual(found, [False, True, False, True])
+
+            create_user(db, "alice", "hash")
+            # after writing, the session reads from the primary
+            self.assertFalse(routes_reads(db))
+            self.assertIsNotNone(get_user(db, "alice"))
+
+        with sessionmaker(bind=self.primary)() as db:
+            self.assertIsNotNone(get_user(db, "alice"))
+        with sessionmaker(bind=self.replicas[0])() as db:
+            self.assertIsNone(get_user(db, "alice"))
+
+    def test_unhealthy_replicas_are_skipped(self):
+        broken = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'missing', 'x.db')}", poolclass=NullPool)
+        router = ReplicaRouter([broken, self.replicas[0]], health_interval_s=3600)
+        router.check()
+        self.assertEqual(router.healthy, [False, True])
+        self.assertEqual({router.pick() for _ in range(4)}, {1})
+
+        router = ReplicaRouter([broken], health_interval_s=3600)
+        router.check()
+        create_user(sessionmaker(bind=self.primary)(), "bob", "hash")
+        with sessionmaker(bind=self.primary, class_=RoutingSession, router=router, replicas=[broken])() as db:
+            # every replica is down: reads fall back to the primary
+            self.assertIsNotNone(get_user(db, "bob"))
+
+    def test_use_primary(self):
+        with sessionmaker(bind=self.primary)() as db:
+            create_user(db, "carol", "hash")
+        with self.Session() as db:
+            self.assertIsNone(get_user(db, "carol"))
+            self.assertIsNotNone(get_user(use_primary(db), "carol"))
+        # plain sessions are left alone
+        self.assertFalse(routes_reads(use_primary(sessionmaker(bind=self.primary)())))
+
+
+class TestAsyncUrl(unittest.TestCase):
+    def test_postgres_urls_use_asyncpg(self):
+        for url in ("postgresql://user:pass@db:5432/predictions",
+                    "postgresql+psycopg2://user:pass@db:5432/predictions",
+                    "postgresql+psycopg://user:pass@db:5432/predictions"):
+            self.assertEqual(async_url(url), "postgresql+asyncpg://user:pass@db:5432/predictions")
+
+    def test_driverless_postgres_urls_use_psycopg2(self):
+        self.assertEqual(sync_url("postgresql://user:pass@db:5432/predictions"),
+                         "postgresql+psycopg2://user:pass@db:5432/predictions")
+        self.assertEqual(sync_url("postgresql+psycopg2://user:pass@db/predictions"),
+                         "postgresql+psycopg2://user:pass@db/predictions")
+
+    def test_other_urls_are_kept(self):
+        self.assertEqual(async_url("sqlite+aiosqlite:///./predictions.db"), "sqlite+aiosqlite:///./predictions.db")
+        self.assertEqual(sync_url("sqlite:///./predictions.db"), "sqlite:///./predictions.db")
+
+
+class TestReadYourWrites(unittest.TestCase):
+    def test_fresh_prediction_is_read_from_the_primary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = [os.path.join(tmp, name) for name in ("primary.db", "replica.db")]
+            for path in paths:
+                engine = create_engine(f"sqlite:///{path}")
+                Base.metadata.create_all(bind=engine)
+                engine.dispose()
+            engine = create_engine(f"sqlite:///{paths[0]}")
+            with sessionmaker(bind=engine)() as db:
+                save_prediction_with_detections(db, "fresh", "o.jpg", "p.jpg", "rwuser", [("cat", 0.9, [0, 0, 1, 1])])
+            engine.dispose()
+
+            primary, replica = [create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool) for path in paths]
+            router = ReplicaRouter([create_engine(f"sqlite:///{paths[1]}", poolclass=NullPool)], health_interval_s=3600)
+            AsyncSessionTest = async_sessionmaker(bind=primary, sync_session_class=RoutingSession,
+                                                  router=router, replicas=[replica.sync_engine])
+
+            async def override_get_async_db():
+                async with AsyncSessionTest() as db:
+                    yield db
+
+            app.dependency_overrides[get_async_db] = override_get_async_db
+            app.dependency_overrides[get_current_username] = lambda: "rwuser"
+            try:
+                resp = TestClient(app).get("/prediction/fresh")
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.json()["detection_objects"][0]["label"], "cat")
+                self.assertEqual(TestClient(app).get("/prediction/missing").status_code, 404)
+            finally:
+                app.dependency_overrides = {}
+                for engine in (primary, replica):
+                    asyncio.run(engine.dispose())
+
+
+if __name__ == '__main__':
+    unittest.main()
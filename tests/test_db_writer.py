@@ -0,0 +1,71 @@
+import os
+import tempfile
+import threading
+import unittest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from db import apply_sqlite_pragmas
+from db_writer import WriteQueue
+from models import Base, PredictionSession
+from queries import save_prediction_with_detections, create_user
+
+
+class TestWriteQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'wal.db')}",
+                                    connect_args={"check_same_thread": False})
+        event.listen(self.engine, "connect", apply_sqlite_pragmas)
+        Base.metadata.create_all(bind=self.engine)
+        self.SessionTest = sessionmaker(bind=self.engine, autoflush=False)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_pragmas_are_applied(self):
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(conn.execute(text("PRAGMA synchronous")).scalar(), 1)  # NORMAL
+            self.assertEqual(conn.execute(text("PRAGMA busy_timeout")).scalar(), 5000)
+
+    def test_concurrent_writes_are_group_committed(self):
+        writer = WriteQueue(self.SessionTest, max_batch_size=64, max_wait_ms=50)
+        gate = threading.Event()
+
+        def write(i):
+            gate.wait(timeout=5)
+            writer.run(save_prediction_with_detections, f"uid-{i}", "o.jpg", "p.jpg", None,
+                       [("person", 0.5, [0, 0, 1, 1])], image_size=(10, 10))
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        gate.set()
+        for t in threads:
+            t.join(timeout=10)
+
+        with self.SessionTest() as db:
+            self.assertEqual(db.query(PredictionSession).count(), 20)
+        self.assertLess(writer.commits, 20)
+
+    def test_failing_job_does_not_lose_the_others(self):
+        writer = WriteQueue(self.SessionTest, max_wait_ms=50)
+        futures = [
+            writer.submit(create_user, "alice", "hash"),
+            writer.submit(create_user, "alice", "hash"),  # duplicate primary key
+            writer.submit(create_user, "bob", "hash"),
+        ]
+
+        self.assertIsNone(futures[0].result(timeout=5))
+        with self.assertRaises(Exception):
+            futures[1].result(timeout=5)
+        self.assertIsNone(futures[2].result(timeout=5))
+        with self.SessionTest() as db:
+            names = [row[0] for row in db.execute(text("SELECT username FROM users ORDER BY username"))]
+        self.assertEqual(names, ["alice", "bob"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,11 +3,14 @@ from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 
 from app import app, get_current_username, get_db
+from storage import InMemoryStorage, PresignedUrlCache
 
 AUTH_USER = "testuser"
 UID = "test-delete-uid"
 ORIG = f"uploads/original/{UID}.jpg"
 PRED = f"uploads/predicted/{UID}.jpg"
+S3_ORIG = f"c1/original/{UID}.jpg"
+S3_PRED = f"c1/predicted/{UID}.jpg"
 
 
 class TestDeletePredictionEndpoint(unittest.TestCase):
@@ -30,9 +33,8 @@ class TestDeletePredictionEndpoint(unittest.TestCase):
     # ------------------- tests -------------------
 
     @patch("app.safe_delete_file")
-    @patch("app.delete_prediction_and_detections")
-    @patch("app.get_prediction_file_paths", return_value=(ORIG, PRED))
-    def test_delete_prediction_success(self, mock_paths, mock_delete_db, mock_safe_delete):
+    @patch("app.delete_prediction_and_detections", return_value=(ORIG, PRED, None, None))
+    def test_delete_prediction_success(self, mock_delete_db, mock_safe_delete):
         """Happy path: paths found -> delete DB rows and both files"""
         resp = self.client.delete(f"/prediction/{UID}")
         self.assertEqual(resp.status_code, 200)
@@ -46,19 +48,54 @@ class TestDeletePredictionEndpoint(unittest.TestCase):
         mock_safe_delete.assert_any_call(PRED)
         self.assertEqual(mock_safe_delete.call_count, 2)
 
-    @patch("app.get_prediction_file_paths", return_value=None)
-    def test_delete_prediction_not_found(self, mock_paths):
-        """If no paths for uid/user -> 404"""
+    @patch("app.safe_delete_file")
+    @patch("app.delete_prediction_and_detections", return_value=(ORIG, PRED, S3_ORIG, S3_PRED))
+    def test_delete_prediction_removes_object_storage_copies(self, mock_delete_db, mock_safe_delete):
+        """S3 copies are deleted and their presigned URLs are no longer handed out"""
+        storage = InMemoryStorage(latency_ms=0)
+        for key in (S3_ORIG, S3_PRED, "c1/original/other.jpg"):
+            storage.put(key, b"img")
+        urls = PresignedUrlCache()
+        signer = MagicMock()
+        signer.url.side_effect = lambda key, expires_s: f"https://s3/{key}"
+        for key in (S3_ORIG, S3_PRED):
+            urls.sign(signer, key)
+
+        with patch("app.object_storage", storage), patch("app.presigned_urls", urls):
+            resp = self.client.delete(f"/prediction/{UID}")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(list(storage.objects), ["c1/original/other.jpg"])
+        self.assertIsNone(urls.get(S3_ORIG))
+        self.assertIsNone(urls.get(S3_PRED))
+
+    @patch("app.safe_delete_file")
+    @patch("app.delete_prediction_and_detections", return_value=(S3_ORIG, S3_PRED, S3_ORIG, S3_PRED))
+    def test_delete_zero_disk_prediction(self, mock_delete_db, mock_safe_delete):
+        """Rows stored with PREDICT_STORAGE=s3 hold object keys, which never go to local storage"""
+        storage = InMemoryStorage(latency_ms=0)
+        for key in (S3_ORIG, S3_PRED):
+            storage.put(key, b"img")
+
+        with patch("app.object_storage", storage):
+            resp = self.client.delete(f"/prediction/{UID}")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(storage.objects, {})
+        mock_safe_delete.assert_not_called()
+
+    @patch("app.delete_prediction_and_detections", return_value=None)
+    def test_delete_prediction_not_found(self, mock_delete_db):
+        """If nothing was deleted for uid/user -> 404"""
         resp = self.client.delete("/prediction/nonexistent-id")
         self.assertEqual(resp.status_code, 404)
         self.assertEqual(resp.json()["detail"], "Prediction not found")
 
     @patch("app.safe_delete_file")
-    @patch("app.delete_prediction_and_detections")
-    @patch("app.get_prediction_file_paths", return_value=(ORIG, PRED))
+    @patch("app.delete_prediction_and_detections", return_value=(ORIG, PRED, None, None))
     @patch("app.os.path.exists", return_value=False)  # make safe_delete_file do nothing internally
     def test_delete_prediction_files_already_deleted(
-        self, mock_exists, mock_paths, mock_delete_db, mock_safe_delete
+        self, mock_exists, mock_delete_db, mock_safe_delete
     ):
         """Files already gone -> still 200 and DB deleted"""
         resp = self.client.delete(f"/prediction/{UID}")
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import app, get_current_username, get_async_db
+from models import Base
+from queries import save_prediction_with_detections
+
+
+class TestDetectionSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "search.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        SessionTest = sessionmaker(bind=engine, autoflush=False)
+
+        with SessionTest() as db:
+            # 100x100 frame: a big person, a small person, a car on each side
+            save_prediction_with_detections(db, "p1", "o.jpg", "p.jpg", "searchuser", [
+                ("person", 0.9, [10, 10, 60, 60]),
+                ("person", 0.6, [0, 0, 5, 5]),
+                ("car", 0.8, [5, 40, 45, 80]),
+                ("car", 0.7, [55, 40, 95, 80]),
+            ], image_size=(100, 100))
+            save_prediction_with_detections(db, "other", "o.jpg", "p.jpg", "someoneelse", [
+                ("person", 0.9, [0, 0, 100, 100]),
+            ], image_size=(100, 100))
+        engine.dispose()
+        AsyncSessionTest = async_sessionmaker(bind=create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool))
+
+        async def override_get_async_db():
+            async with AsyncSessionTest() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_current_username] = lambda: "searchuser"
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+        cls.tmp.cleanup()
+
+    def test_persons_larger_than_a_tenth_of_the_frame(self):
+        resp = self.client.get("/detections?label=person&min_area=0.1")
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["box"], [10.0, 10.0, 60.0, 60.0])
+        self.assertEqual(data[0]["image_size"], [100, 100])
+        self.assertEqual(data[0]["prediction_uid"], "p1")
+
+    def test_cars_in_the_left_half(self):
+        data = self.client.get("/detections?label=car&max_x=0.5").json()
+        self.assertEqual([d["box"][0] for d in data], [5.0])
+
+    def test_only_own_detections_are_returned(self):
+        data = self.client.get("/detections").json()
+        self.assertEqual(len(data), 4)
+        self.assertTrue(all(d["prediction_uid"] == "p1" for d in data))
+
+    def test_fractions_are_validated(self):
+        self.assertEqual(self.client.get("/detections?min_area=2").status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from engines import (
+    load_engine, get_engine_class, TorchEngine, OnnxEngine, OpenVinoEngine,
+)
+
+
+class TestInferenceEngines(unittest.TestCase):
+    def test_backend_selection(self):
+        self.assertIs(get_engine_class("torch"), TorchEngine)
+        self.assertIs(get_engine_class("onnx"), OnnxEngine)
+        self.assertIs(get_engine_class("openvino"), OpenVinoEngine)
+
+    def test_unknown_backend_rejected(self):
+        with self.assertRaises(ValueError):
+            get_engine_class("tensorrt")
+
+    def test_artifact_paths(self):
+        self.assertEqual(TorchEngine.artifact_path("models/yolov8n.pt"), "models/yolov8n.pt")
+        self.assertEqual(OnnxEngine.artifact_path("models/yolov8n.pt"), "models/yolov8n.onnx")
+        self.assertEqual(OpenVinoEngine.artifact_path("models/yolov8n.pt"), "models/yolov8n_openvino_model")
+
+    @patch("engines.os.path.exists", return_value=False)
+    def test_missing_export_points_to_export_command(self, _):
+        with self.assertRaises(FileNotFoundError) as ctx:
+            load_engine("onnx", "yolov8n.pt")
+        self.assertIn("python export_model.py onnx", str(ctx.exception))
+
+    @patch("engines.os.path.exists", return_value=True)
+    @patch("ultralytics.YOLO")
+    def test_exported_engine_loads_artifact_and_forwards_calls(self, mock_yolo, _):
+        fake_model = MagicMock()
+        fake_model.names = {0: "person"}
+        fake_model.return_value = ["result"]
+        mock_yolo.return_value = fake_model
+
+        engine = load_engine("onnx", "yolov8n.pt")
+
+        mock_yolo.assert_called_once_with("yolov8n.onnx", task="detect")
+        self.assertEqual(engine.names, {0: "person"})
+        self.assertEqual(engine(["a.jpg"], device="cpu"), ["result"])
+        fake_model.assert_called_once_with(["a.jpg"], device="cpu", verbose=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
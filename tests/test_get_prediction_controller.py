@@ -21,11 +21,12 @@ class FakePrediction:
         self.timestamp = timestamp
         self.original_image = original_image
         self.predicted_image = predicted_image
+        self.detections = []
 
 
 class TestGetPredictionByUID(unittest.TestCase):
 
-    @patch("app.get_prediction")  # Patch where it's used (in app.py), not where it's defined
+    @patch("app.get_prediction_with_detections")  # Patch where it's used (in app.py), not where it's defined
     @patch("app.get_current_username", return_value="testuser")
     def test_prediction_found(self, mock_auth, mock_get_prediction):
         # Arrange
@@ -47,10 +48,10 @@ class TestGetPredictionByUID(unittest.TestCase):
             "timestamp": "2023-01-01T00:00:00",
             "original_image": "uploads/original/abc123.jpg",
             "predicted_image": "uploads/predicted/abc123.jpg",
-            "detection_objects": []  # Since we didn't mock get_detections yet
+            "detection_objects": []  # FakePrediction has no detections
         })
 
-    @patch("app.get_prediction")
+    @patch("app.get_prediction_with_detections")
     @patch("app.get_current_username", return_value="testuser")
     def test_prediction_not_found(self, mock_auth, mock_get_prediction):
         mock_get_prediction.return_value = None
@@ -0,0 +1,88 @@
+import threading
+import unittest
+
+from inference import BatchScheduler
+
+
+class TestBatchScheduler(unittest.TestCase):
+    def test_single_request_gets_its_own_result(self):
+        scheduler = BatchScheduler(lambda sources: [s.upper() for s in sources], max_wait_ms=0)
+        self.assertEqual(scheduler.predict("a.jpg"), "A.JPG")
+
+    def test_concurrent_requests_share_one_batch(self):
+        batches = []
+        release = threading.Event()
+
+        def predict_fn(sources):
+            batches.append(list(sources))
+            release.wait(timeout=5)
+            return [f"result-{s}" for s in sources]
+
+        scheduler = BatchScheduler(predict_fn, max_batch_size=4, max_wait_ms=200)
+        futures = [scheduler.submit(f"img{i}") for i in range(4)]
+        release.set()
+
+        self.assertEqual([f.result(timeout=5) for f in futures],
+                         ["result-img0", "result-img1", "result-img2", "result-img3"])
+        self.assertEqual(batches, [["img0", "img1", "img2", "img3"]])
+
+    def test_batch_size_is_capped(self):
+        batches = []
+        gate = threading.Event()
+
+        def predict_fn(sources):
+            gate.wait(timeout=5)
+            batches.append(len(sources))
+            return list(sources)
+
+        scheduler = BatchScheduler(predict_fn, max_batch_size=2, max_wait_ms=200)
+        futures = [scheduler.submit(i) for i in range(5)]
+        gate.set()
+
+        self.assertEqual([f.result(timeout=5) for f in futures], [0, 1, 2, 3, 4])
+        self.assertTrue(all(size <= 2 for size in batches))
+        self.assertEqual(sum(batches), 5)
+
+    def test_model_error_is_raised_to_every_caller(self):
+        def predict_fn(sources):
+            raise ValueError("model exploded")
+
+        scheduler = BatchScheduler(predict_fn, max_wait_ms=0)
+        with self.assertRaises(ValueError):
+            scheduler.predict("x.jpg")
+
+    def test_result_count_mismatch_is_an_error(self):
+        scheduler = BatchScheduler(lambda sources: [], max_wait_ms=0)
+        with self.assertRaises(RuntimeError):
+            scheduler.predict("x.jpg")
+
+    def test_batches_wait_for_the_inference_lock(self):
+        scheduler = BatchScheduler(lambda sources: list(sources), max_wait_ms=0)
+        with scheduler.inference_lock:
+            future = scheduler.submit("x.jpg")
+            self.assertFalse(future.done())
+        self.assertEqual(future.result(timeout=5), "x.jpg")
+
+    def test_requests_with_different_options_are_batched_separately(self):
+        calls = []
+        gate = threading.Event()
+
+        def predict_fn(sources, **options):
+            gate.wait(timeout=5)
+            calls.append((list(sources), options))
+            return list(sources)
+
+        scheduler = BatchScheduler(predict_fn, max_batch_size=8, max_wait_ms=200)
+        futures = [
+            scheduler.submit("a", {"imgsz": 320}),
+            scheduler.submit("b", {"imgsz": 640}),
+            scheduler.submit("c", {"imgsz": 320}),
+        ]
+        gate.set()
+
+        self.assertEqual([f.result(timeout=5) for f in futures], ["a", "b", "c"])
+        self.assertEqual(calls, [(["a", "c"], {"imgsz": 320}), (["b"], {"imgsz": 640})])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app import app, get_optional_username, get_db
+from inference import resolve_inference_options, QUALITY_TIERS
+from tests.helpers import temp_upload_dirs
+
+NAMES = {0: "person", 1: "bicycle", 2: "car"}
+
+
+class TestResolveInferenceOptions(unittest.TestCase):
+    def test_default_tier_is_model_defaults(self):
+        self.assertEqual(resolve_inference_options(NAMES), {})
+
+    def test_tier_presets_and_overrides(self):
+        options = resolve_inference_options(NAMES, tier="fast", conf=0.5)
+        self.assertEqual(options["imgsz"], QUALITY_TIERS["fast"]["imgsz"])
+        self.assertEqual(options["max_det"], QUALITY_TIERS["fast"]["max_det"])
+        self.assertEqual(options["conf"], 0.5)
+
+    def test_class_allow_list_maps_to_indices(self):
+        options = resolve_inference_options(NAMES, classes=["car", "person", "car"])
+        self.assertEqual(options["classes"], [0, 2])
+
+    def test_unknown_tier_or_label_rejected(self):
+        with self.assertRaises(ValueError):
+            resolve_inference_options(NAMES, tier="ultra")
+        with self.assertRaises(ValueError):
+            resolve_inference_options(NAMES, classes=["unicorn"])
+
+
+class TestPredictQualityParameters(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+
+        def override_get_db():
+            yield MagicMock()
+
+        app.dependency_overrides[get_optional_username] = lambda: "tieruser"
+        app.dependency_overrides[get_db] = override_get_db
+        cls.enterClassContext(temp_upload_dirs())
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+
+    def _mock_model(self, mock_model):
+        fake_result = MagicMock()
+        fake_result.boxes = []
+        fake_result.plot.return_value = np.zeros((10, 10, 3), dtype=np.uint8)
+        mock_model.return_value = [fake_result]
+        mock_model.names = NAMES
+
+    @patch("app.save_prediction_with_detections")
+    @patch("app.model")
+    def test_tier_and_filters_reach_the_model(self, mock_model, *_):
+        self._mock_model(mock_model)
+
+        resp = self.client.post(
+            "/predict?tier=fast&max_det=5&classes=car&classes=person",
+            files={"file": ("t.jpg", b"bytes", "image/jpeg")},
+        )
+        self.assertEqual(resp.status_code, 200)
+
+        kwargs = mock_model.call_args.kwargs
+        self.assertEqual(kwargs["imgsz"], 320)
+        self.assertEqual(kwargs["max_det"], 5)
+        self.assertEqual(kwargs["classes"], [0, 2])
+
+    @patch("app.model")
+    def test_unknown_tier_is_400(self, mock_model):
+        self._mock_model(mock_model)
+        resp = self.client.post("/predict?tier=ultra", files={"file": ("t.jpg", b"bytes", "image/jpeg")})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Unknown tier", resp.json()["detail"])
+        mock_model.assert_not_called()
+
+    @patch("app.model")
+    def test_unknown_class_is_400(self, mock_model):
+        self._mock_model(mock_model)
+        resp = self.client.post("/predict?classes=unicorn", files={"file": ("t.jpg", b"bytes", "image/jpeg")})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("unicorn", resp.json()["detail"])
+
+    def test_out_of_range_confidence_is_422(self):
+        resp = self.client.post("/predict?conf=2", files={"file": ("t.jpg", b"bytes", "image/jpeg")})
+        self.assertEqual(resp.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
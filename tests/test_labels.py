@@ -1,9 +1,18 @@
 # tests/test_labels_endpoint.py
+import os
+import asyncio
+import tempfile
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 
-from app import app, get_current_username, get_db
+from app import app, get_current_username, get_async_db
+from models import Base
+from queries import save_prediction_with_detections
 
 
 class TestLabelsEndpoint(unittest.TestCase):
@@ -11,16 +20,27 @@ class TestLabelsEndpoint(unittest.TestCase):
     def setUpClass(cls):
         cls.client = TestClient(app)
 
-        # ---- dependency overrides: no real auth/DB ----
-        def override_get_db():
-            yield MagicMock()  # fake Session
+        # file database: written through a sync session, read by the endpoint's aiosqlite session
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "labels.db")
+        engine = create_engine(f"sqlite:///{path}", poolclass=NullPool)
+        Base.metadata.create_all(bind=engine)
+        cls.Session = sessionmaker(bind=engine)
+        cls.async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        AsyncSessionTest = async_sessionmaker(bind=cls.async_engine)
+
+        async def override_get_async_db():
+            async with AsyncSessionTest() as db:
+                yield db
 
         app.dependency_overrides[get_current_username] = lambda: "testuser"
-        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
 
     @classmethod
     def tearDownClass(cls):
         app.dependency_overrides = {}
+        asyncio.run(cls.async_engine.dispose())
+        cls.tmp.cleanup()
 
     @patch("app.get_unique_labels_last_week", return_value=["person", "car", "bicycle"])
     def test_labels_endpoint_success(self, mock_get_unique):
@@ -37,10 +57,21 @@ class TestLabelsEndpoint(unittest.TestCase):
         # ensure the route called the query with correct args
         (db_arg, username_arg) = mock_get_unique.call_args[0]
         assert username_arg == "testuser"
-        assert db_arg is not None  # it's the MagicMock yielded by override_get_db
+        assert db_arg is not None  # the session yielded by override_get_async_db
 
     @patch("app.get_unique_labels_last_week", return_value=[])
     def test_labels_endpoint_empty(self, mock_get_unique):
         resp = self.client.get("/labels")
         assert resp.status_code == 200
         assert resp.json() == {"labels": []}
+
+    def test_labels_from_stored_predictions(self):
+        with self.Session() as db:
+            save_prediction_with_detections(db, "l1", "o1.jpg", "p1.jpg", "testuser",
+                                            [("person", 0.9, [0, 0, 1, 1]), ("car", 0.7, [0, 0, 1, 1])])
+            save_prediction_with_detections(db, "l2", "o2.jpg", "p2.jpg", "testuser", [("person", 0.8, [0, 0, 1, 1])])
+            save_prediction_with_detections(db, "l3", "o3.jpg", "p3.jpg", "someoneelse", [("dog", 0.5, [0, 0, 1, 1])])
+
+        resp = self.client.get("/labels")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(sorted(resp.json()["labels"]), ["car", "person"])
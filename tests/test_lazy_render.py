@@ -0,0 +1,110 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import app, get_optional_username, get_current_username, get_db
+from models import Base
+from rendering import RenderCache, render_detections
+from tests.helpers import make_result, temp_upload_dirs
+
+
+def png_bytes():
+    ok, buf = cv2.imencode(".png", np.full((32, 32, 3), 200, dtype=np.uint8))
+    return buf.tobytes()
+
+
+class TestRenderCache(unittest.TestCase):
+    def test_bounded_by_bytes(self):
+        cache = RenderCache(max_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.put("c", b"123")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), b"123")
+        self.assertLessEqual(cache.size, 10)
+
+    def test_oversized_entries_are_not_cached(self):
+        cache = RenderCache(max_bytes=4)
+        cache.put("big", b"12345")
+        self.assertIsNone(cache.get("big"))
+        self.assertEqual(cache.size, 0)
+
+    def test_render_draws_stored_boxes(self):
+        original = np.zeros((40, 40, 3), dtype=np.uint8)
+        detection = MagicMock(label="person", score=0.8, box=[5.0, 5.0, 30.0, 30.0])
+        frame = render_detections(original, [detection], {0: "person"})
+        self.assertEqual(frame.shape, (40, 40, 3))
+        self.assertGreater(frame.sum(), 0)
+
+
+class TestLazyRenderEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        SessionTest = sessionmaker(bind=engine, autoflush=False)
+
+        def override_get_db():
+            db = SessionTest()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_optional_username] = lambda: "lazyuser"
+        app.dependency_overrides[get_current_username] = lambda: "lazyuser"
+        cls.dirs = cls.enterClassContext(temp_upload_dirs())
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+
+    @patch("app.model")
+    def test_predict_defers_rendering_until_image_is_requested(self, mock_model):
+        mock_model.return_value = [make_result()]
+        mock_model.names = {0: "person"}
+
+        with patch("app.render_cache", RenderCache()):
+            uid = self.client.post("/predict", files={"file": ("p.png", png_bytes(), "image/png")}).json()["prediction_uid"]
+
+            mock_model.return_value[0].plot.assert_not_called()
+            self.assertFalse(os.path.exists(os.path.join(self.dirs["PREDICTED_DIR"], f"{uid}.png")))
+
+            with patch("app.render_detections", wraps=render_detections) as mock_render:
+                first = self.client.get(f"/prediction/{uid}/image", headers={"Accept": "image/png"})
+                second = self.client.get(f"/image/predicted/{uid}.png")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers["content-type"], "image/png")
+        self.assertEqual(first.content[:4], b"\x89PNG")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        # rendered once, then served from the render cache
+        mock_render.assert_called_once()
+
+    @patch("app.model")
+    def test_eager_render_flag_renders_during_predict(self, mock_model):
+        mock_model.return_value = [make_result()]
+        mock_model.names = {0: "person"}
+
+        resp = self.client.post("/predict?eager_render=true", files={"file": ("e.png", png_bytes(), "image/png")})
+        uid = resp.json()["prediction_uid"]
+
+        mock_model.return_value[0].plot.assert_called_once()
+        self.assertTrue(os.path.exists(os.path.join(self.dirs["PREDICTED_DIR"], f"{uid}.png")))
+
+    def test_unknown_prediction_image_is_404(self):
+        resp = self.client.get("/image/predicted/not-mine.png")
+        self.assertEqual(resp.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
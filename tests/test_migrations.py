@@ -0,0 +1,242 @@
+import os
+import tempfile
+import threading
+import unittest
+from contextlib import contextmanager
+from unittest.mock import patch, MagicMock
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+
+from migrations import migrate, status, MIGRATIONS
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE users (username VARCHAR PRIMARY KEY, password VARCHAR NOT NULL)",
+    "CREATE TABLE prediction_sessions (uid VARCHAR PRIMARY KEY, timestamp DATETIME, original_image VARCHAR, "
+    "predicted_image VARCHAR, username VARCHAR REFERENCES users(username))",
+    "CREATE TABLE detection_objects (id INTEGER PRIMARY KEY AUTOINCREMENT, prediction_uid VARCHAR "
+    "REFERENCES prediction_sessions(uid), label VARCHAR, score FLOAT, box VARCHAR)",
+]
+
+
+def make_engine():
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+
+class TestMigrations(unittest.TestCase):
+    def test_existing_database_gets_indexes(self):
+        engine = make_engine()
+        with engine.begin() as conn:
+            for statement in LEGACY_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO prediction_sessions (uid, username) VALUES ('u1', 'alice')"))
+
+        applied = migrate(engine)
+
+        self.assertEqual(applied, [name for _, name, _ in MIGRATIONS])
+        names = {ix["name"] for ix in inspect(engine).get_indexes("detection_objects")}
+        self.assertIn("ix_detection_objects_label_prediction_uid", names)
+        self.assertIn("ix_detection_objects_score_prediction_uid", names)
+        with engine.connect() as conn:
+            # existing rows survive
+            self.assertEqual(conn.execute(text("SELECT count(*) FROM prediction_sessions")).scalar(), 1)
+            plan = " ".join(str(row) for row in conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT prediction_uid FROM detection_objects WHERE label = 'person'"
+            )))
+        self.assertIn("ix_detection_objects_label_prediction_uid", plan)
+
+    def test_string_boxes_become_numeric_columns(self):
+        engine = make_engine()
+        with engine.begin() as conn:
+            for statement in LEGACY_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO prediction_sessions (uid, username) VALUES ('u1', 'alice')"))
+            conn.execute(text(
+                "INSERT INTO detection_objects (prediction_uid, label, score, box) "
+                "VALUES ('u1', 'person', 0.9, '[1.5, 2, 30.25, 40.0]')"
+            ))
+
+        migrate(engine)
+
+        columns = {c["name"] for c in inspect(engine).get_columns("detection_objects")}
+        self.assertNotIn("box", columns)
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT x1, y1, x2, y2, img_w FROM detection_objects")).one()
+        self.assertEqual(tuple(row), (1.5, 2.0, 30.25, 40.0, None))
+
+    def test_video_track_boxes_become_numeric_columns(self):
+        engine = make_engine()
+        with engine.begin() as conn:
+            for statement in LEGACY_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text(
+                "CREATE TABLE video_sessions (uid VARCHAR PRIMARY KEY, timestamp DATETIME, "
+                "username VARCHAR REFERENCES users(username))"
+            ))
+            conn.execute(text(
+                "CREATE TABLE video_tracks (id INTEGER PRIMARY KEY AUTOINCREMENT, video_uid VARCHAR "
+                "REFERENCES video_sessions(uid), track_id INTEGER, label VARCHAR, score FLOAT, box VARCHAR, "
+                "first_frame INTEGER, last_frame INTEGER)"
+            ))
+            conn.execute(text("INSERT INTO video_sessions (uid) VALUES ('v1')"))
+            conn.execute(text(
+                "INSERT INTO video_tracks (video_uid, track_id, label, score, box, first_frame, last_frame) "
+                "VALUES ('v1', 1, 'person', 0.9, '[1.0, 2.0, 3.5, 4.0]', 0, 4)"
+            ))
+
+        migrate(engine)
+
+        self.assertNotIn("box", {c["name"] for c in inspect(engine).get_columns("video_tracks")})
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT x1, y1, x2, y2 FROM video_tracks")).one()
+        self.assertEqual(tuple(row), (1.0, 2.0, 3.5, 4.0))
+
+    def test_outbox_rows_reference_their_prediction(self):
+        engine = make_engine()
+        with engine.begin() as conn:
+            for statement in LEGACY_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text(
+                "CREATE TABLE s3_outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, bucket VARCHAR NOT NULL, "
+                "key VARCHAR NOT NULL, source_key VARCHAR, local_path VARCHAR, payload BLOB, "
+                "attempts INTEGER NOT NULL, next_attempt_at DATETIME NOT NULL, last_error TEXT, created_at DATETIME)"
+            ))
+
+        migrate(engine)
+
+        self.assertIn("ix_s3_outbox_prediction_uid", {i["name"] for i in inspect(engine).get_indexes("s3_outbox")})
+        with engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+            conn.execute(text("INSERT INTO prediction_sessions (uid) VALUES ('u1')"))
+            conn.execute(text(
+                "INSERT INTO s3_outbox (bucket, key, attempts, next_attempt_at, prediction_uid) "
+                "VALUES ('b', 'k', 0, CURRENT_TIMESTAMP, 'u1')"
+            ))
+            conn.execute(text("DELETE FROM prediction_sessions WHERE uid = 'u1'"))
+            self.assertEqual(conn.execute(text("SELECT count(*) FROM s3_outbox")).scalar(), 0)
+
+    def test_child_foreign_keys_become_cascading(self):
+        engine = make_engine()
+        with engine.begin() as conn:
+            for statement in LEGACY_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO prediction_sessions (uid, username) VALUES ('u1', 'alice')"))
+            conn.execute(text(
+                "INSERT INTO detection_objects (prediction_uid, label, score, box) "
+                "VALUES ('u1', 'person', 0.9, '[0, 0, 1, 1]'), ('gone', 'cat', 0.5, '[0, 0, 1, 1]')"
+            ))
+
+        migrate(engine)
+
+        foreign_key = inspect(engine).get_foreign_keys("detection_objects")[0]
+        self.assertEqual(foreign_key["options"].get("ondelete"), "CASCADE")
+        with engine.begin() as conn:
+            # the orphaned detection is dropped, the other one survives
+            self.assertEqual(conn.execute(text("SELECT prediction_uid FROM detection_objects")).all(), [("u1",)])
+            conn.execute(text("PRAGMA foreign_keys=ON"))
+            conn.execute(text("DELETE FROM prediction_sessions WHERE uid = 'u1'"))
+            self.assertEqual(conn.execute(text("SELECT count(*) FROM detection_objects")).scalar(), 0)
+
+    def test_fresh_database_and_rerun(self):
+        engine = make_engine()
+        migrate(engine)
+        self.assertEqual(migrate(engine), [])
+        self.assertTrue(all(done for _, _, done in status(engine)))
+        names = {ix["name"] for ix in inspect(engine).get_indexes("prediction_sessions")}
+        self.assertIn("ix_prediction_sessions_username_timestamp_uid", names)
+
+    def test_concurrent_runs_apply_each_migration_once(self):
+        # one engine per "replica", all starting up against the same database file
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'shared.db')}"
+            engines = [create_engine(url, connect_args={"timeout": 30}) for _ in range(4)]
+            with engines[0].begin() as conn:
+                for statement in LEGACY_SCHEMA:
+                    conn.execute(text(statement))
+
+            results, errors = [], []
+
+            def run(engine):
+                try:
+                    results.append(migrate(engine))
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=run, args=(engine,)) for engine in engines]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for engine in engines:
+                engine.dispose()
+
+            self.assertEqual(errors, [])
+            applied = [name for names in results for name in names]
+            self.assertEqual(sorted(applied), sorted(name for _, name, _ in MIGRATIONS))
+
+
+class FakePostgresLocks:
+    """Engine stand-in that only serves the advisory lock statements of migration_lock()."""
+
+    def __init__(self):
+        self.dialect = MagicMock()
+        self.dialect.name = "postgresql"
+        self.lock = threading.Lock()
+        self.statements = []
+
+    def connect(self):
+        conn = MagicMock()
+        conn.__enter__.return_value = conn
+        conn.execution_options.return_value = conn
+        conn.execute.side_effect = self.execute
+        return conn
+
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        result = MagicMock()
+        if "pg_try_advisory_lock" in sql:
+            result.scalar.return_value = self.lock.acquire(blocking=False)
+        elif "pg_advisory_unlock" in sql:
+            self.lock.release()
+        return result
+
+
+class TestPostgresMigrationLock(unittest.TestCase):
+    def test_concurrent_runs_poll_for_the_lock(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # the steps run on SQLite without BEGIN EXCLUSIVE: only the advisory lock keeps the runs apart
+            database = create_engine(f"sqlite:///{os.path.join(tmp, 'shared.db')}", connect_args={"timeout": 30})
+
+            @contextmanager
+            def plain_transaction(engine, transactional=True):
+                with database.begin() as conn:
+                    yield conn
+
+            locks = FakePostgresLocks()
+            results, errors = [], []
+
+            def run():
+                try:
+                    results.append(migrate(locks))
+                except Exception as e:
+                    errors.append(e)
+
+            with patch("migrations.step_connection", plain_transaction), \
+                 patch("migrations.MIGRATION_LOCK_POLL_S", 0.01):
+                threads = [threading.Thread(target=run) for _ in range(2)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            database.dispose()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(name for names in results for name in names),
+                         sorted(name for _, name, _ in MIGRATIONS))
+        # nobody ever sits inside a blocking pg_advisory_lock() holding a snapshot
+        self.assertFalse(any("pg_advisory_lock(" in sql for sql in locks.statements))
+        self.assertGreater(sum("pg_try_advisory_lock" in sql for sql in locks.statements), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
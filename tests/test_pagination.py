@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import app, get_current_username, get_async_db
+from models import Base, PredictionSession, DetectionObject
+from queries import encode_cursor, decode_cursor
+
+
+class TestKeysetPagination(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "pages.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+
+        base = datetime(2025, 1, 1, 12, 0, 0)
+        with sessionmaker(bind=engine)() as db:
+            for i in range(7):
+                # p3 and p4 share a timestamp, so the uid tie-break matters
+                timestamp = base + timedelta(minutes=min(i, 3) if i < 5 else i)
+                db.add(PredictionSession(uid=f"p{i}", username="pageuser", timestamp=timestamp))
+                # several matching detections per session must not duplicate it
+                for score in (0.9, 0.8):
+                    db.add(DetectionObject(prediction_uid=f"p{i}", label="person", score=score))
+            db.add(PredictionSession(uid="x", username="someoneelse", timestamp=base))
+            db.add(DetectionObject(prediction_uid="x", label="person", score=0.9))
+            db.commit()
+        engine.dispose()
+
+        AsyncSessionTest = async_sessionmaker(bind=create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool))
+
+        async def override_get_async_db():
+            async with AsyncSessionTest() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_current_username] = lambda: "pageuser"
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+        cls.tmp.cleanup()
+
+    def _walk(self, url):
+        uids, pages, cursor = [], 0, None
+        while True:
+            resp = self.client.get(url + (f"&cursor={cursor}" if cursor else ""))
+            self.assertEqual(resp.status_code, 200)
+            uids += [row["uid"] for row in resp.json()]
+            pages += 1
+            cursor = resp.headers.get("X-Next-Cursor")
+            if not cursor:
+                return uids, pages
+
+    def test_pages_cover_every_session_once_newest_first(self):
+        uids, pages = self._walk("/predictions/label/person?limit=2")
+        self.assertEqual(uids, ["p6", "p5", "p4", "p3", "p2", "p1", "p0"])
+        self.assertEqual(pages, 4)
+
+    def test_score_listing_uses_the_same_pages(self):
+        uids, _ = self._walk("/predictions/score/0.85?limit=3")
+        self.assertEqual(len(uids), 7)
+        self.assertEqual(len(set(uids)), 7)
+
+    def test_last_page_has_no_cursor(self):
+        resp = self.client.get("/predictions/label/person?limit=7")
+        self.assertEqual(len(resp.json()), 7)
+        self.assertNotIn("X-Next-Cursor", resp.headers)
+
+    def test_page_size_is_capped_and_cursor_validated(self):
+        self.assertEqual(self.client.get("/predictions/label/person?limit=100000").status_code, 422)
+        self.assertEqual(self.client.get("/predictions/label/person?cursor=garbage").status_code, 400)
+
+    def test_cursor_round_trip(self):
+        timestamp = datetime(2025, 1, 1, 12, 3)
+        self.assertEqual(decode_cursor(encode_cursor(timestamp, "p3")), (timestamp, "p3"))
+
+
+if __name__ == '__main__':
+    unittest.main()
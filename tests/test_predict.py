@@ -2,6 +2,7 @@ import unittest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 from app import app
+from storage import InMemoryStorage
 import numpy as np
 import os
 
@@ -51,31 +52,27 @@ class TestPredictEndpoint(unittest.TestCase):
         self.assertEqual(data["labels"], ["person"])
 
     @patch('app.model')
-    @patch('app.AWS_S3_BUCKET', 'test-bucket')
-    @patch('app.download_file')
-    @patch('app.s3_key_exists')
-    @patch('app.upload_file')
-    @patch('app.copy_object')
-    def test_predict_with_s3(self, mock_copy, mock_upload, mock_exists, mock_download, mock_model):
+    def test_predict_with_s3(self, mock_model):
         # Setup mock model
         mock_model.return_value = self.create_mock_yolo_result()
         mock_model.names = {0: "person"}
-        
-        # Setup S3 mocks
-        mock_exists.return_value = False
-        mock_download.return_value = None
-        mock_upload.return_value = None
-        mock_copy.return_value = None
+
+        # In-process stand-in for the bucket
+        storage = InMemoryStorage("test-bucket")
+        storage.put("test/image.jpg", b"fake_image_content")
 
         # Test S3 image prediction
-        response = self.client.post("/predict?img=test/image.jpg&chat_id=test-chat")
-        
+        with patch('app.object_storage', storage):
+            response = self.client.post("/predict?img=test/image.jpg&chat_id=test-chat")
+
         self.assertEqual(response.status_code, 200)
         data = response.json()
         self.assertIn("prediction_uid", data)
         self.assertEqual(data["detection_count"], 1)
         self.assertEqual(data["labels"], ["person"])
         self.assertEqual(data["s3"]["bucket"], "test-bucket")
+        self.assertEqual(storage.get(data["s3"]["original_key"]), b"fake_image_content")
+        os.remove(f"uploads/original/{data['prediction_uid']}.jpg")
 
     def test_predict_errors(self):
         # Test no input provided
@@ -0,0 +1,101 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from app import app, get_optional_username
+from storage import InMemoryStorage
+from tests.helpers import make_result, temp_upload_dirs
+
+
+class TestPredictBatchEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+        app.dependency_overrides[get_optional_username] = lambda: "batchuser"
+        cls.dirs = cls.enterClassContext(temp_upload_dirs())
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+
+    def _lines(self, resp):
+        return [json.loads(line) for line in resp.text.splitlines() if line]
+
+    @patch("app.SessionLocal")
+    @patch("app.save_prediction_with_detections")
+    @patch("app.model")
+    def test_batch_of_uploads_streams_one_line_per_image(self, mock_model, mock_save_prediction,
+                                                          mock_session):
+        mock_model.side_effect = lambda sources, **kwargs: [make_result() for _ in sources]
+        mock_model.names = {0: "person"}
+
+        files = [
+            ("files", ("a.jpg", b"aaa", "image/jpeg")),
+            ("files", ("b.jpg", b"bbb", "image/jpeg")),
+            ("files", ("c.png", b"ccc", "image/png")),
+        ]
+        resp = self.client.post("/predict/batch", files=files)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.headers["content-type"].startswith("application/x-ndjson"))
+        lines = self._lines(resp)
+        self.assertEqual(sorted(line["index"] for line in lines), [0, 1, 2])
+        for line in lines:
+            self.assertNotIn("error", line)
+            self.assertEqual(line["labels"], ["person"])
+            self.assertEqual(line["detection_count"], 1)
+        self.assertEqual(len({line["prediction_uid"] for line in lines}), 3)
+        self.assertEqual(mock_save_prediction.call_count, 3)
+        # one DB session for the whole batch
+        mock_session.assert_called_once()
+
+    @patch("app.SessionLocal")
+    @patch("app.save_prediction_with_detections")
+    @patch("app.model")
+    def test_batch_of_s3_keys_reports_missing_objects_per_line(self, mock_model, mock_save_prediction,
+                                                                mock_session):
+        mock_model.side_effect = lambda sources, **kwargs: [make_result() for _ in sources]
+        mock_model.names = {0: "person"}
+
+        # missing.jpg is not in the bucket
+        storage = InMemoryStorage("test-bucket")
+        storage.put("chat/one.jpg", b"one")
+
+        with patch("app.object_storage", storage):
+            resp = self.client.post("/predict/batch?img=chat/one.jpg&img=missing.jpg&chat_id=c1&eager_render=true")
+
+        self.assertEqual(resp.status_code, 200)
+        lines = {line["index"]: line for line in self._lines(resp)}
+        self.assertEqual(lines[0]["s3"]["bucket"], "test-bucket")
+        self.assertTrue(lines[0]["s3"]["predicted_key"].startswith("c1/predicted/"))
+        self.assertIn("S3 object not found", lines[1]["error"])
+        mock_save_prediction.assert_called_once()
+
+    @patch("app.SessionLocal")
+    @patch("app.save_prediction_with_detections")
+    @patch("app.model")
+    def test_staged_uploads_of_failed_items_are_removed(self, mock_model, mock_save_prediction, mock_session):
+        mock_model.side_effect = lambda sources, **kwargs: [make_result() for _ in sources]
+        mock_model.names = {0: "person"}
+        mock_save_prediction.side_effect = [None, RuntimeError("db down")]
+        before = set(os.listdir(self.dirs["UPLOAD_DIR"]))
+
+        files = [("files", ("a.jpg", b"aaa", "image/jpeg")), ("files", ("b.jpg", b"bbb", "image/jpeg"))]
+        resp = self.client.post("/predict/batch", files=files)
+
+        lines = self._lines(resp)
+        self.assertEqual(sum("error" in line for line in lines), 1)
+        stored = [line["prediction_uid"] for line in lines if "error" not in line]
+        new_files = set(os.listdir(self.dirs["UPLOAD_DIR"])) - before
+        self.assertEqual([os.path.splitext(name)[0] for name in new_files], stored)
+
+    def test_batch_requires_input(self):
+        resp = self.client.post("/predict/batch")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["detail"], "Provide file uploads or ?img=<s3_key>")
+
+
+if __name__ == '__main__':
+    unittest.main()
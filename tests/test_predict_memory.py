@@ -0,0 +1,145 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+
+from starlette.formparsers import MultiPartParser
+
+from app import app, get_optional_username, get_current_username, get_db, UploadParser
+from storage import InMemoryStorage
+from tests.helpers import temp_upload_dirs
+
+
+def jpeg_bytes(height=20, width=30):
+    ok, buf = cv2.imencode(".jpg", np.full((height, width, 3), 127, dtype=np.uint8))
+    assert ok
+    return buf.tobytes()
+
+
+class TestPredictInMemoryDecode(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+
+        def override_get_db():
+            yield MagicMock()
+
+        app.dependency_overrides[get_optional_username] = lambda: "memuser"
+        app.dependency_overrides[get_current_username] = lambda: "memuser"
+        app.dependency_overrides[get_db] = override_get_db
+        cls.dirs = cls.enterClassContext(temp_upload_dirs())
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+
+    def _mock_model(self, mock_model):
+        fake_result = MagicMock()
+        fake_result.boxes = []
+        fake_result.plot.return_value = np.zeros((10, 10, 3), dtype=np.uint8)
+        mock_model.return_value = [fake_result]
+        mock_model.names = {0: "person"}
+
+    @patch("app.save_prediction_with_detections")
+    @patch("app.model")
+    @patch("app.PREDICT_DECODE", "memory")
+    def test_upload_is_decoded_in_memory_and_persisted_after_response(self, mock_model, mock_save_prediction):
+        self._mock_model(mock_model)
+
+        resp = self.client.post("/predict", files={"file": ("photo.jpg", jpeg_bytes(), "image/jpeg")})
+        self.assertEqual(resp.status_code, 200)
+
+        # the model received the decoded array, not a path on disk
+        sources = mock_model.call_args[0][0]
+        self.assertIsInstance(sources[0], np.ndarray)
+        self.assertEqual(sources[0].shape, (20, 30, 3))
+
+        # the original was written by the background task
+        original_path = mock_save_prediction.call_args[0][2]
+        self.assertTrue(os.path.exists(original_path))
+
+    @patch("app.save_prediction_with_detections")
+    @patch("app.model")
+    def test_uploads_are_parsed_with_the_app_spool_size(self, mock_model, _):
+        self._mock_model(mock_model)
+        with patch("app.UploadParser", side_effect=UploadParser) as mock_parser:
+            resp = self.client.post("/predict", files={"file": ("photo.jpg", jpeg_bytes(), "image/jpeg")})
+        self.assertEqual(resp.status_code, 200)
+        mock_parser.assert_called_once()
+        # Starlette's own parser keeps its default for everything else in the process
+        self.assertEqual(MultiPartParser.spool_max_size, 1024 * 1024)
+
+    def test_malformed_multipart_body_is_400(self):
+        resp = self.client.post("/predict", content=b"garbage",
+                                headers={"Content-Type": "multipart/form-data"})
+        self.assertEqual(resp.status_code, 400)
+
+    @patch("app.model")
+    @patch("app.PREDICT_DECODE", "memory")
+    def test_undecodable_upload_is_rejected(self, mock_model):
+        resp = self.client.post("/predict", files={"file": ("x.jpg", b"not an image", "image/jpeg")})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["detail"], "Could not decode image")
+        mock_model.assert_not_called()
+
+    @patch("app.save_prediction_with_detections")
+    @patch("app.ORIGINAL_PERSIST", "none")
+    @patch("app.PREDICT_DECODE", "memory")
+    @patch("app.model")
+    def test_s3_original_is_not_written_locally(self, mock_model, mock_save_prediction):
+        self._mock_model(mock_model)
+        storage = InMemoryStorage("test-bucket")
+        storage.put("in/cat.jpg", jpeg_bytes())
+
+        with patch("app.object_storage", storage):
+            resp = self.client.post("/predict?img=in/cat.jpg&chat_id=c9")
+        self.assertEqual(resp.status_code, 200)
+
+        # read into memory, then copied inside the bucket
+        operations = storage.metrics()["operations"]
+        self.assertNotIn("download", operations)
+        self.assertEqual(operations["copy"]["count"], 1)
+        uid = resp.json()["prediction_uid"]
+        self.assertEqual(mock_save_prediction.call_args[0][2], f"c9/original/{uid}.jpg")
+        self.assertFalse(os.path.exists(os.path.join(self.dirs["UPLOAD_DIR"], f"{uid}.jpg")))
+
+    @patch("app.save_prediction_with_detections")
+    @patch("app.PREDICT_STORAGE", "s3")
+    @patch("app.model")
+    def test_zero_disk_mode_uploads_both_images_from_memory(self, mock_model, mock_save_prediction):
+        self._mock_model(mock_model)
+        mock_model.return_value[0].orig_shape = (20, 30)
+        before = {d: set(os.listdir(d)) for d in (self.dirs["UPLOAD_DIR"], self.dirs["PREDICTED_DIR"])}
+        storage = InMemoryStorage("test-bucket")
+
+        with patch("app.object_storage", storage):
+            resp = self.client.post("/predict?chat_id=c7&eager_render=true",
+                                    files={"file": ("photo.jpg", jpeg_bytes(), "image/jpeg")})
+        self.assertEqual(resp.status_code, 200)
+        uid = resp.json()["prediction_uid"]
+
+        self.assertEqual({d: set(os.listdir(d)) for d in before}, before)
+        self.assertNotIn("put_file", storage.metrics()["operations"])
+        uploaded = storage.objects
+        self.assertEqual(set(uploaded), {f"c7/original/{uid}.jpg", f"c7/predicted/{uid}.jpg"})
+        self.assertTrue(uploaded[f"c7/predicted/{uid}.jpg"].startswith(b"\xff\xd8"))  # JPEG
+        # the session points at the S3 keys
+        self.assertEqual(mock_save_prediction.call_args[0][2:4], (f"c7/original/{uid}.jpg", f"c7/predicted/{uid}.jpg"))
+        self.assertEqual(resp.json()["s3"]["predicted_key"], f"c7/predicted/{uid}.jpg")
+
+    @patch("app.get_predicted_image_path", return_value="c7/predicted/u1.jpg")
+    def test_s3_only_prediction_image_is_served_from_s3(self, mock_path):
+        storage = InMemoryStorage("test-bucket")
+        storage.put("c7/predicted/u1.jpg", b"annotated")
+
+        with patch("app.object_storage", storage):
+            resp = self.client.get("/prediction/u1/image", headers={"Accept": "image/jpeg"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, b"annotated")
+        self.assertEqual(storage.metrics()["operations"]["get"]["count"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import cv2
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import app, get_optional_username, get_current_username, get_db, get_async_db
+from models import Base
+from video import IouTracker, iter_frames
+from tests.helpers import make_result
+
+
+def write_video(path, frames=12, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), i * 10, dtype=np.uint8))
+    writer.release()
+
+
+def video_bytes(frames=12):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "clip.avi")
+        write_video(path, frames)
+        with open(path, "rb") as f:
+            return f.read()
+
+class TestIouTracker(unittest.TestCase):
+    def test_stable_object_reported_once(self):
+        tracker = IouTracker()
+        self.assertEqual(len(tracker.update(0, [("car", 0.9, [0, 0, 10, 10])])), 1)
+        self.assertEqual(tracker.update(5, [("car", 0.95, [1, 0, 11, 10])]), [])
+        tracks = tracker.tracks()
+        self.assertEqual(len(tracks), 1)
+        self.assertEqual(tracks[0]["first_frame"], 0)
+        self.assertEqual(tracks[0]["last_frame"], 5)
+        self.assertEqual(tracks[0]["score"], 0.95)
+
+    def test_new_object_and_label_change_start_tracks(self):
+        tracker = IouTracker()
+        tracker.update(0, [("car", 0.9, [0, 0, 10, 10])])
+        new = tracker.update(1, [("car", 0.9, [50, 50, 60, 60]), ("person", 0.9, [0, 0, 10, 10])])
+        self.assertEqual(sorted(t["track_id"] for t in new), [2, 3])
+
+    def test_lost_track_is_closed_and_restarted(self):
+        tracker = IouTracker(max_missed=1)
+        tracker.update(0, [("car", 0.9, [0, 0, 10, 10])])
+        tracker.update(1, [])
+        tracker.update(2, [])
+        self.assertEqual(len(tracker.update(3, [("car", 0.9, [0, 0, 10, 10])])), 1)
+        self.assertEqual(len(tracker.tracks()), 2)
+
+    def test_iter_frames_honours_stride(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "clip.avi")
+            write_video(path, frames=10)
+            self.assertEqual([i for i, _, _ in iter_frames(path, stride=3)], [0, 3, 6, 9])
+
+
+class TestPredictVideoEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+        # file database shared by the sync (writes) and async (reads) sessions
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "video.db")
+        cls.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=cls.engine)
+        cls.SessionTest = sessionmaker(bind=cls.engine, autoflush=False)
+        AsyncSessionTest = async_sessionmaker(bind=create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool))
+
+        def override_get_db():
+            db = cls.SessionTest()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        async def override_get_async_db():
+            async with AsyncSessionTest() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_optional_username] = lambda: "videouser"
+        app.dependency_overrides[get_current_username] = lambda: "videouser"
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+        cls.engine.dispose()
+        cls.tmp.cleanup()
+
+    def _lines(self, resp):
+        return [json.loads(line) for line in resp.text.splitlines() if line]
+
+    @patch("app.model")
+    def test_tracked_object_reported_once_and_stored_per_video(self, mock_model):
+        mock_model.side_effect = lambda sources, **kwargs: [make_result() for _ in sources]
+        mock_model.names = {0: "person"}
+
+        with patch("app.SessionLocal", self.SessionTest):
+            resp = self.client.post("/predict/video?stride=2&batch_size=3",
+                                    files={"file": ("clip.avi", video_bytes(12), "video/x-msvideo")})
+
+        self.assertEqual(resp.status_code, 200)
+        lines = self._lines(resp)
+        frame_lines, summary = lines[:-1], lines[-1]
+        self.assertEqual(len(frame_lines), 1)
+        self.assertEqual(frame_lines[0]["frame"], 0)
+        self.assertEqual(frame_lines[0]["detections"][0]["label"], "person")
+        self.assertEqual(summary["frames_processed"], 6)
+        self.assertEqual(summary["objects"], 1)
+
+        stored = self.client.get(f"/video/{summary['video_uid']}").json()
+        self.assertEqual(stored["stride"], 2)
+        self.assertEqual(len(stored["objects"]), 1)
+        self.assertEqual(stored["objects"][0]["first_frame"], 0)
+        self.assertEqual(stored["objects"][0]["last_frame"], 10)
+        box = stored["objects"][0]["box"]
+        self.assertEqual(len(box), 4)
+        self.assertTrue(all(isinstance(v, float) for v in box))
+        # the staged upload is removed once processed
+        self.assertFalse(os.path.exists(f"uploads/videos/{summary['video_uid']}.avi"))
+
+    @patch("app.model")
+    def test_without_tracking_every_sampled_frame_is_reported(self, mock_model):
+        mock_model.side_effect = lambda sources, **kwargs: [make_result() for _ in sources]
+        mock_model.names = {0: "person"}
+
+        with patch("app.SessionLocal", self.SessionTest):
+            resp = self.client.post("/predict/video?stride=4&track=false",
+                                    files={"file": ("clip.avi", video_bytes(12), "video/x-msvideo")})
+
+        lines = self._lines(resp)
+        self.assertEqual([line["frame"] for line in lines[:-1]], [0, 4, 8])
+        self.assertEqual(lines[-1]["objects"], 3)
+
+    def test_requires_exactly_one_source(self):
+        resp = self.client.post("/predict/video")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_unreadable_video_is_400(self):
+        resp = self.client.post("/predict/video", files={"file": ("x.mp4", b"not a video", "video/mp4")})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["detail"], "Could not read video")
+
+    def test_unknown_video_is_404(self):
+        resp = self.client.get("/video/does-not-exist")
+        self.assertEqual(resp.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import app, get_optional_username, get_current_username, get_db
+from models import Base
+from prediction_cache import LRUCache, PredictionCache
+from queries import delete_prediction_and_detections
+from tests.helpers import make_result, temp_upload_dirs
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(len(cache), 2)
+
+
+class TestPredictionCacheEndpoint(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        cls.SessionTest = sessionmaker(bind=engine, autoflush=False)
+
+        def override_get_db():
+            db = cls.SessionTest()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_optional_username] = lambda: "cacheuser"
+        app.dependency_overrides[get_current_username] = lambda: "cacheuser"
+        cls.dirs = cls.enterClassContext(temp_upload_dirs())
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+
+    def _post(self, content=b"same meme bytes"):
+        return self.client.post("/predict", files={"file": ("meme.jpg", content, "image/jpeg")})
+
+    @patch("app.model")
+    def test_duplicate_image_skips_inference(self, mock_model):
+        mock_model.return_value = [make_result()]
+        mock_model.names = {0: "person"}
+
+        with patch("app.prediction_cache", PredictionCache(10)):
+            first = self._post(b"duplicate-1").json()
+            second = self._post(b"duplicate-1").json()
+
+        self.assertEqual(first["cache"], "miss")
+        self.assertEqual(second["cache"], "hit")
+        self.assertEqual(second["prediction_uid"], first["prediction_uid"])
+        self.assertEqual(second["labels"], ["person"])
+        mock_model.assert_called_once()
+
+    @patch("app.model")
+    def test_persistent_tier_survives_restart(self, mock_model):
+        mock_model.return_value = [make_result()]
+        mock_model.names = {0: "person"}
+
+        with patch("app.prediction_cache", PredictionCache(10)):
+            first = self._post(b"duplicate-2").json()
+        # a fresh process has an empty memory tier
+        with patch("app.prediction_cache", PredictionCache(10)):
+            second = self._post(b"duplicate-2").json()
+
+        self.assertEqual(second["cache"], "hit")
+        self.assertEqual(second["prediction_uid"], first["prediction_uid"])
+        self.assertEqual(second["detection_count"], 1)
+        mock_model.assert_called_once()
+
+    @patch("app.model")
+    def test_delete_invalidates_cache(self, mock_model):
+        mock_model.return_value = [make_result()]
+        mock_model.names = {0: "person"}
+
+        with patch("app.prediction_cache", PredictionCache(10)):
+            first = self._post(b"duplicate-3").json()
+            resp = self.client.delete(f"/prediction/{first['prediction_uid']}")
+            self.assertEqual(resp.status_code, 200)
+            second = self._post(b"duplicate-3").json()
+
+        self.assertEqual(second["cache"], "miss")
+        self.assertNotEqual(second["prediction_uid"], first["prediction_uid"])
+
+    @patch("app.model")
+    def test_memory_hit_deleted_by_another_worker_is_a_miss(self, mock_model):
+        mock_model.return_value = [make_result()]
+        mock_model.names = {0: "person"}
+
+        with patch("app.prediction_cache", PredictionCache(10)) as cache:
+            first = self._post(b"duplicate-5").json()
+            # deleted through another process: this one's memory tier was not invalidated
+            with self.SessionTest() as db:
+                delete_prediction_and_detections(db, first["prediction_uid"], "cacheuser")
+            second = self._post(b"duplicate-5").json()
+
+        self.assertEqual(second["cache"], "miss")
+        self.assertNotEqual(second["prediction_uid"], first["prediction_uid"])
+        self.assertEqual(len(cache.memory), 1)
+
+    @patch("app.model")
+    def test_cache_disabled_by_default(self, mock_model):
+        mock_model.return_value = [make_result()]
+        mock_model.names = {0: "person"}
+
+        self.assertEqual(self._post(b"duplicate-4").json()["cache"], "disabled")
+        self.assertEqual(self._post(b"duplicate-4").json()["cache"], "disabled")
+        self.assertEqual(mock_model.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
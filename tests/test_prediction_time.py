@@ -21,10 +21,9 @@ class TestProcessingTimeMocked(unittest.TestCase):
     def tearDownClass(cls):
         app.dependency_overrides = {}
 
-    @patch("app.save_detection")
-    @patch("app.save_prediction")
+    @patch("app.save_prediction_with_detections")
     @patch("app.model")
-    def test_predict_includes_processing_time(self, mock_model, mock_save_prediction, mock_save_detection):
+    def test_predict_includes_processing_time(self, mock_model, mock_save_prediction):
         # Mock YOLO results
         fake_box = MagicMock()
         fake_cls = MagicMock()
@@ -61,4 +60,5 @@ class TestProcessingTimeMocked(unittest.TestCase):
         # Ensure mocks were called
         mock_model.assert_called_once()
         mock_save_prediction.assert_called_once()
-        mock_save_detection.assert_called()
+        # every detection goes into the same single write
+        self.assertEqual(len(mock_save_prediction.call_args[0][5]), 1)
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import app, get_current_username, get_db
+from models import Base, User
+from queries import save_prediction_with_detections, get_image_s3_keys, get_predicted_image_keys
+from storage import S3Storage, InMemoryStorage, PresignedUrlCache
+
+UID = "url-uid"
+PATH = f"uploads/predicted/{UID}.jpg"
+KEY = f"c1/predicted/{UID}.jpg"
+
+
+class TestPresignedUrlCache(unittest.TestCase):
+    def test_urls_are_reused_until_shortly_before_they_expire(self):
+        storage = MagicMock()
+        storage.url.side_effect = lambda key, expires_s: f"https://s3/{key}?n={storage.url.call_count}"
+        cache = PresignedUrlCache(ttl_s=300, refresh_s=60)
+
+        with patch("storage.time.time", return_value=1000.0):
+            self.assertEqual(cache.sign(storage, "k"), ("https://s3/k?n=1", 1300.0))
+        with patch("storage.time.time", return_value=1239.0):
+            self.assertEqual(cache.sign(storage, "k")[0], "https://s3/k?n=1")
+        with patch("storage.time.time", return_value=1241.0):
+            # less than refresh_s left: signed again
+            self.assertEqual(cache.sign(storage, "k"), ("https://s3/k?n=2", 1541.0))
+        storage.url.assert_called_with("k", 300)
+
+    def test_backends_without_urls(self):
+        self.assertIsNone(PresignedUrlCache().sign(InMemoryStorage(), "k"))
+
+
+class TestImageKeyQueries(unittest.TestCase):
+    def test_keys_are_only_returned_to_the_owner(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            db.add(User(username="urluser", password="-"))
+            db.commit()
+            save_prediction_with_detections(db, UID, f"uploads/original/{UID}.jpg", PATH, "urluser", [],
+                                            s3_keys=(f"c1/original/{UID}.jpg", KEY))
+
+            self.assertEqual(get_image_s3_keys(db, PATH, "urluser"), (f"c1/original/{UID}.jpg", KEY))
+            self.assertEqual(get_predicted_image_keys(db, UID, "urluser"), (PATH, KEY))
+            self.assertIsNone(get_image_s3_keys(db, PATH, "someone-else"))
+            self.assertIsNone(get_predicted_image_keys(db, UID, "someone-else"))
+
+
+class TestPresignedImageEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app, follow_redirects=False)
+
+        def override_get_db():
+            yield MagicMock()
+
+        app.dependency_overrides[get_current_username] = lambda: "urluser"
+        app.dependency_overrides[get_db] = override_get_db
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+
+    def setUp(self):
+        patches = [
+            patch("app.object_storage", S3Storage("bucket")),
+            patch("app.presigned_urls", PresignedUrlCache(ttl_s=300, refresh_s=60)),
+            patch("storage.s3_utils.presigned_url",
+                  side_effect=lambda bucket, key, expires_s: f"https://{bucket}.s3/{key}?X-Amz-Expires={expires_s}"),
+        ]
+        self.mock_presign = [p.start() for p in patches][2]
+        for p in patches:
+            self.addCleanup(p.stop)
+
+    @patch("storage.s3_utils.s3_key_exists", return_value=True)
+    @patch("app.get_predicted_image_keys", return_value=(PATH, KEY))
+    @patch("app.IMAGE_URL_MODE", "redirect")
+    def test_prediction_image_redirects_to_a_cached_url(self, mock_keys, mock_exists):
+        for _ in range(2):
+            resp = self.client.get(f"/prediction/{UID}/image", headers={"Accept": "image/jpeg"})
+            self.assertEqual(resp.status_code, 302)
+            self.assertEqual(resp.headers["location"], f"https://bucket.s3/{KEY}?X-Amz-Expires=300")
+            self.assertTrue(resp.headers["cache-control"].startswith("private, max-age="))
+        self.mock_presign.assert_called_once()
+        mock_exists.assert_called_once()
+        self.assertEqual(mock_keys.call_args.args[1:], (UID, "urluser"))
+
+    @patch("storage.s3_utils.s3_key_exists", return_value=True)
+    @patch("app.get_image_s3_keys", return_value=("c1/original/x.jpg", KEY))
+    @patch("app.IMAGE_URL_MODE", "json")
+    def test_image_url_as_json_without_a_local_file(self, mock_keys, mock_exists):
+        resp = self.client.get("/image/original/x.jpg")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["url"], "https://bucket.s3/c1/original/x.jpg?X-Amz-Expires=300")
+        self.assertGreater(resp.json()["expires_in"], 290)
+        self.assertEqual(mock_keys.call_args.args[1:], ("uploads/original/x.jpg", "urluser"))
+
+    @patch("storage.s3_utils.upload_bytes")
+    @patch("storage.s3_utils.s3_key_exists", return_value=False)
+    @patch("app.render_prediction_image", return_value=b"annotated")
+    @patch("app.get_predicted_image_keys", return_value=(PATH, KEY))
+    @patch("app.IMAGE_URL_MODE", "redirect")
+    def test_unrendered_image_is_uploaded_before_redirecting(self, mock_keys, mock_render, mock_exists, mock_upload):
+        resp = self.client.get(f"/prediction/{UID}/image", headers={"Accept": "image/jpeg"})
+        self.assertEqual(resp.status_code, 302)
+        mock_upload.assert_called_once_with("bucket", KEY, b"annotated", None)
+
+    @patch("app.get_predicted_image_keys", return_value=None)
+    @patch("app.IMAGE_URL_MODE", "redirect")
+    def test_not_owned_prediction_is_404(self, mock_keys):
+        resp = self.client.get(f"/prediction/{UID}/image", headers={"Accept": "image/jpeg"})
+        self.assertEqual(resp.status_code, 404)
+        self.mock_presign.assert_not_called()
+
+    @patch("app.get_image_s3_keys", return_value=None)
+    @patch("app.IMAGE_URL_MODE", "redirect")
+    def test_not_owned_image_falls_back_to_the_usual_checks(self, mock_keys):
+        resp = self.client.get("/image/original/not-mine.jpg")
+        self.assertEqual(resp.status_code, 404)
+        self.mock_presign.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import app
+from engines import LazyEngine
+
+
+class TestReadiness(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        app_module.startup_state.update(done=False, error=None)
+        app_module.startup_timings.clear()
+
+    def tearDown(self):
+        app_module.startup_state.update(done=False, error=None)
+        app_module.startup_timings.clear()
+
+    def test_health_does_not_wait_for_the_model(self):
+        model = MagicMock(loaded=False, warmed_up=False)
+        with patch("app.model", model):
+            response = self.client.get("/health")
+        self.assertEqual(response.status_code, 200)
+        model.load.assert_not_called()
+
+    @patch("app.check_db", return_value=True)
+    def test_not_ready_before_model_is_loaded(self, _):
+        with patch("app.model", MagicMock(loaded=False, warmed_up=False)):
+            response = self.client.get("/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["status"], "starting")
+        self.assertFalse(response.json()["checks"]["model"])
+
+    @patch("app.check_db", return_value=True)
+    @patch("app.init_db")
+    def test_ready_after_startup(self, mock_init_db, _):
+        model = MagicMock(loaded=True, warmed_up=True, timings={"model_load_s": 0.5, "warmup_s": 0.1})
+        with patch("app.model", model):
+            app_module.run_startup()
+            response = self.client.get("/ready")
+
+        mock_init_db.assert_called_once()
+        model.load.assert_called_once()
+        self.assertEqual(model.warmup.call_count, 1 if app_module.MODEL_WARMUP else 0)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["status"], "ready")
+        self.assertEqual(body["checks"], {"model": True, "database": True})
+        for key in ("db_init_s", "model_load_s", "total_s"):
+            self.assertIn(key, body["startup_timings"])
+
+    @patch("app.MODEL_WARMUP", True)
+    @patch("app.check_db", return_value=True)
+    @patch("app.init_db")
+    def test_warmup_holds_the_scheduler_inference_lock(self, *_):
+        model = MagicMock(loaded=True, warmed_up=True, timings={})
+        model.warmup.side_effect = lambda: self.assertTrue(app_module.scheduler.inference_lock.locked())
+        with patch("app.model", model):
+            app_module.run_startup()
+        model.warmup.assert_called_once()
+        self.assertIsNone(app_module.startup_state["error"])
+        self.assertFalse(app_module.scheduler.inference_lock.locked())
+
+    @patch("app.check_db", return_value=False)
+    def test_not_ready_when_database_is_down(self, _):
+        with patch("app.model", MagicMock(loaded=True, warmed_up=True)):
+            response = self.client.get("/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["checks"]["database"])
+
+    @patch("app.check_db", return_value=True)
+    @patch("app.init_db")
+    def test_startup_error_is_reported(self, *_):
+        model = MagicMock(loaded=False, warmed_up=False)
+        model.load.side_effect = FileNotFoundError("yolov8n.onnx not found")
+        with patch("app.model", model):
+            app_module.run_startup()
+            response = self.client.get("/ready")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("yolov8n.onnx", response.json()["error"])
+
+
+class TestLazyEngine(unittest.TestCase):
+    @patch("engines.load_engine")
+    def test_model_is_built_on_first_use_only(self, mock_load_engine):
+        engine = LazyEngine("torch", "yolov8n.pt")
+        self.assertFalse(engine.loaded)
+        mock_load_engine.assert_not_called()
+
+        mock_load_engine.return_value.return_value = ["result"]
+        self.assertEqual(engine(["a.jpg"]), ["result"])
+        engine(["b.jpg"])
+        mock_load_engine.assert_called_once_with("torch", "yolov8n.pt")
+        self.assertTrue(engine.loaded)
+        self.assertIn("model_load_s", engine.timings)
+
+    @patch("engines.load_engine")
+    def test_warmup_runs_one_synthetic_inference(self, mock_load_engine):
+        engine = LazyEngine("torch", "yolov8n.pt")
+        engine.warmup(imgsz=64)
+        (frames,), kwargs = mock_load_engine.return_value.call_args
+        self.assertEqual(frames[0].shape, (64, 64, 3))
+        self.assertTrue(engine.warmed_up)
+        self.assertIn("warmup_s", engine.timings)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from db import enable_sqlite_foreign_keys
+from models import Base, PredictionSession, DetectionObject, PredictionCacheEntry
+from queries import (
+    create_user, save_prediction_with_detections, save_cache_entry,
+    get_prediction_with_detections, delete_prediction_and_detections,
+)
+
+
+class TestPredictionRelationships(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        event.listen(self.engine, "connect", enable_sqlite_foreign_keys)
+        Base.metadata.create_all(bind=self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        create_user(self.db, "alice", "hash")
+        save_prediction_with_detections(self.db, "p1", "o.jpg", "p.jpg", "alice", [
+            ("person", 0.9, [0, 0, 10, 10]),
+            ("dog", 0.5, [5, 5, 20, 20]),
+        ])
+        save_cache_entry(self.db, "hash", "p1", None)
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_prediction_and_detections_in_one_query(self):
+        session = get_prediction_with_detections(self.db, "p1", "alice")
+        self.assertEqual([obj.label for obj in session.detections], ["person", "dog"])
+        self.assertEqual(len(self.statements), 1)
+        self.assertIsNone(get_prediction_with_detections(self.db, "p1", "bob"))
+
+    def test_delete_cascades_to_children(self):
+        self.assertEqual(delete_prediction_and_detections(self.db, "p1", "alice"), ("o.jpg", "p.jpg", None, None))
+        deletes = [s for s in self.statements if s.lstrip().upper().startswith("DELETE")]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(self.db.query(PredictionSession).count(), 0)
+        self.assertEqual(self.db.query(DetectionObject).count(), 0)
+        self.assertEqual(self.db.query(PredictionCacheEntry).count(), 0)
+
+    def test_delete_of_someone_elses_prediction(self):
+        self.assertIsNone(delete_prediction_and_detections(self.db, "p1", "bob"))
+        self.assertEqual(self.db.query(DetectionObject).count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, UTC
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import app
+from db import enable_sqlite_foreign_keys
+from models import Base, User, PredictionSession, DetectionObject, PredictionCacheEntry
+from queries import save_prediction_with_detections, save_cache_entry
+from retention import RetentionJob, RetentionPolicy, parse_user_days
+from rollups import rebuild_rollups
+from storage import InMemoryStorage
+from tests.test_rollups import snapshot
+
+
+class TestRetentionPolicy(unittest.TestCase):
+    def test_parse_user_days(self):
+        self.assertEqual(parse_user_days(" alice=7, bob=0 ,"), {"alice": 7.0, "bob": 0.0})
+        self.assertEqual(parse_user_days(""), {})
+        with self.assertRaises(ValueError):
+            parse_user_days("alice")
+
+    def test_cutoffs(self):
+        now = datetime(2025, 1, 31)
+        cutoff, user_cutoffs = RetentionPolicy(30, {"alice": 7, "bob": 0}).cutoffs(now)
+        self.assertEqual(cutoff, datetime(2025, 1, 1))
+        self.assertEqual(user_cutoffs, {"alice": datetime(2025, 1, 24), "bob": None})
+        self.assertFalse(RetentionPolicy(0, {"bob": 0}).enabled)
+
+
+class TestRetentionJob(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        event.listen(engine, "connect", enable_sqlite_foreign_keys)
+        Base.metadata.create_all(bind=engine)
+        self.Session = sessionmaker(bind=engine, autoflush=False)
+        self.db = self.Session()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.objects = InMemoryStorage(latency_ms=0)
+
+        self.db.add_all([User(username="alice", password="-"), User(username="bob", password="-")])
+        self.db.commit()
+        old = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=40)
+        for uid, username, age in [("a-old", "alice", old), ("a-old2", "alice", old), ("a-new", "alice", None),
+                                   ("b-old", "bob", old), ("anon-old", None, old)]:
+            paths = [os.path.join(self.tmp.name, f"{uid}-{kind}.jpg") for kind in ("o", "p")]
+            for path in paths:
+                open(path, "wb").close()
+            s3_keys = (f"chat/original/{uid}.jpg", f"chat/predicted/{uid}.jpg")
+            for key in s3_keys:
+                self.objects.put(key, b"img")
+            save_prediction_with_detections(self.db, uid, *paths, username, [("person", 0.9, [0, 0, 1, 1])],
+                                            s3_keys=s3_keys)
+            save_cache_entry(self.db, f"hash-{uid}", uid, None)
+            if age:
+                self.db.execute(update(PredictionSession).where(PredictionSession.uid == uid).values(timestamp=age))
+        self.db.commit()
+        rebuild_rollups(self.db)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def remaining(self):
+        self.db.expire_all()
+        return sorted(uid for (uid,) in self.db.query(PredictionSession.uid))
+
+    def test_expired_rows_files_and_objects_are_purged_in_batches(self):
+        deleted = []
+        job = RetentionJob(self.Session, RetentionPolicy(30, {"bob": 0}), batch_size=2, batch_pause_ms=0,
+                           objects=self.objects, on_deleted=lambda rows: deleted.extend(row.uid for row in rows))
+        stats = job.run_once()
+
+        self.assertEqual(self.remaining(), ["a-new", "b-old"])
+        self.assertEqual(sorted(deleted), ["a-old", "a-old2", "anon-old"])
+        self.assertEqual(self.db.query(DetectionObject).count(), 2)
+        self.assertEqual(self.db.query(PredictionCacheEntry).count(), 2)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["a-new-o.jpg", "a-new-p.jpg", "b-old-o.jpg", "b-old-p.jpg"])
+
+        self.assertEqual(stats["batches"], 2)
+        self.assertEqual(stats["predictions_deleted"], 3)
+        self.assertEqual(stats["files_deleted"], 6)
+        self.assertEqual(stats["s3_objects_deleted"], 6)
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(sorted(self.objects.objects), [f"chat/{kind}/{uid}.jpg" for kind in ("original", "predicted")
+                                                        for uid in ("a-new", "b-old")])
+        self.assertEqual(self.objects.metrics()["operations"]["delete_many"]["count"], 2)
+
+        metrics = job.metrics()
+        self.assertFalse(metrics["running"])
+        self.assertEqual(metrics["totals"]["predictions_deleted"], 3)
+
+        # the rollups lose exactly what was purged (emptied hours stay as zero rows)
+        stats, labels = snapshot(self.db)
+        stats = {key: counts for key, counts in stats.items() if any(counts)}
+        rebuild_rollups(self.db)
+        self.assertEqual(snapshot(self.db), (stats, labels))
+
+    def test_user_override_and_missing_files(self):
+        os.remove(os.path.join(self.tmp.name, "a-old-o.jpg"))
+        stats = RetentionJob(self.Session, RetentionPolicy(0, {"alice": 30}), objects=None).run_once()
+
+        self.assertEqual(self.remaining(), ["a-new", "anon-old", "b-old"])
+        self.assertEqual(stats["files_missing"], 1)
+        self.assertEqual(stats["files_deleted"], 3)
+        self.assertEqual(stats["s3_objects_deleted"], 0)
+        self.assertEqual(len(self.objects.objects), 10)
+
+    def test_zero_disk_rows_are_only_deleted_from_object_storage(self):
+        # PREDICT_STORAGE=s3: the image columns hold the object keys themselves
+        self.db.execute(update(PredictionSession).values(original_image=PredictionSession.s3_original_key,
+                                                         predicted_image=PredictionSession.s3_predicted_key))
+        self.db.commit()
+        stats = RetentionJob(self.Session, RetentionPolicy(30, {"bob": 0}), objects=self.objects).run_once()
+
+        self.assertEqual(self.remaining(), ["a-new", "b-old"])
+        self.assertEqual((stats["files_deleted"], stats["files_missing"]), (0, 0))
+        self.assertEqual(stats["s3_objects_deleted"], 6)
+        self.assertEqual(len(self.objects.objects), 4)
+        self.assertEqual(len(os.listdir(self.tmp.name)), 10)
+
+
+class TestRetentionEndpoint(unittest.TestCase):
+    def test_disabled_by_default(self):
+        self.assertEqual(TestClient(app).get("/retention").json(), {"enabled": False})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import Base, User, UserHourlyStats, UserHourlyLabelCount
+from queries import save_prediction_with_detections, delete_prediction_and_detections
+from rollups import rebuild_rollups
+
+
+def snapshot(db):
+    stats = {(r.username, r.hour): (r.prediction_count, r.detection_count, round(r.score_sum, 6))
+             for r in db.query(UserHourlyStats)}
+    labels = {(r.username, r.hour, r.label): r.count for r in db.query(UserHourlyLabelCount) if r.count}
+    return stats, labels
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.db = sessionmaker(bind=engine, autoflush=False)()
+        self.db.add(User(username="alice", password="-"))
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_saves_and_deletes_keep_rollups_equal_to_a_rebuild(self):
+        save_prediction_with_detections(self.db, "a", "o", "p", "alice", [
+            ("person", 0.9, [0, 0, 1, 1]), ("person", 0.5, [0, 0, 1, 1]), ("dog", 0.4, [0, 0, 1, 1]),
+        ])
+        save_prediction_with_detections(self.db, "b", "o", "p", "alice", [("cat", 0.8, [0, 0, 1, 1])])
+        save_prediction_with_detections(self.db, "c", "o", "p", None, [("cat", 0.8, [0, 0, 1, 1])])
+        delete_prediction_and_detections(self.db, "a", "alice")
+
+        stats, labels = snapshot(self.db)
+        (counts,) = stats.values()
+        self.assertEqual(counts, (1, 1, 0.8))
+        self.assertEqual(list(labels.values()), [1])
+
+        rebuild_rollups(self.db)
+        self.assertEqual(snapshot(self.db), (stats, labels))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import time
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import app, get_optional_username, get_db
+from db import enable_sqlite_foreign_keys
+from models import Base, S3OutboxEntry, User
+from queries import add_outbox_entries, save_prediction_with_detections
+from queries import delete_prediction_and_detections, delete_expired_predictions
+from s3_outbox import S3Outbox
+from storage import InMemoryStorage
+from tests.helpers import temp_upload_dirs
+
+
+def transfer(key, **extra):
+    return {"bucket": "bucket", "key": key, "local_path": f"/tmp/{key}", **extra}
+
+
+class TestS3Outbox(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        self.Session = sessionmaker(bind=engine)
+        self.done = []
+        self.failures = {}
+
+    def perform(self, entry):
+        if self.failures.get(entry["key"], 0) > 0:
+            self.failures[entry["key"]] -= 1
+            raise ConnectionError("slow down")
+        self.done.append(entry["key"])
+
+    def rows(self):
+        with self.Session() as db:
+            return db.query(S3OutboxEntry).order_by(S3OutboxEntry.id).all()
+
+    def test_run_is_parallel_and_hands_failures_to_the_outbox(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def perform(entry):
+            # both transfers must be in flight at the same time to pass the barrier
+            barrier.wait()
+            if entry["key"] == "bad":
+                raise ConnectionError("boom")
+
+        outbox = S3Outbox(self.Session, perform, poll_s=3600)
+        with patch.object(outbox, "_ensure_started"), self.Session() as db:
+            self.assertEqual(outbox.run(db, [transfer("good"), transfer("bad", payload=b"img")]), 1)
+        (row,) = self.rows()
+        self.assertEqual((row.key, row.payload, row.attempts), ("bad", b"img", 0))
+
+    def test_failed_transfers_back_off_then_succeed(self):
+        with self.Session() as db:
+            add_outbox_entries(db, [transfer("a"), transfer("b")])
+        self.failures["b"] = 1
+        outbox = S3Outbox(self.Session, self.perform, retry_s=60)
+
+        self.assertEqual(outbox.drain_once(), 2)
+        (row,) = self.rows()
+        self.assertEqual((row.key, row.attempts), ("b", 1))
+        self.assertIn("ConnectionError", row.last_error)
+        # not due again until the backoff has passed
+        self.assertEqual(outbox.drain_once(), 0)
+
+        with self.Session() as db:
+            db.execute(update(S3OutboxEntry).values(next_attempt_at=datetime(2000, 1, 1)))
+            db.commit()
+        self.assertEqual(outbox.drain_once(), 1)
+        self.assertEqual(self.rows(), [])
+        self.assertEqual(self.done, ["a", "b"])
+        self.assertEqual(outbox.metrics()["uploaded"], 2)
+
+    def test_gives_up_after_max_attempts(self):
+        with self.Session() as db:
+            add_outbox_entries(db, [transfer("never")])
+        self.failures["never"] = 99
+        outbox = S3Outbox(self.Session, self.perform, max_attempts=2, retry_s=0)
+
+        outbox.drain_once()
+        outbox.drain_once()
+        self.assertEqual(outbox.drain_once(), 0)
+        metrics = outbox.metrics()
+        self.assertEqual((metrics["pending"], metrics["failed"], metrics["gave_up"]), (0, 1, 1))
+
+    def test_transfers_of_deleted_predictions_are_dropped(self):
+        # foreign keys are not enforced on this connection, as on SQLite without the pragma
+        with self.Session() as db:
+            save_prediction_with_detections(db, "kept", "o.jpg", "p.jpg", "alice", [])
+            add_outbox_entries(db, [transfer("kept", prediction_uid="kept"), transfer("gone", prediction_uid="gone"),
+                                    transfer("legacy")])
+        outbox = S3Outbox(self.Session, self.perform)
+
+        self.assertEqual(outbox.drain_once(), 2)
+        self.assertEqual(sorted(self.done), ["kept", "legacy"])
+        self.assertEqual(self.rows(), [])
+
+    def test_leftovers_are_drained_after_a_restart(self):
+        with self.Session() as db:
+            add_outbox_entries(db, [transfer(f"k{i}") for i in range(5)])
+        outbox = S3Outbox(self.Session, self.perform, batch_size=2, poll_s=3600)
+        outbox.start()
+        try:
+            deadline = time.time() + 5
+            while self.rows() and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            outbox.stop()
+        self.assertEqual(self.rows(), [])
+        self.assertEqual(sorted(self.done), [f"k{i}" for i in range(5)])
+
+
+class TestOutboxCancellation(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        event.listen(engine, "connect", enable_sqlite_foreign_keys)
+        Base.metadata.create_all(bind=engine)
+        self.Session = sessionmaker(bind=engine)
+        with self.Session() as db:
+            db.add(User(username="alice", password="x"))
+            db.commit()
+
+    def rows(self):
+        with self.Session() as db:
+            return db.query(S3OutboxEntry).order_by(S3OutboxEntry.id).all()
+
+    def test_deleting_a_prediction_cancels_its_transfers(self):
+        with self.Session() as db:
+            save_prediction_with_detections(db, "u1", "o.jpg", "p.jpg", "alice", [])
+            add_outbox_entries(db, [transfer("u1/original", prediction_uid="u1"),
+                                    transfer("u1/predicted", prediction_uid="u1"),
+                                    transfer("other")])
+            self.assertIsNotNone(delete_prediction_and_detections(db, "u1", "alice"))
+        self.assertEqual([row.key for row in self.rows()], ["other"])
+
+    def test_expired_predictions_cancel_their_transfers(self):
+        with self.Session() as db:
+            save_prediction_with_detections(db, "old", "o.jpg", "p.jpg", "alice", [])
+            add_outbox_entries(db, [transfer("old/original", prediction_uid="old")])
+            future = datetime.now() + timedelta(days=1)
+            self.assertEqual(len(delete_expired_predictions(db, future, {}, 10)), 1)
+        self.assertEqual(self.rows(), [])
+
+
+class TestBackgroundUploads(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(app)
+
+        def override_get_db():
+            yield MagicMock()
+
+        app.dependency_overrides[get_optional_username] = lambda: "outboxuser"
+        app.dependency_overrides[get_db] = override_get_db
+        cls.enterClassContext(temp_upload_dirs())
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides = {}
+
+    @patch("app.save_prediction_with_detections")
+    @patch("app.s3_outbox")
+    @patch("app.S3_UPLOAD_MODE", "background")
+    @patch("app.model")
+    def test_transfers_are_recorded_instead_of_run(self, mock_model, mock_outbox, mock_save_prediction):
+        fake_result = MagicMock()
+        fake_result.boxes = []
+        fake_result.orig_shape = (10, 10)
+        fake_result.plot.return_value = np.zeros((10, 10, 3), dtype=np.uint8)
+        mock_model.return_value = [fake_result]
+        storage = InMemoryStorage("test-bucket")
+        storage.put("in/cat.jpg", b"cat")
+
+        with patch("app.object_storage", storage):
+            resp = self.client.post("/predict?img=in/cat.jpg&chat_id=c1&eager_render=true")
+        self.assertEqual(resp.status_code, 200)
+        uid = resp.json()["prediction_uid"]
+        self.assertEqual(resp.json()["s3"]["predicted_key"], f"c1/predicted/{uid}.jpg")
+
+        # nothing was copied or uploaded yet
+        self.assertEqual(list(storage.objects), ["in/cat.jpg"])
+        transfers = mock_outbox.enqueue.call_args[0][1]
+        self.assertEqual([t["key"] for t in transfers], [f"c1/original/{uid}.jpg", f"c1/predicted/{uid}.jpg"])
+        self.assertEqual(transfers[0]["source_key"], "in/cat.jpg")
+        self.assertEqual({t["prediction_uid"] for t in transfers}, {uid})
+
+
+if __name__ == '__main__':
+    unittest.main()
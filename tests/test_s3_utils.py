@@ -0,0 +1,52 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+import s3_utils
+
+
+class TestS3Client(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("s3_utils._s3", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_is_created_once_across_threads(self):
+        def slow_client():
+            time.sleep(0.05)
+            return MagicMock()
+
+        with patch("s3_utils.make_s3_client", side_effect=slow_client) as mock_make:
+            clients = []
+            threads = [threading.Thread(target=lambda: clients.append(s3_utils.get_s3_client())) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        mock_make.assert_called_once()
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+    def test_config(self):
+        config = s3_utils.client_config(max_pool_connections=48)
+        self.assertEqual(config.max_pool_connections, 48)
+        self.assertEqual(config.retries["mode"], s3_utils.S3_RETRY_MODE)
+
+        transfer = s3_utils.transfer_config(threshold_mb=16, chunk_mb=4, concurrency=1)
+        self.assertEqual((transfer.multipart_threshold, transfer.multipart_chunksize), (16 * s3_utils.MB, 4 * s3_utils.MB))
+        self.assertFalse(transfer.use_threads)
+
+    def test_small_bodies_skip_the_transfer_manager(self):
+        client = MagicMock()
+        with patch("s3_utils._s3", client), \
+             patch("s3_utils.TRANSFER_CONFIG", s3_utils.transfer_config(threshold_mb=1)):
+            s3_utils.upload_bytes("bucket", "c1/predicted/u.jpg", b"small")
+            s3_utils.upload_bytes("bucket", "c1/original/u.png", b"x" * s3_utils.MB)
+        client.put_object.assert_called_once_with(Bucket="bucket", Key="c1/predicted/u.jpg", Body=b"small",
+                                                  ContentType="image/jpeg")
+        self.assertEqual(client.upload_fileobj.call_args.args[1:3], ("bucket", "c1/original/u.png"))
+        self.assertEqual(client.upload_fileobj.call_args.kwargs["ExtraArgs"], {"ContentType": "image/png"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,17 @@
+import os
+import asyncio
+import tempfile
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 
-from app import app, get_current_username, get_db
+from app import app, get_current_username, get_async_db
+from models import Base
+from queries import save_prediction_with_detections
 
 
 class TestStatsEndpointMocked(unittest.TestCase):
@@ -10,16 +19,27 @@ class TestStatsEndpointMocked(unittest.TestCase):
     def setUpClass(cls):
         cls.client = TestClient(app)
 
-        # Override auth and DB dependencies
-        def override_get_db():
-            yield MagicMock()
+        # file database: written through a sync session, read by the endpoint's aiosqlite session
+        cls.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.tmp.name, "stats.db")
+        engine = create_engine(f"sqlite:///{path}", poolclass=NullPool)
+        Base.metadata.create_all(bind=engine)
+        cls.Session = sessionmaker(bind=engine)
+        cls.async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        AsyncSessionTest = async_sessionmaker(bind=cls.async_engine)
+
+        async def override_get_async_db():
+            async with AsyncSessionTest() as db:
+                yield db
 
         app.dependency_overrides[get_current_username] = lambda: "testuser"
-        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
 
     @classmethod
     def tearDownClass(cls):
         app.dependency_overrides = {}
+        asyncio.run(cls.async_engine.dispose())
+        cls.tmp.cleanup()
 
     @patch("app.get_user_prediction_stats")
     def test_stats_endpoint(self, mock_stats):
@@ -70,3 +90,15 @@ class TestStatsEndpointMocked(unittest.TestCase):
         data = resp.json()
 
         assert data["average_confidence"] == 0.0
+
+    def test_stats_from_stored_predictions(self):
+        with self.Session() as db:
+            save_prediction_with_detections(db, "s1", "o1.jpg", "p1.jpg", "testuser",
+                                            [("cat", 0.8, [0, 0, 1, 1]), ("dog", 0.6, [0, 0, 1, 1])])
+            save_prediction_with_detections(db, "s2", "o2.jpg", "p2.jpg", "testuser", [("cat", 1.0, [0, 0, 1, 1])])
+            save_prediction_with_detections(db, "s3", "o3.jpg", "p3.jpg", "someoneelse", [("car", 0.5, [0, 0, 1, 1])])
+
+        data = self.client.get("/stats").json()
+        self.assertEqual(data["total_predictions"], 2)
+        self.assertAlmostEqual(data["average_confidence"], 0.8)
+        self.assertEqual(data["most_frequent_labels"], [{"label": "cat", "count": 2}, {"label": "dog", "count": 1}])
@@ -0,0 +1,129 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+
+from storage import LocalStorage, S3Storage, InMemoryStorage, object_storage_from_env
+
+
+class StorageContract:
+    """Behaviour every backend shares; subclasses set self.storage."""
+
+    def test_put_get_copy_delete(self):
+        storage = self.storage
+        storage.put("a/one.jpg", b"one")
+        storage.put_fileobj("a/two.jpg", io.BytesIO(b"two"))
+        self.assertEqual(storage.get("a/one.jpg"), b"one")
+        self.assertEqual(storage.get("a/two.jpg"), b"two")
+        self.assertIsNone(storage.get("a/missing.jpg"))
+
+        storage.copy("a/one.jpg", "b/one.jpg")
+        self.assertTrue(storage.exists("b/one.jpg"))
+        self.assertTrue(storage.delete("b/one.jpg"))
+        self.assertFalse(storage.exists("b/one.jpg"))
+        self.assertFalse(storage.delete("b/one.jpg"))
+        self.assertEqual(storage.delete_many(["a/one.jpg", "a/two.jpg"]), [])
+        self.assertFalse(storage.exists("a/one.jpg"))
+
+    def test_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "in.jpg")
+            with open(source, "wb") as f:
+                f.write(b"file")
+            self.storage.put_file("k.jpg", source)
+            target = os.path.join(tmp, "out.jpg")
+            self.storage.download("k.jpg", target)
+            with open(target, "rb") as f:
+                self.assertEqual(f.read(), b"file")
+            with self.assertRaises(FileNotFoundError):
+                self.storage.download("missing.jpg", target)
+
+    def test_metrics(self):
+        self.storage.put("m.jpg", b"12345")
+        self.storage.get("m.jpg")
+        self.storage.get("m.jpg")
+        operations = self.storage.metrics()["operations"]
+        self.assertEqual((operations["put"]["count"], operations["put"]["bytes"]), (1, 5))
+        self.assertEqual((operations["get"]["count"], operations["get"]["bytes"]), (2, 10))
+        self.assertGreaterEqual(operations["get"]["p99_ms"], operations["get"]["p50_ms"])
+
+
+class TestLocalStorage(StorageContract, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_local_path(self):
+        self.assertIsNone(self.storage.local_path("x.jpg"))
+        self.storage.put("x.jpg", b"x")
+        self.assertEqual(self.storage.local_path("x.jpg"), os.path.join(self.tmp.name, "x.jpg"))
+
+
+class TestInMemoryStorage(StorageContract, unittest.TestCase):
+    def setUp(self):
+        self.storage = InMemoryStorage()
+
+    def test_concurrency_limit(self):
+        storage = InMemoryStorage(latency_ms=20, max_concurrency=2)
+        in_flight, peak, lock = [0], [0], threading.Lock()
+        get = storage._get
+
+        def counting_get(key):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                return get(key)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        storage._get = counting_get
+        threads = [threading.Thread(target=storage.get, args=("k",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(storage.metrics()["operations"]["get"]["count"], 6)
+
+
+class TestS3Storage(unittest.TestCase):
+    @patch("storage.s3_utils.download_bytes")
+    def test_missing_object_is_none(self, mock_download_bytes):
+        mock_download_bytes.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        storage = S3Storage("bucket")
+        self.assertIsNone(storage.get("missing.jpg"))
+
+        mock_download_bytes.side_effect = ClientError({"Error": {"Code": "AccessDenied"}}, "GetObject")
+        with self.assertRaises(ClientError):
+            storage.get("secret.jpg")
+        self.assertEqual(storage.metrics()["operations"]["get"]["errors"], 1)
+
+    @patch("storage.s3_utils.copy_object")
+    @patch("storage.s3_utils.upload_bytes")
+    def test_calls_go_to_the_bucket(self, mock_upload_bytes, mock_copy):
+        storage = S3Storage("bucket")
+        storage.put("k.jpg", b"data")
+        storage.copy("k.jpg", "k2.jpg")
+        mock_upload_bytes.assert_called_once_with("bucket", "k.jpg", b"data", None)
+        mock_copy.assert_called_once_with("bucket", "k.jpg", "k2.jpg")
+
+    def test_object_storage_from_env(self):
+        with patch("storage.OBJECT_STORAGE", "memory"):
+            self.assertIsInstance(object_storage_from_env(), InMemoryStorage)
+        with patch("storage.s3_utils.AWS_S3_BUCKET", None):
+            self.assertIsNone(object_storage_from_env())
+        with patch("storage.s3_utils.AWS_S3_BUCKET", "bucket"):
+            self.assertEqual(object_storage_from_env().bucket, "bucket")
+
+
+if __name__ == '__main__':
+    unittest.main()
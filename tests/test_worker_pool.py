@@ -0,0 +1,130 @@
+import time
+import unittest
+from concurrent.futures import Future
+from unittest.mock import patch, MagicMock
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app import app, get_optional_username
+from worker_pool import InferenceWorkerPool, pack_frames, unpack_frames
+from tests.helpers import make_result, temp_upload_dirs
+
+
+class TestSharedMemoryHandOff(unittest.TestCase):
+    def test_pack_unpack_round_trip(self):
+        frames = [
+            np.random.randint(0, 255, (12, 16, 3), dtype=np.uint8),
+            np.random.randint(0, 255, (7, 5, 3), dtype=np.uint8),
+        ]
+        shm, layout = pack_frames(frames)
+        try:
+            views = unpack_frames(shm, layout)
+            self.assertEqual(len(views), 2)
+            for original, view in zip(frames, views):
+                np.testing.assert_array_equal(original, view)
+            del views
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_layout_is_picklable_metadata_only(self):
+        frames = [np.zeros((4, 4, 3), dtype=np.uint8)]
+        shm, layout = pack_frames(frames)
+        try:
+            self.assertEqual(layout, [(0, (4, 4, 3), "|u1")])
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+class TestInferenceWorkerPool(unittest.TestCase):
+    def test_workers_endpoint_empty_when_in_process(self):
+        client = TestClient(app)
+        resp = client.get("/inference/workers")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"workers": []})
+
+    def test_predict_batch_in_worker_process(self):
+        pool = InferenceWorkerPool(num_workers=1, threads_per_worker=1)
+        try:
+            frames = [np.zeros((64, 64, 3), dtype=np.uint8), np.zeros((32, 48, 3), dtype=np.uint8)]
+            results = pool.predict_batch(frames, paths=["a.jpg", "b.jpg"])
+
+            self.assertEqual(len(results), 2)
+            self.assertEqual(results[0].orig_shape, (64, 64))
+            self.assertEqual(results[1].path, "b.jpg")
+            self.assertIn(0, results[0].names)
+
+            depths = pool.queue_depths()
+            self.assertEqual(len(depths), 1)
+            self.assertEqual(depths[0]["queue_depth"], 0)
+            self.assertTrue(depths[0]["alive"])
+        finally:
+            pool.stop()
+
+    def test_dead_worker_fails_its_jobs_and_is_respawned(self):
+        pool = InferenceWorkerPool(num_workers=2, threads_per_worker=1)
+        dead, alive = MagicMock(), MagicMock()
+        dead.is_alive.return_value = False
+        alive.is_alive.return_value = True
+        pool._started = True
+        pool._processes = [dead, alive]
+        pool._requests, pool._responses = [MagicMock(), MagicMock()], [MagicMock(), MagicMock()]
+        pool._ready_workers = {0, 1}
+        pool._ready.set()
+        lost, kept = Future(), Future()
+        pool._pending = {1: (lost, 0), 2: (kept, 1)}
+        pool._in_flight = [1, 1]
+
+        with patch.object(pool, "_spawn") as mock_spawn:
+            pool._replace_dead_workers()
+
+        mock_spawn.assert_called_once_with(0)
+        with self.assertRaisesRegex(RuntimeError, "worker 0 died"):
+            lost.result(timeout=0)
+        self.assertFalse(kept.done())
+        self.assertEqual(pool._pending, {2: (kept, 1)})
+        self.assertEqual(pool._in_flight, [0, 1])
+        self.assertFalse(pool.is_ready())
+        self.assertEqual([depth["restarts"] for depth in pool.queue_depths()], [1, 0])
+
+    def test_killed_worker_process_is_replaced(self):
+        pool = InferenceWorkerPool(num_workers=1, threads_per_worker=1)
+        try:
+            self.assertTrue(pool.wait_ready(timeout=120))
+            pool._processes[0].kill()
+            pool._processes[0].join()
+            deadline = time.monotonic() + 10
+            while pool.queue_depths()[0]["restarts"] == 0 and time.monotonic() < deadline:
+                time.sleep(0.1)
+            self.assertEqual(pool.queue_depths()[0]["restarts"], 1)
+
+            self.assertTrue(pool.wait_ready(timeout=120))
+            results = pool.predict_batch([np.zeros((32, 32, 3), dtype=np.uint8)])
+            self.assertEqual(results[0].orig_shape, (32, 32))
+        finally:
+            pool.stop()
+
+    @patch("app.save_prediction_with_detections")
+    @patch("app.load_frame", return_value=np.zeros((32, 32, 3), dtype=np.uint8))
+    @patch("engines.LazyEngine.load", side_effect=AssertionError("model loaded in the API process"))
+    def test_pool_mode_never_loads_a_model_in_the_api_process(self, mock_load, mock_frame, mock_save):
+        pool = MagicMock()
+        pool.names = {0: "person", 1: "car"}
+        pool.predict_batch.side_effect = lambda frames, **kwargs: [make_result() for _ in frames]
+        self.enterContext(temp_upload_dirs())
+        app.dependency_overrides[get_optional_username] = lambda: None
+        self.addCleanup(app.dependency_overrides.clear)
+
+        with patch("app.worker_pool", pool):
+            resp = TestClient(app).post("/predict?classes=person",
+                                        files={"file": ("a.jpg", b"fake", "image/jpeg")})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["labels"], ["person"])
+        self.assertEqual(pool.predict_batch.call_args.kwargs["classes"], [0])
+        mock_load.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# video.py
+
+import cv2
+
+
+def iter_frames(path: str, stride: int = 1):
+    """
+    Yield (frame_index, time_ms, frame) for every stride-th frame of a video.
+    Skipped frames are only grabbed, not decoded.
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open video: {path}")
+    try:
+        index = 0
+        while capture.grab():
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                yield index, capture.get(cv2.CAP_PROP_POS_MSEC), frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def video_info(path: str) -> tuple[int, float]:
+    """(frame_count, fps) as reported by the container."""
+    capture = cv2.VideoCapture(path)
+    try:
+        return int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), float(capture.get(cv2.CAP_PROP_FPS) or 0.0)
+    finally:
+        capture.release()
+
+
+def iou(a: list[float], b: list[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class IouTracker:
+    """
+    Greedy IoU tracker over sampled frames.
+
+    A detection continues the best-overlapping live track with the same label;
+    otherwise it starts a new track. Tracks that go unmatched for more than
+    max_missed sampled frames are closed. Only new tracks are reported, so an
+    object that stays in view is emitted once.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 3):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.active = []
+        self.closed = []
+        self._next_id = 1
+
+    def update(self, frame_index: int, detections: list[tuple[str, float, list[float]]]) -> list[dict]:
+        matched, new_tracks = set(), []
+        for label, score, box in sorted(detections, key=lambda d: -d[1]):
+            best, best_iou = None, self.iou_threshold
+            for track in self.active:
+                if track["track_id"] in matched or track["label"] != label:
+                    continue
+                overlap = iou(track["last_box"], box)
+                if overlap >= best_iou:
+                    best, best_iou = track, overlap
+            if best is None:
+                best = {
+                    "track_id": self._next_id, "label": label, "first_frame": frame_index,
+                    "score": score, "box": box, "last_box": box, "missed": 0,
+                }
+                self._next_id += 1
+                self.active.append(best)
+                new_tracks.append(best)
+            elif score > best["score"]:
+                best["score"], best["box"] = score, box
+            best["last_box"], best["last_frame"], best["missed"] = box, frame_index, 0
+            matched.add(best["track_id"])
+
+        for track in self.active:
+            if track["track_id"] not in matched:
+                track["missed"] += 1
+        self.closed.extend(t for t in self.active if t["missed"] > self.max_missed)
+        self.active = [t for t in self.active if t["missed"] <= self.max_missed]
+        return new_tracks
+
+    def tracks(self) -> list[dict]:
+        return sorted(self.closed + self.active, key=lambda t: t["track_id"])
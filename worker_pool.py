@@ -0,0 +1,287 @@
+# worker_pool.py
+
+import os
+import time
+import itertools
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait as wait_for_connections
+
+import numpy as np
+from dotenv import load_dotenv
+
+from engines import INFERENCE_BACKEND, MODEL_WEIGHTS
+
+load_dotenv()
+
+# Number of inference processes; 0 keeps inference inside the API process
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+# torch intra-op threads per worker; 0 splits the machine's cores evenly
+INFERENCE_WORKER_THREADS = int(os.getenv("INFERENCE_WORKER_THREADS", "0"))
+# How often dead workers are looked for (their jobs fail, the worker is respawned)
+INFERENCE_WORKER_CHECK_S = float(os.getenv("INFERENCE_WORKER_CHECK_S", "1.0"))
+
+
+def pack_frames(frames: list[np.ndarray]):
+    """
+    Copy decoded frames into one shared memory block.
+    Returns the block and a picklable layout of (offset, shape, dtype) per frame.
+    """
+    total = sum(frame.nbytes for frame in frames)
+    shm = shared_memory.SharedMemory(create=True, size=max(total, 1))
+    layout = []
+    offset = 0
+    for frame in frames:
+        frame = np.ascontiguousarray(frame)
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf, offset=offset)
+        view[...] = frame
+        layout.append((offset, frame.shape, frame.dtype.str))
+        offset += frame.nbytes
+    return shm, layout
+
+
+def unpack_frames(shm: shared_memory.SharedMemory, layout) -> list[np.ndarray]:
+    """Zero-copy views over the frames stored by pack_frames."""
+    return [
+        np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        for offset, shape, dtype in layout
+    ]
+
+
+def load_frame(source) -> np.ndarray:
+    """Decode an image path into a BGR array (arrays are passed through)."""
+    if isinstance(source, np.ndarray):
+        return source
+    import cv2
+    frame = cv2.imread(source)
+    if frame is None:
+        raise ValueError(f"Could not decode image: {source}")
+    return frame
+
+
+def _worker_main(index: int, backend: str, weights: str, num_threads: int, requests, responses):
+    # Pin thread pools before torch is imported so workers don't oversubscribe cores
+    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    os.environ["MKL_NUM_THREADS"] = str(num_threads)
+    import torch
+    torch.set_num_threads(num_threads)
+    from engines import load_engine, warmup_engine
+
+    model = load_engine(backend, weights)
+    warmup_engine(model)
+    responses.send(("ready", index, dict(model.names), None))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+        job_id, shm_name, layout, options = job
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            frames = unpack_frames(shm, layout)
+            results = model(frames, device="cpu", batch=len(frames), verbose=False, **options)
+            payload = [r.boxes.data.cpu().numpy() for r in results]
+            del frames, results
+            responses.send((job_id, index, payload, None))
+        except Exception as e:
+            responses.send((job_id, index, None, repr(e)))
+        finally:
+            shm.close()
+
+
+class InferenceWorkerPool:
+    """
+    Pool of inference processes, each with its own model copy and pinned thread count.
+
+    Batches are written into shared memory and only their layout is sent to the
+    least busy worker; the worker sends back the raw box tensors, which are turned
+    into ultralytics Results in this process. A worker that dies fails the jobs
+    sent to it and is respawned; the pool is not ready until it has reloaded.
+    """
+
+    def __init__(self, num_workers: int = INFERENCE_WORKERS, backend: str = INFERENCE_BACKEND,
+                 weights: str = MODEL_WEIGHTS, threads_per_worker: int = INFERENCE_WORKER_THREADS):
+        self.num_workers = max(1, int(num_workers))
+        self.backend = backend
+        self.weights = weights
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.num_workers)
+        self.names = None
+
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._pending = {}  # job id -> (future, worker index)
+        self._in_flight = [0] * self.num_workers
+        self._restarts = [0] * self.num_workers
+        self._processes = []
+        self._requests = []
+        # one pipe per worker: a killed worker cannot leave a shared queue's lock held
+        self._responses = []
+        self._generation = 0
+        self._ready_workers = set()
+        self._ready = threading.Event()
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._requests = [None] * self.num_workers
+            self._responses = [None] * self.num_workers
+            self._processes = [None] * self.num_workers
+            for index in range(self.num_workers):
+                self._spawn(index)
+            threading.Thread(target=self._collect_responses, args=(self._generation,),
+                             name="inference-pool-responses", daemon=True).start()
+            self._started = True
+
+    def _spawn(self, index: int):
+        # callers hold _lock
+        requests = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self.backend, self.weights, self.threads_per_worker, requests, writer),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        writer.close()  # the worker holds the only write end, so its death reads as EOF
+        self._requests[index] = requests
+        self._responses[index] = reader
+        self._processes[index] = process
+
+    def stop(self):
+        with self._lock:
+            if not self._started:
+                return
+            for requests in self._requests:
+                requests.put(None)
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            for reader in self._responses:
+                if reader is not None:
+                    reader.close()
+            self._requests, self._responses, self._processes = [], [], []
+            self._generation += 1
+            self._in_flight = [0] * self.num_workers
+            self._ready_workers.clear()
+            self._ready.clear()
+            self._started = False
+            pending, self._pending = list(self._pending.values()), {}
+        for future, _ in pending:
+            future.set_exception(RuntimeError("Inference pool stopped"))
+
+    def is_ready(self) -> bool:
+        with self._lock:
+            return self._ready.is_set() and all(process.is_alive() for process in self._processes)
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Block until every worker has loaded and warmed up its model."""
+        self.start()
+        return self._ready.wait(timeout)
+
+    def queue_depths(self) -> list[dict]:
+        with self._lock:
+            return [
+                {"worker": index, "pid": process.pid, "alive": process.is_alive(),
+                 "ready": index in self._ready_workers, "restarts": self._restarts[index],
+                 "queue_depth": self._in_flight[index]}
+                for index, process in enumerate(self._processes)
+            ]
+
+    def predict_batch(self, frames: list[np.ndarray], paths: list[str] | None = None, **options) -> list:
+        """Run one batch on the least loaded worker and return a Results object per frame."""
+        self.start()
+        shm, layout = pack_frames(frames)
+        try:
+            future = Future()
+            with self._lock:
+                index = min(range(self.num_workers), key=lambda i: self._in_flight[i])
+                job_id = next(self._job_ids)
+                self._pending[job_id] = (future, index)
+                self._in_flight[index] += 1
+                requests = self._requests[index]
+            requests.put((job_id, shm.name, layout, options))
+            # failed by _replace_dead_workers if the worker dies first
+            payload = future.result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        import torch
+        from ultralytics.engine.results import Results
+        paths = paths or [None] * len(frames)
+        return [
+            Results(orig_img=frame, path=path or f"image{i}.jpg", names=self.names, boxes=torch.from_numpy(data))
+            for i, (frame, path, data) in enumerate(zip(frames, paths, payload))
+        ]
+
+    def _replace_dead_workers(self):
+        """Fail the jobs of every worker that died and start a new process in its place."""
+        failed = []
+        with self._lock:
+            if not self._started:
+                return
+            for index, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                for job_id in [job_id for job_id, (_, i) in self._pending.items() if i == index]:
+                    failed.append((self._pending.pop(job_id)[0], index))
+                self._in_flight[index] = 0
+                self._ready_workers.discard(index)
+                self._ready.clear()
+                self._restarts[index] += 1
+                # jobs still queued for the dead worker were failed above
+                self._requests[index].cancel_join_thread()
+                self._requests[index].close()
+                if self._responses[index] is not None:
+                    self._responses[index].close()
+                self._spawn(index)
+        for future, index in failed:
+            future.set_exception(RuntimeError(f"Inference worker {index} died"))
+
+    def _collect_responses(self, generation: int):
+        last_check = time.monotonic()
+        while self._generation == generation:
+            with self._lock:
+                readers = [reader for reader in self._responses if reader is not None]
+            try:
+                ready = wait_for_connections(readers, timeout=INFERENCE_WORKER_CHECK_S)
+            except OSError:
+                ready = []  # a reader was closed by stop() or a respawn
+            for reader in ready:
+                try:
+                    self._handle_response(*reader.recv())
+                except (EOFError, OSError):
+                    # the worker died; stop watching its pipe until it is replaced
+                    reader.close()
+                    with self._lock:
+                        self._responses = [None if r is reader else r for r in self._responses]
+            if time.monotonic() - last_check >= INFERENCE_WORKER_CHECK_S:
+                self._replace_dead_workers()
+                last_check = time.monotonic()
+
+    def _handle_response(self, job_id, index: int, payload, error: str | None):
+        if job_id == "ready":
+            with self._lock:
+                self.names = payload
+                self._ready_workers.add(index)
+                if len(self._ready_workers) == self.num_workers:
+                    self._ready.set()
+            return
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+            if entry is None:
+                # already failed when its worker was replaced
+                return
+            self._in_flight[index] -= 1
+        future = entry[0]
+        if error:
+            future.set_exception(RuntimeError(f"Inference worker {index} failed: {error}"))
+        else:
+            future.set_result(payload)